@@ -1,12 +1,8 @@
-from flask import Flask, request, jsonify
-import tensorflow as tf
+from flask import Blueprint, Flask, request, jsonify, Response, stream_with_context
 from twilio.twiml.messaging_response import MessagingResponse
-from twilio.rest import Client
 import os
 import sqlite3
 import numpy as np
-from PIL import Image
-from tensorflow.keras.models import load_model # type: ignore
 import json
 from datetime import datetime
 import requests
@@ -15,8 +11,36 @@ import tempfile
 import base64
 from dotenv import load_dotenv
 import re
-import io
 import time
+import threading
+import functools
+import hmac
+from collections import namedtuple
+import export
+import streaming
+import singleflight
+import llm_client
+import semantic_cache
+import prewarm
+import generation_budget
+import retrieval
+import batch
+import model_router
+import keyword_matcher
+import language_detect
+import response_catalog
+import geocoder
+import facility_index
+import geo_cache
+import overpass_client
+import facility_prefetch
+import medical_imaging
+import metrics
+import profiling
+import leader
+import rate_limit
+from utils import HEALTH_FAQ, KEYWORD_TABLES
+from config import Config
 try:
     from groq import Groq
 except Exception:
@@ -24,10 +48,12 @@ except Exception:
 
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
+# Routes of the application; create_app() builds the Flask app around them
+routes = Blueprint('healnet', __name__)
+MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+
+# Per-stage latency histograms and counters, served on /metrics
+METRICS = metrics.METRICS
 
 # Configuration
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
@@ -36,19 +62,40 @@ TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
 GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
-# Initialize Twilio client
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID else None
-
-# Initialize Groq client (FREE tier available)
+# Twilio and Groq clients, created by the "clients" warmup hook (see init_clients)
+twilio_client = None
+llm = None
 groq_client = None
-if GROQ_API_KEY and Groq is not None:
-    try:
-        groq_client = Groq(api_key=GROQ_API_KEY)
-        print("✅ Groq client initialized (FREE)")
-    except Exception as e:
-        print(f"❌ Failed to initialize Groq client: {e}")
-else:
-    print("ℹ️ GROQ_API_KEY not set or groq SDK not installed - using Hugging Face for chat")
+
+# Routes each LLM call to the fastest healthy model allowed for its budget class
+MODEL_ROUTER = model_router.ModelRouter()
+
+def probe_model(model):
+    """Minimal completion used to check whether a degraded model has recovered"""
+    groq_client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": "ping"}],
+        max_tokens=1,
+        timeout=Config.MODEL_PROBE_TIMEOUT
+    )
+
+def init_clients():
+    """Twilio client and the pooled Groq client (with deadline/hedge/retry policy)"""
+    global twilio_client, llm, groq_client
+    if TWILIO_ACCOUNT_SID:
+        from twilio.rest import Client
+        twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    
+    # Initialize Groq client (FREE tier available)
+    if GROQ_API_KEY and Groq is not None:
+        try:
+            llm = llm_client.LLMClient(api_key=GROQ_API_KEY, base_url=Config.GROQ_BASE_URL)
+            groq_client = llm.client
+            print(f"✅ Groq client initialized (FREE){' at ' + Config.GROQ_BASE_URL if Config.GROQ_BASE_URL else ''}")
+        except Exception as e:
+            print(f"❌ Failed to initialize Groq client: {e}")
+    else:
+        print("ℹ️ GROQ_API_KEY not set or groq SDK not installed - using Hugging Face for chat")
 
 # Emergency contacts database
 EMERGENCY_CONTACTS = {
@@ -171,7 +218,7 @@ DISCLAIMER = "\n\n⚠️ *अस्वीकरण / Disclaimer:* यह जा
 # Database setup
 def init_db():
     """Initialize SQLite database"""
-    conn = sqlite3.connect('healnet.db')
+    conn = sqlite3.connect(Config.DATABASE_PATH)
     c = conn.cursor()
     
     c.execute('''CREATE TABLE IF NOT EXISTS response_cache
@@ -196,58 +243,38 @@ def init_db():
                   location TEXT,
                   last_interaction DATETIME DEFAULT CURRENT_TIMESTAMP)''')
     
+    c.execute('''CREATE TABLE IF NOT EXISTS inflight_queries
+                 (query_key TEXT PRIMARY KEY,
+                  owner TEXT,
+                  started REAL)''')
+    
+    # Pre-warmed entries carry an expiry; regular entries are bounded by eviction
+    try:
+        c.execute("ALTER TABLE response_cache ADD COLUMN expires_at DATETIME")
+    except sqlite3.OperationalError:
+        pass
+    # Single-flight key (normalised message + language) for exact lookups by coalesced waiters
+    try:
+        c.execute("ALTER TABLE response_cache ADD COLUMN query_key TEXT")
+    except sqlite3.OperationalError:
+        pass
+    c.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_query_key ON response_cache (query_key)")
+    
+    geo_cache.init_geo_cache(conn)
     conn.commit()
     conn.close()
 
-init_db()
-
-tf.config.set_visible_devices([], 'GPU')
+# Paraphrase lookup over response_cache ("what is dengue" ~ "dengue kya hai"), loaded by warmup
+NEAR_DUPLICATE_INDEX = semantic_cache.NearDuplicateIndex()
 
-
-MODELS_PATH = "/Users/anshikalohan/Documents/pbl"
-
-# Helper for safe model loading
-def try_load_model(path):
-    try:
-        model = load_model(path)
-        print(f"✅ Loaded model: {path}")
-        return model
-    except Exception as e:
-        print(f"❌ Failed to load model {path}: {e}")
-        return None
-
-try:
-    modality_classifier = try_load_model(f"{MODELS_PATH}/modality_classifier.h5")
-    brain_tumor_classifier = try_load_model(f"{MODELS_PATH}/brain_tumor_classifier.h5")
-    skin_cancer_model = try_load_model(f"{MODELS_PATH}/Skin_Cancer.h5")
-    lung_model = try_load_model(f"{MODELS_PATH}/lung_model.keras")
-except Exception as e:
-    print(f"❌ Global model loading error: {e}")
-
-CLASSES_MAPPING = {
-    "brain": ['glioma', 'meningioma', 'notumor', 'pituitary'],
-    "skin": ['benign', 'malignant'],
-    "lung": [
-        'Atelectasis', 'Cardiomegaly', 'Consolidation', 'Edema', 'Effusion', 
-        'Emphysema', 'Fibrosis', 'Infiltration', 'Mass', 'Nodule', 'Pleural_Thickening', 
-        'Pneumonia', 'Pneumothorax', 'No_Finding'
-    ]
-}
-
-def preprocess_image(image_bytes, target_size=(256, 256), scaling='none'):
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = img.resize(target_size)
-    img_array = np.array(img, dtype=np.float32)
-    
-    if scaling == '1/255':
-        img_array = img_array / 255.0
-    elif scaling == 'xception':
-        img_array = (img_array / 127.5) - 1.0
-        
-    img_array = np.expand_dims(img_array, axis=0)
-    return img_array
+# Image classifiers; TensorFlow is imported on the first image or by the "models" warmup hook
+IMAGE_MODELS = medical_imaging.ImageModels()
+CLASSES_MAPPING = medical_imaging.CLASSES_MAPPING
+preprocess_image = medical_imaging.preprocess_image
 
 def analyze_medical_image(image_bytes, language='english'):
+    models = IMAGE_MODELS.load()
+    modality_classifier = models["modality"]
     if not modality_classifier:
         return "Models not available." + DISCLAIMER
     
@@ -255,22 +282,22 @@ def analyze_medical_image(image_bytes, language='english'):
         # Step 1: Modality classification (EfficientNet expects 0-255 pixels, scaling='none')
         img_array = preprocess_image(image_bytes, target_size=(224, 224), scaling='none')
         
-        modality_preds = modality_classifier.predict(img_array)[0]
+        modality_preds = medical_imaging.predict("modality", modality_classifier, img_array)
         modality_idx = int(np.argmax(modality_preds))
         
         if modality_idx == 0:
             modality = "brain"
-            model = brain_tumor_classifier
+            model = models["brain"]
             target_size = (299, 299)
             scaling = '1/255'
         elif modality_idx == 1:
             modality = "lung"
-            model = lung_model
+            model = models["lung"]
             target_size = (256, 256)
             scaling = '1/255'
         elif modality_idx == 2:
             modality = "skin"
-            model = skin_cancer_model
+            model = models["skin"]
             target_size = (224, 224)
             scaling = 'none'
         else:
@@ -284,7 +311,7 @@ def analyze_medical_image(image_bytes, language='english'):
             
         # Step 2: Specific Pipeline Processing
         if modality == "brain":
-            preds = model.predict(img_array)[0]
+            preds = medical_imaging.predict("brain", model, img_array)
             pred_idx = np.argmax(preds)
             pred_class = CLASSES_MAPPING["brain"][pred_idx]
             conf = float(preds[pred_idx] * 100)
@@ -301,7 +328,7 @@ def analyze_medical_image(image_bytes, language='english'):
                 response += "⚠️ Please consult a doctor for confirmation."
                 
         elif modality == "skin":
-            preds = model.predict(img_array)[0]
+            preds = medical_imaging.predict("skin", model, img_array)
             if len(preds) == 1:
                 prob = float(preds[0])
                 pred_class = CLASSES_MAPPING["skin"][1] if prob > 0.5 else CLASSES_MAPPING["skin"][0]
@@ -323,7 +350,7 @@ def analyze_medical_image(image_bytes, language='english'):
                 response += "⚠️ Please consult a doctor for confirmation."
                 
         elif modality == "lung":
-            preds = model.predict(img_array)[0]
+            preds = medical_imaging.predict("lung", model, img_array)
             preds_prob = 1 / (1 + np.exp(-preds)) if np.max(preds) > 1 else preds
             
             no_finding_idx = CLASSES_MAPPING["lung"].index("No_Finding")
@@ -383,8 +410,9 @@ def analyze_medical_image(image_bytes, language='english'):
 # Helper Functions
 def log_interaction(intent, language, success=True, location=None):
     """Log anonymized chat metadata"""
+    METRICS.incr("interactions", intent=intent, outcome="ok" if success else "error")
     try:
-        conn = sqlite3.connect('healnet.db')
+        conn = sqlite3.connect(Config.DATABASE_PATH)
         c = conn.cursor()
         c.execute("INSERT INTO chat_logs (intent, language, user_location, success) VALUES (?, ?, ?, ?)",
                   (intent, language, location, success))
@@ -396,7 +424,7 @@ def log_interaction(intent, language, success=True, location=None):
 def get_user_language(phone_number):
     """Get user's preferred language"""
     try:
-        conn = sqlite3.connect('healnet.db')
+        conn = sqlite3.connect(Config.DATABASE_PATH)
         c = conn.cursor()
         c.execute("SELECT preferred_language FROM user_preferences WHERE phone_number = ?", (phone_number,))
         result = c.fetchone()
@@ -408,7 +436,7 @@ def get_user_language(phone_number):
 def set_user_language(phone_number, language):
     """Set user's preferred language"""
     try:
-        conn = sqlite3.connect('healnet.db')
+        conn = sqlite3.connect(Config.DATABASE_PATH)
         c = conn.cursor()
         c.execute("""INSERT INTO user_preferences (phone_number, preferred_language) 
                      VALUES (?, ?) 
@@ -420,31 +448,77 @@ def set_user_language(phone_number, language):
     except Exception as e:
         print(f"Set language error: {e}")
 
-def cache_response(query, response, language):
-    """Cache responses for offline fallback"""
+def cache_response(query, response, language, ttl_seconds=None):
+    """Cache responses for offline fallback (ttl_seconds pins a pre-warmed entry until it expires)"""
     try:
-        conn = sqlite3.connect('healnet.db')
+        conn = sqlite3.connect(Config.DATABASE_PATH)
         c = conn.cursor()
         
-        c.execute("SELECT COUNT(*) FROM response_cache")
-        count = c.fetchone()[0]
-        if count >= 50:
-            c.execute("DELETE FROM response_cache WHERE id IN (SELECT id FROM response_cache ORDER BY timestamp ASC LIMIT 10)")
+        c.execute("SELECT id FROM response_cache WHERE expires_at <= CURRENT_TIMESTAMP")
+        evicted = [row[0] for row in c.fetchall()]
+        if ttl_seconds:
+            # Replace the previous pre-warmed answer for this query
+            c.execute("SELECT id FROM response_cache WHERE query = ? AND language = ? AND expires_at IS NOT NULL",
+                      (query.lower(), language))
+            evicted += [row[0] for row in c.fetchall()]
+        else:
+            c.execute("SELECT COUNT(*) FROM response_cache WHERE expires_at IS NULL")
+            count = c.fetchone()[0]
+            if count >= 50:
+                c.execute("SELECT id FROM response_cache WHERE expires_at IS NULL ORDER BY timestamp ASC LIMIT 10")
+                evicted += [row[0] for row in c.fetchall()]
+        c.executemany("DELETE FROM response_cache WHERE id = ?", [(entry_id,) for entry_id in evicted])
         
-        c.execute("INSERT INTO response_cache (query, response, language) VALUES (?, ?, ?)",
-                  (query.lower(), response, language))
+        key = singleflight.query_key(query, language)
+        if ttl_seconds:
+            c.execute("INSERT INTO response_cache (query, query_key, response, language, expires_at) VALUES (?, ?, ?, ?, datetime('now', ?))",
+                      (query.lower(), key, response, language, f"+{int(ttl_seconds)} seconds"))
+        else:
+            c.execute("INSERT INTO response_cache (query, query_key, response, language) VALUES (?, ?, ?, ?)",
+                      (query.lower(), key, response, language))
+        entry_id = c.lastrowid
         conn.commit()
         conn.close()
+        
+        for old_id in evicted:
+            NEAR_DUPLICATE_INDEX.remove(old_id)
+        NEAR_DUPLICATE_INDEX.add(entry_id, query.lower(), language)
     except Exception as e:
         print(f"Caching error: {e}")
 
-def get_cached_response(query):
-    """Retrieve cached response"""
+def get_cached_response(query, language=None):
+    """
+    Retrieve cached response (preferring the given language). Pre-warmed
+    entries (with expires_at) only answer their exact query key; the
+    substring match covers answers cached from conversations, so a short
+    message like "pain" does not pick up the pinned "stomach pain" answer.
+    """
+    if language:
+        keyed = get_keyed_response(singleflight.query_key(query, language))
+        if keyed:
+            return keyed
+    try:
+        conn = sqlite3.connect(Config.DATABASE_PATH)
+        c = conn.cursor()
+        c.execute("""SELECT response FROM response_cache
+                     WHERE query LIKE ? AND expires_at IS NULL
+                     ORDER BY language = ? DESC, timestamp DESC LIMIT 1""",
+                  (f"%{query.lower()}%", language))
+        result = c.fetchone()
+        conn.close()
+        return result[0] if result else None
+    except Exception as e:
+        print(f"Cache retrieval error: {e}")
+        return None
+
+def get_keyed_response(key):
+    """Newest live answer cached under a single-flight key (see singleflight.query_key)"""
     try:
-        conn = sqlite3.connect('healnet.db')
+        conn = sqlite3.connect(Config.DATABASE_PATH)
         c = conn.cursor()
-        c.execute("SELECT response FROM response_cache WHERE query LIKE ? ORDER BY timestamp DESC LIMIT 1",
-                  (f"%{query.lower()}%",))
+        c.execute("""SELECT response FROM response_cache
+                     WHERE query_key = ? AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+                     ORDER BY timestamp DESC, id DESC LIMIT 1""", (key,))
         result = c.fetchone()
         conn.close()
         return result[0] if result else None
@@ -452,23 +526,78 @@ def get_cached_response(query):
         print(f"Cache retrieval error: {e}")
         return None
 
+def get_similar_cached_response(query, language):
+    """Retrieve a cached answer to a paraphrase of the query in the same language"""
+    if not Config.NEAR_DUPLICATE_CACHE:
+        return None
+    match = NEAR_DUPLICATE_INDEX.lookup(query, language)
+    if not match:
+        return None
+    entry_id, similarity = match
+    try:
+        conn = sqlite3.connect(Config.DATABASE_PATH)
+        c = conn.cursor()
+        c.execute("SELECT response FROM response_cache WHERE id = ?", (entry_id,))
+        result = c.fetchone()
+        conn.close()
+    except Exception as e:
+        print(f"Cache retrieval error: {e}")
+        return None
+    if not result:
+        NEAR_DUPLICATE_INDEX.remove(entry_id)
+        return None
+    print(f"📦 Using near-duplicate cached response (similarity {similarity:.2f})")
+    return result[0]
+
 def detect_language(text):
-    """Simple language detection"""
-    hindi_chars = re.findall(r'[\u0900-\u097F]', text)
-    if len(hindi_chars) > len(text) * 0.3:
+    """Reply language: 'hindi' for Devanagari messages (Hindi or Marathi), else 'english'"""
+    if language_detect.detect(text).language in ('hi', 'mr'):
         return 'hindi'
     return 'english'
 
-def detect_emergency(message):
+# Keyword tables for intent routing, compiled into one matcher with utils' tables
+EMERGENCY_KEYWORDS = [
+    'emergency', 'urgent', 'help', 'ambulance', 'critical', 'accident', 
+    'heart attack', 'stroke', 'bleeding', 'unconscious', 'suicide',
+    'आपातकाल', 'तुरंत', 'मदद', 'एम्बुलेंस', 'दुर्घटना'
+]
+INSURANCE_KEYWORDS = ['insurance', 'बीमा', 'policy', 'पॉलिसी']
+SCHEME_KEYWORDS = ['scheme', 'योजना', 'ayushman', 'आयुष्मान', 'pmjay', 'financial aid', 'सरकारी', 'government']
+AWARENESS_KEYWORDS = ['dengue', 'डेंगू', 'malaria', 'मलेरिया', 'tuberculosis', 'tb', 'टीबी', 
+                      'covid', 'कोविड', 'diabetes', 'मधुमेह', 'hypertension', 'उच्च रक्तचाप']
+FACILITY_WORDS = ['hospital', 'अस्पताल', 'clinic', 'क्लिनिक', 'pharmacy', 'फार्मेसी', 'doctor', 'डॉक्टर']
+FACILITY_ACTION_WORDS = ['find', 'locate', 'search', 'खोजें']
+LOCATION_PREPOSITIONS = ['in', 'near', 'at']
+HINDI_LOCATION_POSTPOSITIONS = ['में', 'पास']
+FACILITY_TYPE_KEYWORDS = {
+    "pharmacy": ["pharmacy", "फार्मेसी", "medical store", "chemist"],
+    "clinic": ["clinic", "क्लिनिक"],
+    "doctor": ["doctor", "डॉक्टर"]
+}
+
+INTENT_MATCHER = keyword_matcher.KeywordMatcher(
+    {
+        **KEYWORD_TABLES,
+        "emergency": EMERGENCY_KEYWORDS,
+        "insurance": INSURANCE_KEYWORDS,
+        "scheme": SCHEME_KEYWORDS,
+        "awareness": AWARENESS_KEYWORDS,
+        "awareness_disease": list(DISEASE_AWARENESS),
+        "facility": FACILITY_WORDS,
+        "facility_action": FACILITY_ACTION_WORDS,
+        "location_prep": LOCATION_PREPOSITIONS,
+        "location_postposition": HINDI_LOCATION_POSTPOSITIONS,
+        **{f"facility_type:{name}": keywords for name, keywords in FACILITY_TYPE_KEYWORDS.items()}
+    },
+    boundaries={"facility_action": "word", "location_prep": "word", "location_postposition": "space"}
+)
+
+def detect_emergency(message, matches=None):
     """Detect emergency keywords"""
-    emergency_keywords = [
-        'emergency', 'urgent', 'help', 'ambulance', 'critical', 'accident', 
-        'heart attack', 'stroke', 'bleeding', 'unconscious', 'suicide',
-        'आपातकाल', 'तुरंत', 'मदद', 'एम्बुलेंस', 'दुर्घटना'
-    ]
-    return any(keyword in message.lower() for keyword in emergency_keywords)
+    matches = matches or INTENT_MATCHER.match(message)
+    return "emergency" in matches
 
-def get_emergency_response(language='english'):
+def render_emergency_response(language='english'):
     """Generate emergency response"""
     if language == 'hindi':
         response = "🚨 *आपातकालीन सेवाएं* 🚨\n\n"
@@ -490,7 +619,7 @@ def get_emergency_response(language='english'):
         response += "Please call immediately if you're in danger!"
     return response
 
-def get_insurance_info(language='english'):
+def render_insurance_info(language='english'):
     """Get health insurance information"""
     if language == 'hindi':
         response = "🏥 *स्वास्थ्य बीमा कंपनियां* 🏥\n\n"
@@ -512,7 +641,7 @@ def get_insurance_info(language='english'):
     response += "\n💡 Compare plans before buying!"
     return response
 
-def get_govt_schemes(language='english'):
+def render_govt_schemes(language='english'):
     """Get government financial aid schemes"""
     if language == 'hindi':
         response = "🏛️ *सरकारी स्वास्थ्य योजनाएं* 🏛️\n\n"
@@ -544,7 +673,7 @@ def get_govt_schemes(language='english'):
     
     return response
 
-def get_disease_awareness(disease, language='english'):
+def render_disease_awareness(disease, language='english'):
     """Get disease awareness information"""
     disease_key = disease.lower().replace(" ", "")
     
@@ -578,8 +707,15 @@ def get_disease_awareness(disease, language='english'):
     
     return response
 
-def generate_health_prompt(message, language='english'):
-    """Generate structured prompt for AI chat"""
+def generate_health_prompt(message, language='english', variant='full', max_words=500):
+    """Generate structured prompt for AI chat (variant: 'full' or 'compact')"""
+    if variant == 'compact':
+        if language == 'hindi':
+            system_prompt = f"""आप HealNet हैं, एक सहानुभूतिपूर्ण AI स्वास्थ्य सहायक। सटीक, साक्ष्य-आधारित जानकारी सरल हिंदी में दें। लक्षणों पर संभावित स्थितियां बताएं (निदान नहीं), दवा की केवल सामान्य जानकारी दें। जवाब {max_words} शब्दों से कम रखें। ALWAYS RESPOND IN HINDI"""
+        else:
+            system_prompt = f"""You are HealNet, a compassionate AI health assistant. Give accurate, evidence-based information in simple language. For symptoms suggest possible conditions (not a diagnosis); for medicines give general info only (no prescriptions). Answer in under {max_words} words. ALWAYS RESPOND IN ENGLISH"""
+        return system_prompt, message
+    
     if language == 'hindi':
         system_prompt = """आप HealNet हैं, एक सहानुभूतिपूर्ण AI स्वास्थ्य सहायक।
 
@@ -611,7 +747,7 @@ Remember: This is educational information, not medical diagnosis."""
     
     return system_prompt, message
 
-def get_greeting_response(language='english'):
+def render_greeting_response(language='english'):
     """Generate greeting/introduction response"""
     if language == 'hindi':
         greeting = """👋 *नमस्ते! मैं HealNet हूं - आपका AI स्वास्थ्य सहायक*
@@ -680,48 +816,239 @@ Hindi, English supported!
 *How can I help you today?*"""
     return greeting
 
+# Static replies rendered once per language, with pre-chunked TwiML
+RESPONSE_CATALOG = response_catalog.ResponseCatalog(
+    {
+        "emergency": render_emergency_response,
+        "insurance": render_insurance_info,
+        "schemes": render_govt_schemes,
+        "greeting": render_greeting_response,
+        **{f"awareness:{disease}": (lambda language, disease=disease: render_disease_awareness(disease, language))
+           for disease in DISEASE_AWARENESS}
+    },
+    sources=lambda: [HEALTH_INSURANCE_INFO, GOVT_SCHEMES, DISEASE_AWARENESS]
+)
+RESPONSE_CATALOG.build()
+
+def get_emergency_response(language='english'):
+    """Emergency numbers (pre-rendered)"""
+    return RESPONSE_CATALOG.text("emergency", language)
 
-def get_groq_chat_response(message, language='english'):
-    """Get response from Groq (primary) with HF fallback."""
+def get_insurance_info(language='english'):
+    """Health insurance information (pre-rendered)"""
+    return RESPONSE_CATALOG.text("insurance", language)
+
+def get_govt_schemes(language='english'):
+    """Government financial aid schemes (pre-rendered)"""
+    return RESPONSE_CATALOG.text("schemes", language)
+
+def get_disease_awareness(disease, language='english'):
+    """Disease awareness information (pre-rendered for the DISEASE_AWARENESS keys)"""
+    if disease in DISEASE_AWARENESS:
+        return RESPONSE_CATALOG.text(f"awareness:{disease}", language)
+    return render_disease_awareness(disease, language)
+
+def get_greeting_response(language='english'):
+    """Greeting/introduction (pre-rendered)"""
+    return RESPONSE_CATALOG.text("greeting", language)
+
+
+# Coalesces identical concurrent LLM queries (e.g. "dengue symptoms" during outbreaks)
+LLM_SINGLE_FLIGHT = singleflight.SingleFlight()
+
+CHAT_GREETINGS = ["hello", "hi", "hey", "start", "help", "hii", "helo", "namaste", "नमस्ते", "hola", "bonjour"]
+
+@METRICS.timed("cache_lookup")
+def answer_without_llm(message, language):
+    """Greeting, cached or near-duplicate cached answer, if there is one"""
     # Check for greetings
-    greetings = ["hello", "hi", "hey", "start", "help", "hii", "helo", "namaste", "नमस्ते", "hola", "bonjour"]
-    if any(greeting == message.lower().strip() for greeting in greetings):
+    if any(greeting == message.lower().strip() for greeting in CHAT_GREETINGS):
+        METRICS.incr("cache_lookups", result="greeting")
         return get_greeting_response(language)
     
     # Check cache
-    cached = get_cached_response(message)
+    cached = get_cached_response(message, language)
     if cached and not cached.endswith("[Offline Mode]"):
         print("📦 Using cached response")
+        METRICS.incr("cache_lookups", result="exact")
         return cached
     
-    system_prompt, user_message = generate_health_prompt(message, language)
+    similar = get_similar_cached_response(message, language)
+    if similar:
+        METRICS.incr("cache_lookups", result="near_duplicate")
+        return similar
+    
+    answer = get_retrieval_response(message, language)
+    METRICS.incr("cache_lookups", result="retrieval" if answer else "miss")
+    return answer
+
+def get_groq_chat_response(message, language='english'):
+    """Get response from Groq (primary) with offline fallback."""
+    answer = answer_without_llm(message, language)
+    if answer:
+        return answer
+    
+    key = singleflight.query_key(message, language)
+    return LLM_SINGLE_FLIGHT.do(
+        key,
+        lambda: _groq_completion(message, language),
+        lookup=lambda: get_keyed_response(key)
+    )
+
+def completion_request(message, language):
+    """(budget, model, chat.completions kwargs) for one Groq call"""
+    budget = generation_budget.select_budget(message, language)
+    system_prompt, user_message = generate_health_prompt(message, language, budget.prompt, budget.max_words)
+    model = MODEL_ROUTER.choose(budget.name, preferred=budget.model)
+    print(f"🔗 Using Groq {model} ({budget.name}, max_tokens={budget.max_tokens})")
+    return budget, model, {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ],
+        "max_tokens": budget.max_tokens,
+        "temperature": 0.7
+    }
+
+def completion_text(language, budget, model, response, elapsed):
+    """Record a finished Groq call with the router and budget stats; returns its text ('' if empty)"""
+    MODEL_ROUTER.record(model, elapsed, budget_class=budget.name)
+    usage = getattr(response, 'usage', None)
+    generation_budget.BUDGET_STATS.record(
+        budget, language, elapsed,
+        getattr(usage, 'completion_tokens', None),
+        response.choices[0].finish_reason if response and response.choices else None
+    )
+    return response.choices[0].message.content if response and response.choices else ""
+
+def completion_answer(message, language, budget, model, response, elapsed):
+    """Record a finished Groq call; caches and returns the answer, or None if it was empty"""
+    response_text = completion_text(language, budget, model, response, elapsed)
+    if response_text:
+        result = response_text + DISCLAIMER
+        print(f"✅ Groq response: {len(result)} chars")
+        cache_response(message, result, language)
+        return result
+    print("⚠️ Empty Groq response, using offline fallback")
+    return None
+
+def completion_failed(model, elapsed, e):
+    MODEL_ROUTER.record(model, elapsed, error=e.last_error or e)
+    print(f"⚠️ Groq unavailable ({type(e.last_error).__name__ if e.last_error else e.reason}): {e} - using offline fallback")
+
+def _groq_completion(message, language, deadline=None):
+    """One upstream Groq call (within `deadline` seconds, default LLM_DEADLINE); caches and returns the answer, or the offline fallback"""
+    if not llm:
+        print("ℹ️ Groq not configured, using offline fallback")
+        return get_fallback_response(message, language)
+    
+    budget, model, request_kwargs = completion_request(message, language)
+    started = time.perf_counter()
     try:
-        if groq_client:
-            print("🔗 Using Groq llama-3.1-8b-instant")
-            response = groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[
+        with METRICS.stage("llm_call"):
+            response = llm.create(deadline=deadline, **request_kwargs)
+        answer = completion_answer(message, language, budget, model, response, time.perf_counter() - started)
+        if answer:
+            return answer
+    except llm_client.LLMUnavailable as e:
+        completion_failed(model, time.perf_counter() - started, e)
+    
+    return get_fallback_response(message, language)
+
+# Alias for existing callers
+get_openai_response = get_groq_chat_response
+
+# Sent before the full answer when a stream broke off after some messages went out
+STREAM_INTERRUPTED_NOTICE = {
+    "english": "⚠️ The answer above was cut off by a connection problem.\n\n",
+    "hindi": "⚠️ ऊपर का उत्तर कनेक्शन की समस्या से अधूरा रह गया।\n\n"
+}
+# A failed stream is only retried with at least this much of LLM_DEADLINE left
+STREAM_RETRY_MIN_SECONDS = 2.0
+
+def get_groq_streaming_response(message, language, send):
+    """
+    Stream the Groq answer to the user through send(body) as it is generated.
+    Returns (response_text, delivered); when delivered is False the caller
+    still has to send response_text itself. A stream that breaks off midway
+    is answered again through the regular completion path, after a notice
+    that the streamed part was incomplete. Stream and retry share one
+    LLM_DEADLINE, so the reply still fits Twilio's webhook timeout.
+    """
+    answer = answer_without_llm(message, language)
+    if answer:
+        return answer, False
+    
+    delivered = False
+    interrupted = False
+    
+    def stream():
+        nonlocal delivered, interrupted
+        budget = generation_budget.select_budget(message, language)
+        system_prompt, user_message = generate_health_prompt(message, language, budget.prompt, budget.max_words)
+        model = MODEL_ROUTER.choose(budget.name, preferred=budget.model)
+        print(f"🔗 Streaming Groq {model} ({budget.name}, max_tokens={budget.max_tokens})")
+        started = time.perf_counter()
+        with METRICS.stage("llm_call"):
+            full_text, timings = streaming.stream_completion(
+                groq_client,
+                send,
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_message}
                 ],
-                max_tokens=800,
-                temperature=0.7
+                model=model,
+                max_tokens=budget.max_tokens,
+                temperature=0.7,
+                suffix=DISCLAIMER
             )
-            response_text = response.choices[0].message.content if response and response.choices else ""
-            if response_text:
-                result = response_text + DISCLAIMER
-                print(f"✅ Groq response: {len(result)} chars")
-                cache_response(message, result, language)
-                return result
-            print("⚠️ Empty Groq response, falling back to Hugging Face")
-        else:
-            print("ℹ️ Groq not configured, using Hugging Face for chat")
-    except Exception as e:
-        print(f"⚠️ Groq chat error: {type(e).__name__}: {str(e)} - falling back to Hugging Face")
+        if full_text is None:
+            # Nothing (or only part of the answer) reached the user - answer through the regular path
+            MODEL_ROUTER.record(model, time.perf_counter() - started, error=RuntimeError("stream failed"))
+            interrupted = timings is not None
+            remaining = Config.LLM_DEADLINE - (time.perf_counter() - started)
+            if remaining < STREAM_RETRY_MIN_SECONDS:
+                print(f"⏱️ {remaining:.1f}s of the LLM deadline left after the stream - using offline fallback")
+                return get_fallback_response(message, language)
+            return _groq_completion(message, language, deadline=remaining)
+        MODEL_ROUTER.record(model, timings["total"], budget_class=budget.name)
+        generation_budget.BUDGET_STATS.record(budget, language, timings["total"])
+        delivered = True
+        if full_text:
+            cache_response(message, full_text, language)
+        return full_text
     
-
-# Alias for existing callers
-get_openai_response = get_groq_chat_response
+    # Duplicates of an in-flight stream get the finished text in one go
+    key = singleflight.query_key(message, language)
+    response_text = LLM_SINGLE_FLIGHT.do(
+        key,
+        stream,
+        lookup=lambda: get_keyed_response(key)
+    )
+    if interrupted:
+        response_text = STREAM_INTERRUPTED_NOTICE.get(language, STREAM_INTERRUPTED_NOTICE["english"]) + response_text
+    return response_text, delivered
+
+# Offline keyword answers used when the LLM is unavailable
+FALLBACK_RESPONSES = {
+    "hindi": {
+        "बुखार": "बुखार संक्रमण से लड़ने का संकेत है। आराम करें, खूब पानी पिएं। यदि बुखार 103°F से अधिक हो या 3 दिनों से अधिक रहे तो डॉक्टर से संपर्क करें।",
+        "खांसी": "खांसी सर्दी, एलर्जी या जलन के कारण हो सकती है। हाइड्रेटेड रहें, शहद का उपयोग करें। लगातार खांसी के लिए डॉक्टर से मिलें।",
+        "सिरदर्द": "सिरदर्द तनाव, निर्जलीकरण के कारण हो सकता है। आराम करें, पानी पिएं। गंभीर सिरदर्द के लिए डॉक्टर से परामर्श करें।",
+        "पेट": "पेट दर्द कई कारणों से हो सकता है। हल्का भोजन करें। यदि दर्द गंभीर हो तो तुरंत डॉक्टर से संपर्क करें।",
+        "default": "मैं वर्तमान में कनेक्टिविटी समस्याओं का सामना कर रहा हूं। आपातकाल के लिए 108 डायल करें या स्वास्थ्य पेशेवर से परामर्श करें।"
+    },
+    "english": {
+        "fever": "Fever is your body fighting infection. Stay hydrated, rest, monitor temperature. Seek help if fever exceeds 103°F or lasts 3+ days.",
+        "headache": "Headaches can be from stress, dehydration, or tension. Try rest, hydration, OTC pain relievers. See doctor for severe cases.",
+        "cold": "Common cold includes runny nose, cough, mild fever. Rest, stay hydrated, use steam. Symptoms resolve in 7-10 days.",
+        "cough": "Cough can be due to cold, allergies, or irritation. Stay hydrated, use honey. See doctor if persistent.",
+        "stomach": "Stomach pain has many causes. Eat light, stay hydrated. Seek immediate help if severe.",
+        "pain": "For any persistent pain, proper evaluation by a healthcare provider is recommended. Rest and monitor symptoms.",
+        "default": "I'm experiencing connectivity issues. For emergencies dial 108, or consult a healthcare professional for immediate concerns."
+    }
+}
 
 def get_fallback_response(message, language='english'):
     """Enhanced fallback response"""
@@ -731,13 +1058,7 @@ def get_fallback_response(message, language='english'):
         return get_greeting_response(language)
     
     if language == 'hindi':
-        fallback_responses = {
-            "बुखार": "बुखार संक्रमण से लड़ने का संकेत है। आराम करें, खूब पानी पिएं। यदि बुखार 103°F से अधिक हो या 3 दिनों से अधिक रहे तो डॉक्टर से संपर्क करें।",
-            "खांसी": "खांसी सर्दी, एलर्जी या जलन के कारण हो सकती है। हाइड्रेटेड रहें, शहद का उपयोग करें। लगातार खांसी के लिए डॉक्टर से मिलें।",
-            "सिरदर्द": "सिरदर्द तनाव, निर्जलीकरण के कारण हो सकता है। आराम करें, पानी पिएं। गंभीर सिरदर्द के लिए डॉक्टर से परामर्श करें।",
-            "पेट": "पेट दर्द कई कारणों से हो सकता है। हल्का भोजन करें। यदि दर्द गंभीर हो तो तुरंत डॉक्टर से संपर्क करें।",
-            "default": "मैं वर्तमान में कनेक्टिविटी समस्याओं का सामना कर रहा हूं। आपातकाल के लिए 108 डायल करें या स्वास्थ्य पेशेवर से परामर्श करें।"
-        }
+        fallback_responses = FALLBACK_RESPONSES['hindi']
         
         for keyword, response in fallback_responses.items():
             if keyword != "default" and keyword in message:
@@ -746,15 +1067,7 @@ def get_fallback_response(message, language='english'):
         return fallback_responses["default"] + DISCLAIMER
     
     else:
-        fallback_responses = {
-            "fever": "Fever is your body fighting infection. Stay hydrated, rest, monitor temperature. Seek help if fever exceeds 103°F or lasts 3+ days.",
-            "headache": "Headaches can be from stress, dehydration, or tension. Try rest, hydration, OTC pain relievers. See doctor for severe cases.",
-            "cold": "Common cold includes runny nose, cough, mild fever. Rest, stay hydrated, use steam. Symptoms resolve in 7-10 days.",
-            "cough": "Cough can be due to cold, allergies, or irritation. Stay hydrated, use honey. See doctor if persistent.",
-            "stomach": "Stomach pain has many causes. Eat light, stay hydrated. Seek immediate help if severe.",
-            "pain": "For any persistent pain, proper evaluation by a healthcare provider is recommended. Rest and monitor symptoms.",
-            "default": "I'm experiencing connectivity issues. For emergencies dial 108, or consult a healthcare professional for immediate concerns."
-        }
+        fallback_responses = FALLBACK_RESPONSES['english']
         
         for keyword, response in fallback_responses.items():
             if keyword != "default" and keyword in message.lower():
@@ -762,118 +1075,276 @@ def get_fallback_response(message, language='english'):
         
         return fallback_responses["default"] + DISCLAIMER
 
+# Local BM25 answers for topics we already ship vetted text for (built by warmup)
+RETRIEVAL = retrieval.RetrievalAnswerer()
+
+def get_retrieval_response(message, language='english'):
+    """Answer from the local knowledge index when the match is confident"""
+    if not Config.RETRIEVAL_ENABLED:
+        return None
+    match = RETRIEVAL.answer(message, language)
+    if not match:
+        return None
+    doc, score, coverage = match
+    print(f"📖 Answered locally from {doc['source']}:{doc['topic']} (score {score:.2f}, coverage {coverage:.2f})")
+    return doc['text'].strip() + DISCLAIMER
+
+def prewarm_generate(query, reference, language):
+    """Canonical answer grounded on the reference text, through the regular model routing and budget"""
+    budget, model, request_kwargs = completion_request(query, language)
+    started = time.perf_counter()
+    try:
+        with METRICS.stage("llm_call"):
+            response = llm.create(**prewarm.grounded_request(request_kwargs, reference))
+    except llm_client.LLMUnavailable as e:
+        completion_failed(model, time.perf_counter() - started, e)
+        raise
+    return completion_text(language, budget, model, response, time.perf_counter() - started)
+
+def prewarm_cache(offline=False, force=False, limit=None):
+    """Load canonical answers for built-in topics into the response cache"""
+    jobs = prewarm.build_jobs(HEALTH_FAQ, DISEASE_AWARENESS, FALLBACK_RESPONSES, get_disease_awareness)
+    generate = prewarm_generate if llm and not offline else None
+    summary = prewarm.run_prewarm(jobs, cache_response, generate, suffix=DISCLAIMER, force=force, limit=limit)
+    print(f"🔥 Cache pre-warm done: {summary}")
+    return summary
+
+
+# Offline place-name index (see geocoder.py to import a gazetteer)
+GEOCODER = geocoder.Gazetteer()
+
+# Local facility index built from an OSM extract (see facility_index.py)
+FACILITY_INDEX = facility_index.FacilityIndex()
+
+# Nominatim / Overpass results shared between nearby searches (see geo_cache.py)
+GEO_CACHE = geo_cache.GeoCache()
+
+# One hedged 15 km Overpass query per search, ranked here by distance
+OVERPASS = overpass_client.OverpassClient()
+OVERPASS_RADIUS_M = 15000
+# Facilities kept per cached search (enough for nearby users' top 5)
+FACILITY_CACHE_KEEP = 50
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org"
+OSM_HEADERS = {
+    "User-Agent": "HealNet/1.0 (contact: support@healnet.local)"
+}
+# Batches and concurrent users share Nominatim's 1 request/s
+NOMINATIM_LIMITER = rate_limit.RateLimiter(Config.NOMINATIM_RATE_PER_MINUTE, Config.NOMINATIM_RATE_FILE)
+
+def nominatim_get(path, params):
+    """Nominatim GET within the shared rate; raises rate_limit.RateLimited rather than wait past NOMINATIM_MAX_WAIT"""
+    NOMINATIM_LIMITER.wait(Config.NOMINATIM_MAX_WAIT)
+    return requests.get(f"{NOMINATIM_URL}/{path}", params=params, headers=OSM_HEADERS, timeout=10)
+
+COORDS_PATTERN = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+# Map facility types to OSM amenities
+AMENITY_TAGS = {
+    "hospital": ["hospital", "clinic", "doctors"], # Fallback to clinics if hospital missing
+    "clinic": ["clinic", "doctors"],
+    "pharmacy": ["pharmacy", "chemist"],
+    "doctor": ["doctors", "clinic", "hospital"]
+}
+
+def parse_coords(location_query):
+    """(lat, lng) strings if the query is a "lat,lng" pair, else None"""
+    coord_match = COORDS_PATTERN.match(str(location_query))
+    return coord_match.groups() if coord_match else None
 
-def find_nearby_facilities(location_query, facility_type="hospital", language='english'):
-    """Nearby search using OpenStreetMap (Nominatim + Overpass). No API key needed."""
+def location_not_found_message(location_query, language):
+    return f"Location '{location_query}' not found. Try a more specific area." if language == 'english' else f"स्थान '{location_query}' नहीं मिला। कृपया अधिक विशिष्ट क्षेत्र बताएं।"
+
+def location_timeout_message(language):
+    return "Location service timeout. Please try again." if language == 'english' else "स्थान सेवा समय समाप्त। कृपया पुनः प्रयास करें।"
+
+def location_error_message(language):
+    return "Location search failed. Try: 'Find hospitals in [area, city]'" if language == 'english' else "स्थान खोज विफल। उदाहरण: '[क्षेत्र, शहर] में अस्पताल खोजें'"
+
+def local_facilities_response(lat_f, lng_f, facility_type, language, formatted_address):
+    """Reply from the local facility index, or None when Overpass should be asked"""
+    tags = AMENITY_TAGS.get(facility_type, ["hospital", "clinic", "doctors"])
+    FACILITY_INDEX.reload_if_changed()
+    if not FACILITY_INDEX.available:
+        return None
+    found = []
+    for radius_km in [5, 15]: # Expand from 5km to 15km if nothing found
+        found = FACILITY_INDEX.radius(lat_f, lng_f, radius_km, kinds=tags, limit=5)
+        if found:
+            break
+    if found:
+        facilities = [{
+            "name": f.name,
+            "address": f.address or formatted_address,
+            "gmaps_link": f"https://maps.google.com/?q={f.lat:.6f},{f.lon:.6f}",
+            "rating": "N/A",
+            "open": None
+        } for f in found]
+        print(f"✅ [Index] Found {len(facilities)} facilities (nearest {found[0].distance_km:.1f} km)")
+        return format_facilities_response(facilities, facility_type, language, formatted_address)
+    # Nothing indexed nearby: the extract may just lack this area, so let Overpass look
+    if not Config.FACILITY_OVERPASS_FALLBACK:
+        msg = f"No {facility_type}s found near {formatted_address} (within 15km)." if language == 'english' else f"{formatted_address} के दायरे में कोई {facility_type} नहीं मिला।"
+        return msg
+    return None
+
+def overpass_facilities_response(elements, lat_f, lng_f, facility_type, language, formatted_address):
+    """Rank Overpass elements by distance, cache them and format the nearest"""
+    if not elements:
+        msg = f"No {facility_type}s found near {formatted_address} (within 15km). (Map servers may be overloaded)" if language == 'english' else f"{formatted_address} के दायरे में कोई {facility_type} नहीं मिला।"
+        return msg
+    
+    facilities = []
+    for el in elements:
+        tags = el.get("tags", {})
+        name = tags.get("name", "N/A")
+        address_parts = [tags.get("addr:street"), tags.get("addr:city"), tags.get("addr:state")]
+        addr = ", ".join([p for p in address_parts if p]) or formatted_address
+        
+        lat = el.get("lat") or el.get("center", {}).get("lat")
+        lon = el.get("lon") or el.get("center", {}).get("lon")
+        # Using maps.google.com/?q= format to avoid XML ampersand parsing crash in Twilio WhatsApp
+        gmaps_link = f"https://maps.google.com/?q={lat},{lon}" if lat and lon else ""
+        
+        facilities.append({
+            "name": name,
+            "address": addr,
+            "gmaps_link": gmaps_link,
+            "rating": "N/A",
+            "open": None,
+            "lat": lat,
+            "lon": lon
+        })
+    
+    facilities = geo_cache.rank_by_distance(facilities, lat_f, lng_f)
+    GEO_CACHE.put_facilities(lat_f, lng_f, facility_type, facilities[:FACILITY_CACHE_KEEP])
+    facilities = facilities[:5]
+    print(f"✅ [OSM] Found {len(facilities)} facilities")
+    return format_facilities_response(facilities, facility_type, language, formatted_address)
+
+def find_nearby_facilities(location_query, facility_type="hospital", language='english', refresh=False):
+    """
+    Nearby search using OpenStreetMap (local facility index, Nominatim + Overpass). No API key needed.
+    refresh=True skips cached results and stores fresh ones (used by the prefetch worker).
+    """
     try:
         print(f"📍 [OSM] Searching for {facility_type} near: {location_query}")
-        headers = {
-            "User-Agent": "HealNet/1.0 (contact: support@healnet.local)"
-        }
         
         # Resolve location to coordinates and a friendly address
-        coord_match = re.match(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$', str(location_query))
-        if coord_match:
-            lat, lng = coord_match.groups()
-            location_str = f"{lat},{lng}"
-            # Reverse geocode with Nominatim
-            rev_url = "https://nominatim.openstreetmap.org/reverse"
-            rev_params = {"lat": lat, "lon": lng, "format": "jsonv2"}
-            rev_resp = requests.get(rev_url, params=rev_params, headers=headers, timeout=10)
-            rev_data = rev_resp.json() if rev_resp.status_code == 200 else {}
-            formatted_address = rev_data.get('display_name', location_str)
-        else:
-            # Geocode with Nominatim
-            geocode_url = "https://nominatim.openstreetmap.org/search"
-            geocode_params = {"q": location_query, "format": "jsonv2", "limit": 1, "countrycodes": "in"}
-            geo_resp = requests.get(geocode_url, params=geocode_params, headers=headers, timeout=10)
-            geo_data = geo_resp.json() if geo_resp.status_code == 200 else []
-            if not geo_data:
-                # Retry without country bias
-                geocode_params = {"q": location_query, "format": "jsonv2", "limit": 1}
-                geo_resp = requests.get(geocode_url, params=geocode_params, headers=headers, timeout=10)
-                geo_data = geo_resp.json() if geo_resp.status_code == 200 else []
-            if not geo_data:
-                msg = f"Location '{location_query}' not found. Try a more specific area." if language == 'english' else f"स्थान '{location_query}' नहीं मिला। कृपया अधिक विशिष्ट क्षेत्र बताएं।"
-                return msg
-            lat, lng = geo_data[0]['lat'], geo_data[0]['lon']
-            location_str = f"{lat},{lng}"
-            formatted_address = geo_data[0].get('display_name', location_query)
+        with METRICS.stage("geocode"):
+            coords = parse_coords(location_query)
+            if coords:
+                lat, lng = coords
+                formatted_address = None if refresh else GEO_CACHE.get_reverse(lat, lng)
+                if not formatted_address:
+                    # Reverse geocode with Nominatim
+                    rev_params = {"lat": lat, "lon": lng, "format": "jsonv2"}
+                    try:
+                        rev_resp = nominatim_get("reverse", rev_params)
+                        rev_data = rev_resp.json() if rev_resp.status_code == 200 else {}
+                    except rate_limit.RateLimited as e:
+                        print(f"⏳ Nominatim busy ({e}) - showing coordinates")
+                        rev_data = {}
+                    formatted_address = rev_data.get('display_name', f"{lat},{lng}")
+                    if rev_data.get('display_name'):
+                        GEO_CACHE.put_reverse(lat, lng, formatted_address)
+            else:
+                # Local gazetteer first; Nominatim only for unknown (or less specific) places
+                resolution = GEOCODER.resolve(location_query)
+                geo_data = []
+                if resolution and not resolution.partial:
+                    print(f"📍 [Gazetteer] '{location_query}' -> {resolution.place.display_name} ({resolution.method})")
+                else:
+                    cached = None if refresh else GEO_CACHE.get_geocode(location_query)
+                    if cached:
+                        geo_data = [cached]
+                    else:
+                        try:
+                            # Geocode with Nominatim
+                            geocode_params = {"q": location_query, "format": "jsonv2", "limit": 1, "countrycodes": "in"}
+                            geo_resp = nominatim_get("search", geocode_params)
+                            geo_data = geo_resp.json() if geo_resp.status_code == 200 else []
+                            if not geo_data:
+                                # Retry without country bias
+                                geocode_params = {"q": location_query, "format": "jsonv2", "limit": 1}
+                                geo_resp = nominatim_get("search", geocode_params)
+                                geo_data = geo_resp.json() if geo_resp.status_code == 200 else []
+                        except rate_limit.RateLimited as e:
+                            print(f"⏳ Nominatim busy ({e})")
+                            if not resolution:
+                                return location_timeout_message(language)
+                        if geo_data:
+                            GEO_CACHE.put_geocode(location_query, geo_data[0]['lat'], geo_data[0]['lon'],
+                                                  geo_data[0].get('display_name', location_query))
+                if geo_data:
+                    lat, lng = geo_data[0]['lat'], geo_data[0]['lon']
+                    formatted_address = geo_data[0].get('display_name', location_query)
+                elif resolution:
+                    # Nominatim knows nothing more specific - use the gazetteer's closest match
+                    lat, lng = resolution.place.lat, resolution.place.lon
+                    formatted_address = resolution.place.display_name
+                else:
+                    return location_not_found_message(location_query, language)
         
         print(f"✅ [OSM] Location found: {formatted_address}")
-        
-        # Map facility types to OSM amenities
-        amenity_tags = {
-            "hospital": ["hospital", "clinic", "doctors"], # Fallback to clinics if hospital missing
-            "clinic": ["clinic", "doctors"],
-            "pharmacy": ["pharmacy", "chemist"],
-            "doctor": ["doctors", "clinic", "hospital"]
-        }
-        tags = amenity_tags.get(facility_type, ["hospital", "clinic", "doctors"])
-        
-        # Overpass endpoints for reliability
-        overpass_urls = [
-            "https://lz4.overpass-api.de/api/interpreter",
-            "https://z.overpass-api.de/api/interpreter",
-            "https://overpass-api.de/api/interpreter"
-        ]
-        
         lat_f, lng_f = float(lat), float(lng)
-        elements = []
         
-        for radius_m in [5000, 15000]: # Expand from 5km to 15km if nothing found
-            or_filters = "".join([f'node["amenity"="{t}"](around:{radius_m},{lat_f},{lng_f});way["amenity"="{t}"](around:{radius_m},{lat_f},{lng_f});relation["amenity"="{t}"](around:{radius_m},{lat_f},{lng_f});' for t in tags])
-            query = f"[out:json][timeout:25];({or_filters});out center 20;"
-            
-            for overpass_url in overpass_urls:
-                try:
-                    ov_resp = requests.post(overpass_url, data={"data": query}, headers=headers, timeout=25)
-                    if ov_resp.status_code == 200:
-                        ov_data = ov_resp.json()
-                        elements = ov_data.get("elements", [])
-                        if elements:
-                            break # Found something, exit api loop
-                except Exception as e:
-                    print(f"⚠️ Overpass request error at {overpass_url}: {e}")
-            
-            if elements:
-                break # Exit radius loop
-                
-        if not elements:
-            msg = f"No {facility_type}s found near {formatted_address} (within 15km). (Map servers may be overloaded)" if language == 'english' else f"{formatted_address} के दायरे में कोई {facility_type} नहीं मिला।"
-            return msg
+        # Local index first, nearest first; Overpass only outside the imported extracts
+        local = local_facilities_response(lat_f, lng_f, facility_type, language, formatted_address)
+        if local:
+            return local
         
-        facilities = []
-        for el in elements[:5]:
-            tags = el.get("tags", {})
-            name = tags.get("name", "N/A")
-            address_parts = [tags.get("addr:street"), tags.get("addr:city"), tags.get("addr:state")]
-            addr = ", ".join([p for p in address_parts if p]) or formatted_address
-            
-            lat = el.get("lat") or el.get("center", {}).get("lat")
-            lon = el.get("lon") or el.get("center", {}).get("lon")
-            # Using maps.google.com/?q= format to avoid XML ampersand parsing crash in Twilio WhatsApp
-            gmaps_link = f"https://maps.google.com/?q={lat},{lon}" if lat and lon else ""
-            
-            facilities.append({
-                "name": name,
-                "address": addr,
-                "gmaps_link": gmaps_link,
-                "rating": "N/A",
-                "open": None
-            })
+        # An earlier search from (nearly) the same spot
+        cached_facilities = None if refresh else GEO_CACHE.get_facilities(lat_f, lng_f, facility_type)
+        if cached_facilities:
+            print(f"✅ [Cache] {len(cached_facilities)} facilities near {formatted_address}")
+            return format_facilities_response(cached_facilities[:5], facility_type, language, formatted_address)
         
-        print(f"✅ [OSM] Found {len(facilities)} facilities")
-        return format_facilities_response(facilities, facility_type, language, formatted_address)
+        tags = AMENITY_TAGS.get(facility_type, ["hospital", "clinic", "doctors"])
+        try:
+            with METRICS.stage("overpass"):
+                elements = OVERPASS.facilities(lat_f, lng_f, tags, radius_m=OVERPASS_RADIUS_M)
+        except overpass_client.OverpassUnavailable as e:
+            print(f"⚠️ Overpass unavailable: {e}")
+            elements = []
+        return overpass_facilities_response(elements, lat_f, lng_f, facility_type, language, formatted_address)
     
     except requests.Timeout:
         print("❌ OSM API timeout")
-        msg = "Location service timeout. Please try again." if language == 'english' else "स्थान सेवा समय समाप्त। कृपया पुनः प्रयास करें।"
-        return msg
+        return location_timeout_message(language)
     except Exception as e:
         print(f"❌ Location search error: {type(e).__name__}: {str(e)}")
-        msg = "Location search failed. Try: 'Find hospitals in [area, city]'" if language == 'english' else "स्थान खोज विफल। उदाहरण: '[क्षेत्र, शहर] में अस्पताल खोजें'"
-        return msg
+        return location_error_message(language)
+
+def facilities_fresh(location_query, facility_type, min_remaining):
+    """True if a search would be answered locally for at least min_remaining more seconds"""
+    coords = parse_coords(location_query)
+    if coords:
+        lat, lng = map(float, coords)
+        _, remaining = GEO_CACHE.peek("reverse", GEO_CACHE.point_key(lat, lng))
+        if remaining < min_remaining:
+            return False
+    else:
+        resolution = GEOCODER.resolve(location_query)
+        if resolution and not resolution.partial:
+            lat, lng = resolution.place.lat, resolution.place.lon
+        else:
+            entry, remaining = GEO_CACHE.peek("geocode", GEO_CACHE.query_key(location_query))
+            if entry is None or remaining < min_remaining:
+                return False
+            lat, lng = entry["lat"], entry["lon"]
+    if FACILITY_INDEX.available and FACILITY_INDEX.covers(lat, lng, AMENITY_TAGS.get(facility_type, ["hospital", "clinic", "doctors"])):
+        return True
+    _, remaining = GEO_CACHE.peek("facilities", GEO_CACHE.point_key(lat, lng, facility_type))
+    return remaining >= min_remaining
+
+def prefetch_facilities(location_query, facility_type):
+    """Re-run a popular search into the geo cache; True if its results are now cached"""
+    find_nearby_facilities(location_query, facility_type, refresh=True)
+    return facilities_fresh(location_query, facility_type, FACILITY_PREFETCHER.margin)
+
+# Keeps popular searches warm in GEO_CACHE (see facility_prefetch.py)
+FACILITY_PREFETCHER = facility_prefetch.FacilityPrefetcher(prefetch_facilities, facilities_fresh)
 
 def format_facilities_response(facilities, facility_type, language='english', location=''):
     """Format facilities list for WhatsApp"""
@@ -910,38 +1381,37 @@ def format_facilities_response(facilities, facility_type, language='english', lo
     
     return response
 
-def handle_intent(message, language='english'):
+@METRICS.timed("handle_intent")
+def handle_intent(message, language='english', matches=None):
     """Detect user intent and route to appropriate handler"""
-    message_lower = message.lower()
+    matches = matches or INTENT_MATCHER.match(message)
     
     # Emergency
-    if detect_emergency(message):
+    if detect_emergency(message, matches):
         return "emergency", get_emergency_response(language)
     
     # Insurance info
-    insurance_keywords = ['insurance', 'बीमा', 'policy', 'पॉलिसी']
-    if any(keyword in message_lower for keyword in insurance_keywords):
+    if "insurance" in matches:
         return "insurance", get_insurance_info(language)
     
     # Government schemes
-    scheme_keywords = ['scheme', 'योजना', 'ayushman', 'आयुष्मान', 'pmjay', 'financial aid', 'सरकारी', 'government']
-    if any(keyword in message_lower for keyword in scheme_keywords):
+    if "scheme" in matches:
         return "schemes", get_govt_schemes(language)
     
     # Disease awareness
-    awareness_keywords = ['dengue', 'डेंगू', 'malaria', 'मलेरिया', 'tuberculosis', 'tb', 'टीबी', 
-                          'covid', 'कोविड', 'diabetes', 'मधुमेह', 'hypertension', 'उच्च रक्तचाप']
-    for keyword in awareness_keywords:
-        if keyword in message_lower:
-            for disease in DISEASE_AWARENESS.keys():
-                if disease in message_lower or keyword in disease:
-                    return "awareness", get_disease_awareness(disease, language)
+    if "awareness" in matches:
+        matched_keywords = matches.keywords("awareness")
+        mentioned_diseases = matches.keywords("awareness_disease")
+        for keyword in AWARENESS_KEYWORDS:
+            if keyword in matched_keywords:
+                for disease in DISEASE_AWARENESS.keys():
+                    if disease in mentioned_diseases or keyword in disease:
+                        return "awareness", get_disease_awareness(disease, language)
     
     # Location/facilities - robust pattern matching (avoid false matches like 'vomiting')
-    facility_words = ['hospital', 'अस्पताल', 'clinic', 'क्लिनिक', 'pharmacy', 'फार्मेसी', 'doctor', 'डॉक्टर']
-    has_facility_word = any(word in message_lower for word in facility_words)
-    has_action_word = re.search(r'\b(find|locate|search|खोजें)\b', message_lower) is not None
-    has_location_prep = re.search(r'\b(in|near|at)\b', message_lower) is not None or (' में ' in f' {message_lower} ') or (' पास ' in f' {message_lower} ')
+    has_facility_word = "facility" in matches
+    has_action_word = "facility_action" in matches
+    has_location_prep = matches.any("location_prep", "location_postposition")
     
     # Trigger location intent only when it's clearly a location query:
     # 1) contains a facility word and a location preposition, or
@@ -952,58 +1422,158 @@ def handle_intent(message, language='english'):
     # Default: health query using AI
     return "health_query", None
 
-@app.route('/webhook', methods=['POST'])
+def detect_facility_type(message, matches=None):
+    """Facility type mentioned in a message (default: hospital)"""
+    matches = matches or INTENT_MATCHER.match(message)
+    facility_type = matches.first([f"facility_type:{name}" for name in FACILITY_TYPE_KEYWORDS])
+    return facility_type.split(':', 1)[1] if facility_type else "hospital"
+
+def extract_location_query(message):
+    """Pull the place name out of a facility search message"""
+    # Pattern 1: "find X in Y" or "find X near Y"
+    match = re.search(r'(?:find|locate|search|खोजें)\s+(?:\w+\s+)?(?:in|near|at|में|पास)\s+(.+)', message, re.IGNORECASE)
+    if match:
+        return match.group(1).strip()
+    
+    # Pattern 2: "X in Y" format
+    match = re.search(r'(?:hospital|clinic|pharmacy|doctor|अस्पताल|क्लिनिक|फार्मेसी)\s+(?:in|near|at|में|पास)\s+(.+)', message, re.IGNORECASE)
+    if match:
+        return match.group(1).strip()
+    
+    # Pattern 3: Just city name mentioned
+    words = message.split()
+    for i, word in enumerate(words):
+        if word.lower() in ['in', 'near', 'at', 'में', 'पास'] and i + 1 < len(words):
+            return ' '.join(words[i+1:])
+    return None
+
+def answer_text_message(message, language='english'):
+    """Full text answer path without Twilio/user state: returns (intent, response_text)"""
+    matches = INTENT_MATCHER.match(message)
+    intent, direct_response = handle_intent(message, language, matches)
+    if intent == "location_request":
+        location = extract_location_query(message)
+        if not location:
+            return intent, None
+        facility_type = detect_facility_type(message, matches)
+        return "location_" + facility_type, find_nearby_facilities(location, facility_type, language)
+    if direct_response:
+        return intent, direct_response
+    return intent, get_groq_chat_response(message, language)
+
+def record_emergency(from_number, language):
+    """Bookkeeping the emergency fast path defers until after the reply"""
+    try:
+        if get_user_language(from_number) != language:
+            set_user_language(from_number, language)
+        log_interaction("emergency", language, True)
+    except Exception as e:
+        print(f"Emergency logging error: {e}")
+
+# Fields of a Twilio webhook request used by the pipeline
+WebhookMessage = namedtuple("WebhookMessage", ["body", "from_number", "to_number", "media_url", "media_type",
+                                               "lat", "lng", "address"])
+
+def parse_webhook_form(values):
+    """WebhookMessage from the Twilio form fields (any mapping with .get)"""
+    return WebhookMessage(
+        body=(values.get('Body') or '').strip(),
+        from_number=values.get('From', ''),
+        to_number=values.get('To'),
+        media_url=values.get('MediaUrl0', None),
+        media_type=values.get('MediaContentType0', None),
+        # WhatsApp location payload (Twilio sends Latitude/Longitude on location share)
+        lat=values.get('Latitude') or values.get('Latitude0'),
+        lng=values.get('Longitude') or values.get('Longitude0'),
+        address=values.get('Address') or values.get('Address0')
+    )
+
+def is_emergency_fast_path(msg):
+    """Plain text emergencies get the pre-rendered reply before any database or model work"""
+    return bool(msg.body and not (msg.lat and msg.lng) and not msg.media_url and detect_emergency(msg.body))
+
+def print_incoming(msg):
+    print(f"\n{'='*60}")
+    print(f"📥 NEW MESSAGE")
+    print(f"From: {msg.from_number}")
+    print(f"Message: {msg.body[:100]}")
+    print(f"Media: {msg.media_url if msg.media_url else 'None'}")
+    if msg.lat and msg.lng:
+        print(f"📍 Location shared: {msg.lat},{msg.lng} ({msg.address or 'No address'})")
+    print(f"{'='*60}\n")
+
+@METRICS.timed("language_lookup")
+def resolve_user_language(from_number, incoming_msg):
+    """Stored language of the user, switched to the message's language when they differ"""
+    user_language = get_user_language(from_number)
+    if incoming_msg:
+        detected_lang = detect_language(incoming_msg)
+        if detected_lang != user_language:
+            set_user_language(from_number, detected_lang)
+            user_language = detected_lang
+    return user_language
+
+def language_command_reply(incoming_msg, from_number):
+    """Reply to an explicit "english"/"hindi" message (after storing the choice), else None"""
+    if incoming_msg.lower() not in ['english', 'hindi', 'हिंदी', 'अंग्रेजी']:
+        return None
+    lang = 'hindi' if 'hindi' in incoming_msg.lower() or 'हिंदी' in incoming_msg else 'english'
+    set_user_language(from_number, lang)
+    msg = f"भाषा हिंदी में सेट की गई। 🇮🇳" if lang == 'hindi' else "Language set to English. 🇬🇧"
+    return msg + "\n\n" + get_greeting_response(lang)
+
+def missing_location_message(language):
+    return "Please specify location. Example:\n'Find hospitals in Connaught Place Delhi'\n'Delhi में अस्पताल खोजें'" if language == 'english' else "कृपया स्थान बताएं। उदाहरण:\n'दिल्ली में अस्पताल खोजें'\n'Find hospitals in Delhi'"
+
+def image_failed_message(language):
+    msg = "Failed to process image. Please try again." if language == 'english' else "छवि प्रोसेस नहीं हो सकी।"
+    return msg + DISCLAIMER
+
+def profile_request(view):
+    """Profile the request (see profiling.py) when its header asks for it or the sample rate picks it"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        reason = profiling.sampling_reason(request.headers.get(profiling.HEADER))
+        if reason is None:
+            return view(*args, **kwargs)
+        with profiling.RequestProfile(f"{request.method} {request.path}", reason):
+            return view(*args, **kwargs)
+    return wrapper
+
+@routes.route('/webhook', methods=['POST'])
+@profile_request
+@METRICS.timed("webhook")
 def webhook():
     """Main webhook for receiving WhatsApp/SMS messages - FIXED"""
     try:
-        incoming_msg = request.values.get('Body', '').strip()
-        from_number = request.values.get('From', '')
-        media_url = request.values.get('MediaUrl0', None)
-        media_type = request.values.get('MediaContentType0', None)
-        # WhatsApp location payload (Twilio sends Latitude/Longitude on location share)
-        lat = request.values.get('Latitude') or request.values.get('Latitude0')
-        lng = request.values.get('Longitude') or request.values.get('Longitude0')
-        loc_address = request.values.get('Address') or request.values.get('Address0')
+        message = parse_webhook_form(request.values)
+        incoming_msg = message.body
+        from_number = message.from_number
+        media_url = message.media_url
+        media_type = message.media_type
+        lat, lng, loc_address = message.lat, message.lng, message.address
         
-        print(f"\n{'='*60}")
-        print(f"📥 NEW MESSAGE")
-        print(f"From: {from_number}")
-        print(f"Message: {incoming_msg[:100]}")
-        print(f"Media: {media_url if media_url else 'None'}")
-        if lat and lng:
-            print(f"📍 Location shared: {lat},{lng} ({loc_address or 'No address'})")
-        print(f"{'='*60}\n")
+        # Emergency fast path: pre-rendered TwiML before any database or model work
+        if is_emergency_fast_path(message):
+            language = detect_language(incoming_msg)
+            print(f"🚨 Emergency message from {from_number} - serving pre-rendered reply")
+            threading.Thread(target=record_emergency, args=(from_number, language), daemon=True).start()
+            return RESPONSE_CATALOG.get("emergency", language).twiml, 200, {'Content-Type': 'application/xml'}
         
-        # Get user's preferred language
-        user_language = get_user_language(from_number)
+        print_incoming(message)
         
-        # Detect language from message
-        if incoming_msg:
-            detected_lang = detect_language(incoming_msg)
-            if detected_lang != user_language:
-                set_user_language(from_number, detected_lang)
-                user_language = detected_lang
+        # Get user's preferred language, switched to the message's language
+        user_language = resolve_user_language(from_number, incoming_msg)
         
-        resp = MessagingResponse()
-        response_text = ""
+        streamed = False
         
         # Handle language setting
-        if incoming_msg.lower() in ['english', 'hindi', 'हिंदी', 'अंग्रेजी']:
-            lang = 'hindi' if 'hindi' in incoming_msg.lower() or 'हिंदी' in incoming_msg else 'english'
-            set_user_language(from_number, lang)
-            msg = f"भाषा हिंदी में सेट की गई। 🇮🇳" if lang == 'hindi' else "Language set to English. 🇬🇧"
-            response_text = msg + "\n\n" + get_greeting_response(lang)
+        response_text = language_command_reply(incoming_msg, from_number) or ""
         
         # Handle shared live location (high priority)
         if lat and lng:
             # Determine facility type from the text if specified
-            facility_type = "hospital"
-            if any(word in incoming_msg.lower() for word in ["pharmacy", "फार्मेसी", "medical store", "chemist"]):
-                facility_type = "pharmacy"
-            elif any(word in incoming_msg.lower() for word in ["clinic", "क्लिनिक"]):
-                facility_type = "clinic"
-            elif any(word in incoming_msg.lower() for word in ["doctor", "डॉक्टर"]):
-                facility_type = "doctor"
+            facility_type = detect_facility_type(incoming_msg)
             coords = f"{lat},{lng}"
             response_text = find_nearby_facilities(coords, facility_type, user_language)
             pretty_loc = loc_address if loc_address else coords
@@ -1012,11 +1582,12 @@ def webhook():
         elif media_url and 'image' in media_type:
             print("📸 Processing image...")
             try:
-                image_response = requests.get(
-                media_url,
-                auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
-               timeout=20
-        )
+                with METRICS.stage("media_fetch"):
+                    image_response = requests.get(
+                    media_url,
+                    auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
+                   timeout=20
+            )
 
                 if image_response.status_code != 200:
                     raise Exception(f"Failed to fetch media: {image_response.status_code}")
@@ -1031,54 +1602,25 @@ def webhook():
 
             except Exception as e:
                 print(f"❌ Image processing error: {e}")
-                msg = "Failed to process image. Please try again." if user_language == 'english' else "छवि प्रोसेस नहीं हो सकी।"
-                response_text = msg + DISCLAIMER
+                response_text = image_failed_message(user_language)
 
                         
         
         # Handle text messages - FIXED
         elif incoming_msg:
-            intent, direct_response = handle_intent(incoming_msg, user_language)
+            matches = INTENT_MATCHER.match(incoming_msg)
+            intent, direct_response = handle_intent(incoming_msg, user_language, matches)
             
             if intent == "location_request":
                 # Enhanced location extraction
-                location = None
-                
-                # Pattern 1: "find X in Y" or "find X near Y"
-                match = re.search(r'(?:find|locate|search|खोजें)\s+(?:\w+\s+)?(?:in|near|at|में|पास)\s+(.+)', incoming_msg, re.IGNORECASE)
-                if match:
-                    location = match.group(1).strip()
-                
-                # Pattern 2: "X in Y" format
-                if not location:
-                    match = re.search(r'(?:hospital|clinic|pharmacy|doctor|अस्पताल|क्लिनिक|फार्मेसी)\s+(?:in|near|at|में|पास)\s+(.+)', incoming_msg, re.IGNORECASE)
-                    if match:
-                        location = match.group(1).strip()
-                
-                # Pattern 3: Just city name mentioned
-                if not location:
-                    # Extract any word that might be a location
-                    words = incoming_msg.split()
-                    for i, word in enumerate(words):
-                        if word.lower() in ['in', 'near', 'at', 'में', 'पास'] and i + 1 < len(words):
-                            location = ' '.join(words[i+1:])
-                            break
+                location = extract_location_query(incoming_msg)
                 
                 if location:
-                    # Determine facility type
-                    facility_type = "hospital"
-                    if any(word in incoming_msg.lower() for word in ["pharmacy", "फार्मेसी", "medical store", "chemist"]):
-                        facility_type = "pharmacy"
-                    elif any(word in incoming_msg.lower() for word in ["clinic", "क्लिनिक"]):
-                        facility_type = "clinic"
-                    elif any(word in incoming_msg.lower() for word in ["doctor", "डॉक्टर"]):
-                        facility_type = "doctor"
-                    
+                    facility_type = detect_facility_type(incoming_msg, matches)
                     response_text = find_nearby_facilities(location, facility_type, user_language)
                     log_interaction("location_" + facility_type, user_language, True, location)
                 else:
-                    msg = "Please specify location. Example:\n'Find hospitals in Connaught Place Delhi'\n'Delhi में अस्पताल खोजें'" if user_language == 'english' else "कृपया स्थान बताएं। उदाहरण:\n'दिल्ली में अस्पताल खोजें'\n'Find hospitals in Delhi'"
-                    response_text = msg
+                    response_text = missing_location_message(user_language)
             
             elif direct_response:
                 response_text = direct_response
@@ -1086,61 +1628,90 @@ def webhook():
             
             else:
                 # AI-powered health query
-                response_text = get_openai_response(incoming_msg, user_language)
+                if Config.GROQ_STREAMING and groq_client and twilio_client:
+                    send = streaming.twilio_sender(twilio_client, message.to_number or TWILIO_PHONE_NUMBER, from_number)
+                    response_text, streamed = get_groq_streaming_response(incoming_msg, user_language, send)
+                else:
+                    response_text = get_openai_response(incoming_msg, user_language)
                 log_interaction("health_query", user_language, True)
         
         else:
             # Empty message - send greeting
             response_text = get_greeting_response(user_language)
         
-        # Send response in chunks (WhatsApp limit: 1600 chars)
-        if response_text:
-            print(f"📤 Sending response: {len(response_text)} characters")
-            chunk_size = 1500
-            
-            if len(response_text) <= chunk_size:
-                resp.message(response_text)
-            else:
-                # Split into chunks at sentence boundaries
-                chunks = []
-                current_chunk = ""
-                sentences = response_text.split('\n')
-                
-                for sentence in sentences:
-                    if len(current_chunk) + len(sentence) + 1 <= chunk_size:
-                        current_chunk += sentence + '\n'
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk.strip())
-                        current_chunk = sentence + '\n'
-                
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                
-                for chunk in chunks:
-                    resp.message(chunk)
-                
-                print(f"   Split into {len(chunks)} chunks")
-        else:
-            print("⚠️ Empty response - sending fallback")
-            fallback = "Sorry, something went wrong. Please try again." if user_language == 'english' else "क्षमा करें, कुछ गलत हुआ। कृपया पुनः प्रयास करें।"
-            resp.message(fallback)
-        
-        print(f"✅ Response sent successfully\n")
-        return str(resp), 200, {'Content-Type': 'application/xml'}
+        return render_reply(response_text, streamed, user_language), 200, {'Content-Type': 'application/xml'}
     
     except Exception as e:
         print(f"❌ WEBHOOK ERROR: {type(e).__name__}: {str(e)}")
         import traceback
         traceback.print_exc()
         
-        resp = MessagingResponse()
-        error_msg = "System error. Please try again later." if user_language == 'english' else "सिस्टम त्रुटि। कृपया बाद में प्रयास करें।"
-        resp.message(error_msg)
         log_interaction("error", user_language, False)
-        return str(resp), 200, {'Content-Type': 'application/xml'}
+        return render_error_reply(user_language), 200, {'Content-Type': 'application/xml'}
 
-@app.route('/health', methods=['GET'])
+@METRICS.timed("twiml_build")
+def render_reply(response_text, streamed=False, user_language='english'):
+    """TwiML body for a webhook reply: pre-rendered for catalog texts, chunked otherwise"""
+    resp = MessagingResponse()
+    # Send response in chunks (WhatsApp limit: 1600 chars)
+    if streamed:
+        print("📨 Response already delivered via Twilio REST API")
+    elif response_text:
+        print(f"📤 Sending response: {len(response_text)} characters")
+        entry = RESPONSE_CATALOG.for_text(response_text)
+        if entry:
+            print(f"📇 Serving pre-rendered {entry.key} reply")
+            return entry.twiml
+        
+        chunks = response_catalog.split_message(response_text)
+        for chunk in chunks:
+            resp.message(chunk)
+        if len(chunks) > 1:
+            print(f"   Split into {len(chunks)} chunks")
+    else:
+        print("⚠️ Empty response - sending fallback")
+        fallback = "Sorry, something went wrong. Please try again." if user_language == 'english' else "क्षमा करें, कुछ गलत हुआ। कृपया पुनः प्रयास करें।"
+        resp.message(fallback)
+    
+    print(f"✅ Response sent successfully\n")
+    return str(resp)
+
+@METRICS.timed("twiml_build")
+def render_error_reply(user_language='english'):
+    resp = MessagingResponse()
+    error_msg = "System error. Please try again later." if user_language == 'english' else "सिस्टम त्रुटि। कृपया बाद में प्रयास करें।"
+    resp.message(error_msg)
+    return str(resp)
+
+def api_key_error(allowed_keys):
+    """Error response unless the request carries one of allowed_keys (X-API-Key or Bearer); None when it does"""
+    if not allowed_keys:
+        return jsonify({"error": "Endpoint disabled: no API keys configured"}), 403
+    auth = request.headers.get('Authorization', '')
+    api_key = request.headers.get('X-API-Key') or (auth[7:] if auth.startswith('Bearer ') else '')
+    if not any(hmac.compare_digest(api_key.encode(), key.encode()) for key in allowed_keys):
+        return jsonify({"error": "Invalid or missing API key"}), 401
+    return None
+
+@routes.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer an NDJSON batch of {id, message, language}, streaming NDJSON results as they complete"""
+    denied = api_key_error(Config.BATCH_API_KEYS)
+    if denied:
+        return denied
+    
+    items, errors = batch.parse_batch(request.get_data().splitlines(), detect_language=detect_language)
+    print(f"📦 Batch request: {len(items)} items, {len(errors)} rejected")
+    
+    def results():
+        yield from errors
+        for result in batch.run_batch(items, answer_text_message):
+            log_interaction("batch_" + result.get("intent", "error"), result.get("language"), "error" not in result)
+            yield result
+    
+    return Response(stream_with_context(batch.to_ndjson(results())), mimetype='application/x-ndjson')
+
+@routes.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
@@ -1164,7 +1735,7 @@ def health_check():
         "timestamp": datetime.now().isoformat()
     }), 200
 
-@app.route('/test_chat', methods=['GET'])
+@routes.route('/test_chat', methods=['GET'])
 def test_chat():
     """Test chat connectivity (prefers Groq; falls back to Hugging Face)"""
     diagnostics = {
@@ -1175,11 +1746,18 @@ def test_chat():
     try:
         if groq_client:
             print("🧪 Testing Groq chat")
-            response = groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": test_query}],
-                max_tokens=50
-            )
+            model = MODEL_ROUTER.choose("brief", preferred=generation_budget.BUDGETS["brief"]["model"])
+            started = time.perf_counter()
+            try:
+                response = groq_client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": test_query}],
+                    max_tokens=50
+                )
+            except Exception as e:
+                MODEL_ROUTER.record(model, time.perf_counter() - started, error=e)
+                raise
+            MODEL_ROUTER.record(model, time.perf_counter() - started, budget_class="brief")
             text = response.choices[0].message.content
             return jsonify({
                 "status": "success",
@@ -1187,7 +1765,7 @@ def test_chat():
                 "diagnostics": diagnostics,
                 "response": text,
                 "provider": "groq",
-                "model_used": "llama-3.1-8b-instant"
+                "model_used": model
             }), 200
         else:
             print("🧪 Testing Hugging Face chat")
@@ -1205,14 +1783,14 @@ def test_chat():
             "diagnostics": diagnostics
         }), 500
 
-@app.route('/test_huggingface', methods=['GET', 'POST'])
+@routes.route('/test_huggingface', methods=['GET', 'POST'])
             
 
-@app.route('/stats', methods=['GET'])
+@routes.route('/stats', methods=['GET'])
 def get_stats():
     """Get usage statistics"""
     try:
-        conn = sqlite3.connect('healnet.db')
+        conn = sqlite3.connect(Config.DATABASE_PATH)
         c = conn.cursor()
         
         c.execute("SELECT COUNT(*) FROM chat_logs")
@@ -1234,20 +1812,204 @@ def get_stats():
             "successful_queries": successful_queries,
             "success_rate": f"{(successful_queries/total_queries*100):.2f}%" if total_queries > 0 else "0%",
             "top_intents": [{"intent": intent, "count": count} for intent, count in top_intents],
-            "language_distribution": [{"language": lang, "count": count} for lang, count in language_stats]
+            "language_distribution": [{"language": lang, "count": count} for lang, count in language_stats],
+            "streaming": streaming.stream_stats(),
+            "coalescing": LLM_SINGLE_FLIGHT.stats(),
+            "llm": llm.stats() if llm else None,
+            "near_duplicate_cache": NEAR_DUPLICATE_INDEX.stats(),
+            "generation_budgets": generation_budget.BUDGET_STATS.snapshot(),
+            "retrieval": RETRIEVAL.stats(),
+            "models": MODEL_ROUTER.snapshot(),
+            "response_catalog": RESPONSE_CATALOG.stats(),
+            "geocoder": GEOCODER.snapshot(),
+            "facility_index": FACILITY_INDEX.snapshot(),
+            "geo_cache": GEO_CACHE.snapshot(),
+            "overpass": OVERPASS.stats(),
+            "facility_prefetch": FACILITY_PREFETCHER.stats(),
+            "warmup": WARMUP_TIMINGS,
+            "background_leader": BACKGROUND_LEADER.snapshot(),
+            "profiling": profiling.COUNTERS.snapshot(),
+            "image_models": IMAGE_MODELS.stats()
         }), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route("/test_whatsapp", methods=["POST"])
+@routes.route('/models/stats', methods=['GET'])
+def model_stats():
+    """Rolling latency/error statistics and health per upstream model"""
+    return jsonify({
+        "models": MODEL_ROUTER.snapshot(),
+        "degraded": MODEL_ROUTER.degraded_models()
+    }), 200
+
+@routes.route('/catalog/refresh', methods=['POST'])
+def refresh_response_catalog():
+    """Re-render the static reply catalog if its data tables changed"""
+    rebuilt = RESPONSE_CATALOG.refresh()
+    return jsonify({"rebuilt": rebuilt, **RESPONSE_CATALOG.stats()}), 200
+
+@routes.route('/export/chat_logs', methods=['GET'])
+def export_chat_logs():
+    """
+    Stream chat_logs as CSV or NDJSON (filters: since, until, intent, language, success).
+    Needs one of EXPORT_API_KEYS. X-Export-After-Id is the after_id that resumes
+    after this export once it has been read to the end.
+    """
+    denied = api_key_error(Config.EXPORT_API_KEYS)
+    if denied:
+        return denied
+    
+    fmt = request.args.get('format', 'csv').lower()
+    use_gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        filters = export.parse_filters(
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            intent=request.args.get('intent'),
+            language=request.args.get('language'),
+            success=request.args.get('success')
+        )
+        after_id = int(request.args.get('after_id', 0))
+        limit = export.parse_limit(request.args.get('limit'))
+        last_id, rows = export.export_bounds(filters, after_id, limit)
+        chunks = export.stream_export(fmt, filters, after_id, limit, use_gzip, until_id=last_id or after_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    mimetype, filename = export.export_content_type(fmt, use_gzip)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Export-After-Id': str(last_id or after_id),
+            'X-Export-Rows': str(rows)
+        }
+    )
+
+@routes.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latencies and counters in the Prometheus text format, summed over all workers"""
+    return Response(METRICS.render(), content_type=metrics.CONTENT_TYPE)
+
+@routes.route("/test_whatsapp", methods=["POST"])
 def test_whatsapp():
     """Test WhatsApp connectivity"""
     resp = MessagingResponse()
     resp.message("✅ HealNet is LIVE!\n\n🔧 All features working (100% FREE):\n✓ Voice messages (Hugging Face Whisper)\n✓ Image analysis (Hugging Face Vision)\n✓ Location search (Google Maps)\n✓ AI health queries (Hugging Face Chat)\n\nSend 'hi' to start! 🏥")
     return str(resp), 200, {'Content-Type': 'application/xml'}
 
+# --- Startup -------------------------------------------------------------------
+# Importing this module only defines tables and helpers. Databases, clients,
+# indexes, models and background workers are set up by warmup hooks, which
+# create_app() runs (Config.WARMUP) and tools can run explicitly.
+
+def load_indexes():
+    """In-memory indexes read from disk: paraphrase cache, retrieval, gazetteer, facilities"""
+    if Config.NEAR_DUPLICATE_CACHE:
+        NEAR_DUPLICATE_INDEX.load()
+    if Config.RETRIEVAL_ENABLED:
+        RETRIEVAL.rebuild(retrieval.build_documents(
+            HEALTH_FAQ, DISEASE_AWARENESS, FALLBACK_RESPONSES, get_disease_awareness, Config.RETRIEVAL_ARTICLES_DIR))
+    GEOCODER.load()
+    FACILITY_INDEX.load()
+
+def load_image_models():
+    IMAGE_MODELS.load()
+
+# One worker per deployment runs the jobs that call upstreams on their own (see leader.py)
+BACKGROUND_LEADER = leader.LeaderElection()
+
+def start_leader_jobs():
+    if llm:
+        MODEL_ROUTER.start_probing(probe_model)
+    
+    if Config.PREWARM_ON_STARTUP:
+        threading.Thread(target=prewarm_cache, name="cache-prewarm", daemon=True).start()
+    
+    if Config.FACILITY_PREFETCH_ENABLED:
+        FACILITY_PREFETCHER.start()
+
+def start_background_workers():
+    METRICS.start()
+    BACKGROUND_LEADER.run_when_elected(start_leader_jobs)
+
+# Run in this order; each at most once per process
+WARMUP_HOOKS = {
+    "database": init_db,
+    "clients": init_clients,
+    "indexes": load_indexes,
+    "models": load_image_models,
+    "background": start_background_workers,
+}
+# Seconds each hook took in this process; a hook listed here has run
+WARMUP_TIMINGS = {}
+_warmup_lock = threading.Lock()
+
+# Hooks that leave no threads, sockets or open SQLite connections behind, so a
+# preloading gunicorn master can run them and share the result with its workers.
+# Not "models": an initialised TensorFlow runtime (thread pools, locks) does not
+# survive fork, so the models load in each worker unless Config.PRELOAD_MODELS
+FORK_SAFE_HOOKS = ("database", "indexes")
+
+def preload_hooks():
+    """Hooks a pre-fork master runs: the fork-safe part of Config.WARMUP, plus the models if Config.PRELOAD_MODELS (opt-in)"""
+    names = [name for name in Config.WARMUP if name in FORK_SAFE_HOOKS]
+    if Config.PRELOAD_MODELS and "models" not in names:
+        names.append("models")
+    return names
+
+def after_fork():
+    """Replace per-process state a forked worker inherited from the preloading master"""
+    global OVERPASS
+    # Pooled keep-alive connections and executor threads belong to the process that made them
+    OVERPASS = overpass_client.OverpassClient()
+    # Cross-process single-flight tells workers apart by owner id
+    LLM_SINGLE_FLIGHT.after_fork()
+    METRICS.after_fork()
+
+def warmup(names=None):
+    """Run the named startup hooks not run yet (default Config.WARMUP); returns seconds per hook run now"""
+    names = Config.WARMUP if names is None else names
+    unknown = set(names) - set(WARMUP_HOOKS)
+    if unknown:
+        raise ValueError(f"Unknown warmup hooks: {', '.join(sorted(unknown))}")
+    timings = {}
+    with _warmup_lock:
+        for name, hook in WARMUP_HOOKS.items():
+            if name in names and name not in WARMUP_TIMINGS:
+                started = time.perf_counter()
+                hook()
+                timings[name] = WARMUP_TIMINGS[name] = round(time.perf_counter() - started, 3)
+    if timings:
+        print(f"🔥 Warmup done: {timings}")
+    return timings
+
+def create_app(warmup_hooks=None):
+    """Flask application serving the HealNet routes, after running the warmup hooks"""
+    flask_app = Flask(__name__)
+    flask_app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+    flask_app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
+    flask_app.register_blueprint(routes)
+    warmup(warmup_hooks)
+    return flask_app
+
+_default_app = None
+_default_app_lock = threading.Lock()
+
+def __getattr__(name):
+    # `gunicorn app:app`, `from app import app` and app.app build the default application on first use
+    global _default_app
+    if name == 'app':
+        with _default_app_lock:
+            if _default_app is None:
+                _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == '__main__':
+    application = create_app()
     print("\n" + "="*70)
     print("🏥 HealNet - 100% FREE Backend (Hugging Face)")
     print("="*70)
@@ -1278,4 +2040,4 @@ if __name__ == '__main__':
     print("   No credit card required - completely FREE!")
     print("="*70 + "\n")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    application.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
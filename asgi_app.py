@@ -0,0 +1,489 @@
+"""
+ASGI serving mode for the webhook pipeline
+
+Serves POST /webhook on an event loop. The Twilio media download and the
+Groq, Nominatim and Overpass calls go through async HTTP clients, so one
+worker keeps many conversations in flight while they wait on upstreams,
+instead of one per thread. SQLite helpers (user language, response and
+geo caches, interaction logs) run in the default thread pool, and image
+inference runs in its own small executor
+(Config.ASYNC_INFERENCE_WORKERS) so TensorFlow never blocks the loop.
+Routing, caching and reply rendering use the same helpers as the Flask
+webhook in app.py, so both modes return the same TwiML.
+
+Every other route (health, stats, batch API, exports) is the Flask app,
+called in a worker thread. Its responses are buffered, not streamed.
+
+Run with:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000 --workers 2
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import io
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import app as flask_app
+import llm_client
+import overpass_client
+import profiling
+import rate_limit
+import singleflight
+from config import Config
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+XML_HEADERS = [(b"content-type", b"application/xml")]
+
+
+class AsyncServices:
+    """Event-loop clients of one worker; bound to the loop they were started on"""
+
+    def __init__(self):
+        self.loop = None
+        self.wsgi_app = None
+        self.http = None
+        self.overpass = None
+        self.llm = None
+        self.single_flight = singleflight.AsyncSingleFlight()
+        self.inference = ThreadPoolExecutor(max_workers=Config.ASYNC_INFERENCE_WORKERS,
+                                            thread_name_prefix="inference")
+        # Fire-and-forget bookkeeping tasks, referenced until they finish
+        self.background = set()
+
+    def start(self):
+        if httpx is None:
+            raise RuntimeError("httpx is required for the ASGI webhook")
+        self.loop = asyncio.get_running_loop()
+        # The Flask app for the other routes; creating it runs the warmup hooks (clients, indexes, ...)
+        self.wsgi_app = flask_app.app
+        pool_size = Config.ASYNC_HTTP_POOL_SIZE
+        self.http = httpx.AsyncClient(
+            headers=flask_app.OSM_HEADERS,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(10.0)
+        )
+        self.overpass = overpass_client.AsyncOverpassClient()
+        if flask_app.llm is not None:
+            try:
+                self.llm = llm_client.AsyncLLMClient(api_key=flask_app.GROQ_API_KEY, base_url=Config.GROQ_BASE_URL)
+            except Exception as e:
+                print(f"❌ Failed to initialize async Groq client: {e}")
+        print(f"✅ Async webhook services started (Groq: {self.llm is not None})")
+
+    async def aclose(self):
+        if self.http is not None:
+            await self.http.aclose()
+            await self.overpass.aclose()
+        if self.llm is not None:
+            await self.llm.aclose()
+        self.loop = self.http = self.overpass = self.llm = None
+
+    def spawn(self, fn, *args):
+        """Run a blocking helper in the thread pool without waiting for it"""
+        task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+
+    def stats(self):
+        return {
+            "single_flight": self.single_flight.stats(),
+            "overpass": self.overpass.stats() if self.overpass else None,
+            "llm": self.llm.stats() if self.llm else None,
+            "background_tasks": len(self.background)
+        }
+
+
+SERVICES = AsyncServices()
+
+
+async def get_services():
+    """SERVICES started on the running loop (restarted if an earlier loop went away)"""
+    if SERVICES.loop is not asyncio.get_running_loop():
+        if SERVICES.loop is not None and not SERVICES.loop.is_closed():
+            await SERVICES.aclose()
+        SERVICES.start()
+    return SERVICES
+
+
+# --- Upstream calls ---------------------------------------------------------------
+
+async def nominatim_json(services, path, params, default):
+    """
+    Parsed Nominatim response, or `default` on a non-200 answer. Raises
+    rate_limit.RateLimited when the next free slot is more than
+    NOMINATIM_MAX_WAIT away.
+    """
+    # Shares the 1 request/s with the Flask workers: the slot file is locked in a
+    # thread, the wait for the slot is an asyncio sleep
+    delay = await asyncio.to_thread(flask_app.NOMINATIM_LIMITER.reserve, Config.NOMINATIM_MAX_WAIT)
+    if delay > 0:
+        await asyncio.sleep(delay)
+    response = await services.http.get(f"{flask_app.NOMINATIM_URL}/{path}", params=params, timeout=10)
+    return response.json() if response.status_code == 200 else default
+
+
+async def find_nearby_facilities_async(location_query, facility_type="hospital", language='english'):
+    """app.find_nearby_facilities with async Nominatim / Overpass calls"""
+    services = await get_services()
+    geo = flask_app.GEO_CACHE
+    try:
+        print(f"📍 [OSM] Searching for {facility_type} near: {location_query}")
+
+        with flask_app.METRICS.stage("geocode"):
+            coords = flask_app.parse_coords(location_query)
+            if coords:
+                lat, lng = coords
+                formatted_address = await asyncio.to_thread(geo.get_reverse, lat, lng)
+                if not formatted_address:
+                    try:
+                        rev_data = await nominatim_json(services, "reverse", {"lat": lat, "lon": lng, "format": "jsonv2"}, {})
+                    except rate_limit.RateLimited as e:
+                        print(f"⏳ Nominatim busy ({e}) - showing coordinates")
+                        rev_data = {}
+                    formatted_address = rev_data.get('display_name', f"{lat},{lng}")
+                    if rev_data.get('display_name'):
+                        await asyncio.to_thread(geo.put_reverse, lat, lng, formatted_address)
+            else:
+                # Fuzzy gazetteer scan: CPU work, kept off the loop like the cache calls
+                resolution = await asyncio.to_thread(flask_app.GEOCODER.resolve, location_query)
+                geo_data = []
+                if resolution and not resolution.partial:
+                    print(f"📍 [Gazetteer] '{location_query}' -> {resolution.place.display_name} ({resolution.method})")
+                else:
+                    cached = await asyncio.to_thread(geo.get_geocode, location_query)
+                    if cached:
+                        geo_data = [cached]
+                    else:
+                        try:
+                            geo_data = await nominatim_json(services, "search", {
+                                "q": location_query, "format": "jsonv2", "limit": 1, "countrycodes": "in"}, [])
+                            if not geo_data:
+                                # Retry without country bias
+                                geo_data = await nominatim_json(services, "search", {
+                                    "q": location_query, "format": "jsonv2", "limit": 1}, [])
+                        except rate_limit.RateLimited as e:
+                            print(f"⏳ Nominatim busy ({e})")
+                            if not resolution:
+                                return flask_app.location_timeout_message(language)
+                        if geo_data:
+                            await asyncio.to_thread(geo.put_geocode, location_query, geo_data[0]['lat'], geo_data[0]['lon'],
+                                                    geo_data[0].get('display_name', location_query))
+                if geo_data:
+                    lat, lng = geo_data[0]['lat'], geo_data[0]['lon']
+                    formatted_address = geo_data[0].get('display_name', location_query)
+                elif resolution:
+                    lat, lng = resolution.place.lat, resolution.place.lon
+                    formatted_address = resolution.place.display_name
+                else:
+                    return flask_app.location_not_found_message(location_query, language)
+
+        print(f"✅ [OSM] Location found: {formatted_address}")
+        lat_f, lng_f = float(lat), float(lng)
+
+        local = await asyncio.to_thread(flask_app.local_facilities_response, lat_f, lng_f, facility_type,
+                                        language, formatted_address)
+        if local:
+            return local
+
+        cached_facilities = await asyncio.to_thread(geo.get_facilities, lat_f, lng_f, facility_type)
+        if cached_facilities:
+            print(f"✅ [Cache] {len(cached_facilities)} facilities near {formatted_address}")
+            return flask_app.format_facilities_response(cached_facilities[:5], facility_type, language, formatted_address)
+
+        tags = flask_app.AMENITY_TAGS.get(facility_type, ["hospital", "clinic", "doctors"])
+        try:
+            with flask_app.METRICS.stage("overpass"):
+                elements = await services.overpass.facilities(lat_f, lng_f, tags, radius_m=flask_app.OVERPASS_RADIUS_M)
+        except overpass_client.OverpassUnavailable as e:
+            print(f"⚠️ Overpass unavailable: {e}")
+            elements = []
+        return await asyncio.to_thread(flask_app.overpass_facilities_response, elements, lat_f, lng_f,
+                                       facility_type, language, formatted_address)
+
+    except httpx.TimeoutException:
+        print("❌ OSM API timeout")
+        return flask_app.location_timeout_message(language)
+    except Exception as e:
+        print(f"❌ Location search error: {type(e).__name__}: {str(e)}")
+        return flask_app.location_error_message(language)
+
+
+async def groq_completion_async(message, language):
+    """app._groq_completion on the async LLM client"""
+    services = await get_services()
+    if services.llm is None:
+        print("ℹ️ Groq not configured, using offline fallback")
+        return flask_app.get_fallback_response(message, language)
+
+    budget, model, request_kwargs = flask_app.completion_request(message, language)
+    started = time.perf_counter()
+    try:
+        with flask_app.METRICS.stage("llm_call"):
+            response = await services.llm.create(**request_kwargs)
+        answer = await asyncio.to_thread(flask_app.completion_answer, message, language, budget, model,
+                                         response, time.perf_counter() - started)
+        if answer:
+            return answer
+    except llm_client.LLMUnavailable as e:
+        flask_app.completion_failed(model, time.perf_counter() - started, e)
+
+    return flask_app.get_fallback_response(message, language)
+
+
+async def get_chat_response_async(message, language='english'):
+    """app.get_groq_chat_response with identical in-flight queries coalesced on the loop"""
+    answer = await asyncio.to_thread(flask_app.answer_without_llm, message, language)
+    if answer:
+        return answer
+
+    services = await get_services()
+    key = singleflight.query_key(message, language)
+    return await services.single_flight.do(
+        key,
+        lambda: groq_completion_async(message, language),
+        lookup=lambda: flask_app.get_keyed_response(key)
+    )
+
+
+async def analyze_media_async(media_url, language):
+    """Download a Twilio media image and run the models on the inference executor"""
+    services = await get_services()
+    print("📸 Processing image...")
+    try:
+        auth = (flask_app.TWILIO_ACCOUNT_SID, flask_app.TWILIO_AUTH_TOKEN) if flask_app.TWILIO_ACCOUNT_SID else None
+        with flask_app.METRICS.stage("media_fetch"):
+            image_response = await services.http.get(media_url, auth=auth, timeout=20, follow_redirects=True)
+
+        if image_response.status_code != 200:
+            raise Exception(f"Failed to fetch media: {image_response.status_code}")
+
+        if 'image' not in image_response.headers.get('Content-Type', ''):
+            raise Exception("Media is not an image")
+
+        loop = asyncio.get_running_loop()
+        # In this request's context, so a profiled request gets the inference spans
+        response_text = await loop.run_in_executor(services.inference, contextvars.copy_context().run,
+                                                   flask_app.analyze_medical_image,
+                                                   image_response.content, language)
+        await asyncio.to_thread(flask_app.log_interaction, "medical_image_analysis", language, True)
+        return response_text
+
+    except Exception as e:
+        print(f"❌ Image processing error: {e}")
+        return flask_app.image_failed_message(language)
+
+
+# --- Webhook ----------------------------------------------------------------------
+
+async def handle_webhook(values):
+    """TwiML reply for one Twilio webhook request (form fields in `values`)"""
+    services = await get_services()
+    user_language = 'english'
+    try:
+        message = flask_app.parse_webhook_form(values)
+        incoming_msg = message.body
+        from_number = message.from_number
+
+        if flask_app.is_emergency_fast_path(message):
+            language = flask_app.detect_language(incoming_msg)
+            print(f"🚨 Emergency message from {from_number} - serving pre-rendered reply")
+            services.spawn(flask_app.record_emergency, from_number, language)
+            return flask_app.RESPONSE_CATALOG.get("emergency", language).twiml
+
+        flask_app.print_incoming(message)
+
+        user_language = await asyncio.to_thread(flask_app.resolve_user_language, from_number, incoming_msg)
+
+        streamed = False
+        response_text = ""
+        if incoming_msg:
+            response_text = await asyncio.to_thread(flask_app.language_command_reply, incoming_msg, from_number) or ""
+
+        if message.lat and message.lng:
+            facility_type = flask_app.detect_facility_type(incoming_msg)
+            coords = f"{message.lat},{message.lng}"
+            response_text = await find_nearby_facilities_async(coords, facility_type, user_language)
+            services.spawn(flask_app.log_interaction, "location_shared_" + facility_type, user_language, True,
+                           message.address if message.address else coords)
+
+        elif message.media_url and 'image' in message.media_type:
+            response_text = await analyze_media_async(message.media_url, user_language)
+
+        elif incoming_msg:
+            matches = flask_app.INTENT_MATCHER.match(incoming_msg)
+            intent, direct_response = flask_app.handle_intent(incoming_msg, user_language, matches)
+
+            if intent == "location_request":
+                location = flask_app.extract_location_query(incoming_msg)
+                if location:
+                    facility_type = flask_app.detect_facility_type(incoming_msg, matches)
+                    response_text = await find_nearby_facilities_async(location, facility_type, user_language)
+                    services.spawn(flask_app.log_interaction, "location_" + facility_type, user_language, True, location)
+                else:
+                    response_text = flask_app.missing_location_message(user_language)
+
+            elif direct_response:
+                response_text = direct_response
+                services.spawn(flask_app.log_interaction, intent, user_language, True)
+
+            else:
+                if Config.GROQ_STREAMING and flask_app.groq_client and flask_app.twilio_client:
+                    # Streaming sends through the Twilio REST client as tokens arrive - keep it on a thread
+                    send = flask_app.streaming.twilio_sender(flask_app.twilio_client,
+                                                             message.to_number or flask_app.TWILIO_PHONE_NUMBER,
+                                                             from_number)
+                    response_text, streamed = await asyncio.to_thread(
+                        flask_app.get_groq_streaming_response, incoming_msg, user_language, send)
+                else:
+                    response_text = await get_chat_response_async(incoming_msg, user_language)
+                services.spawn(flask_app.log_interaction, "health_query", user_language, True)
+
+        else:
+            response_text = flask_app.get_greeting_response(user_language)
+
+        return flask_app.render_reply(response_text, streamed, user_language)
+
+    except Exception as e:
+        print(f"❌ WEBHOOK ERROR: {type(e).__name__}: {str(e)}")
+        traceback.print_exc()
+
+        services.spawn(flask_app.log_interaction, "error", user_language, False)
+        return flask_app.render_error_reply(user_language)
+
+
+# --- ASGI plumbing ----------------------------------------------------------------
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        event = await receive()
+        body.extend(event.get("body", b""))
+        if len(body) > flask_app.MAX_CONTENT_LENGTH:
+            raise ValueError("request body too large")
+        if not event.get("more_body"):
+            return bytes(body)
+
+
+def form_values(scope, body):
+    """Query string and urlencoded form fields, first value per name (query string wins, as in request.values)"""
+    values = {}
+    for name, value in parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True):
+        values.setdefault(name, value)
+    content_type = dict(scope["headers"]).get(b"content-type", b"")
+    if content_type.startswith(b"application/x-www-form-urlencoded"):
+        for name, value in parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True):
+            values.setdefault(name, value)
+    return values
+
+
+def wsgi_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = "HTTP_" + name
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    """(status, headers, body) of a WSGI app for one request"""
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [status, headers]
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return started[0], started[1], body
+
+
+async def send_response(send, status, headers, body):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def lifespan(receive, send):
+    while True:
+        event = await receive()
+        if event["type"] == "lifespan.startup":
+            await get_services()
+            await send({"type": "lifespan.startup.complete"})
+        elif event["type"] == "lifespan.shutdown":
+            await SERVICES.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI 3 entry point"""
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    try:
+        body = await read_body(receive)
+    except ValueError:
+        return await send_response(send, 413, [(b"content-type", b"text/plain")], b"Request body too large")
+
+    if scope["path"] == "/webhook" and scope["method"] == "POST":
+        reason = profiling.sampling_reason(
+            dict(scope["headers"]).get(profiling.HEADER.lower().encode(), b"").decode("latin-1"))
+        # Spans only: stack samples of the loop thread would mix in every other request
+        profile = (profiling.RequestProfile("POST /webhook", reason, sample_stacks=False)
+                   if reason else contextlib.nullcontext())
+        with profile, flask_app.METRICS.stage("webhook"):
+            twiml = await handle_webhook(form_values(scope, body))
+        return await send_response(send, 200, XML_HEADERS, twiml.encode("utf-8"))
+
+    services = await get_services()
+    status, headers, payload = await asyncio.to_thread(call_wsgi, services.wsgi_app, wsgi_environ(scope, body))
+    await send_response(send, int(status.split(" ", 1)[0]),
+                        [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+                        payload)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except Exception:
+        uvicorn = None
+    if uvicorn is None:
+        sys.exit("uvicorn is required to serve asgi_app (pip install uvicorn)")
+    uvicorn.run("asgi_app:app", host='0.0.0.0', port=5000)
@@ -0,0 +1,108 @@
+"""
+Bulk chat processing for partner integrations
+
+Parses NDJSON batches of {"id", "message", "language"}, answers each unique
+question once with bounded concurrency, and yields NDJSON result lines as
+answers complete (duplicates in the batch share one answer).
+"""
+
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import Config
+from singleflight import query_key
+
+# Reply languages of the answer path, by the names and codes a batch may use
+BATCH_LANGUAGES = {"english": "english", "en": "english", "hindi": "hindi", "hi": "hindi"}
+
+
+def parse_batch(lines, max_items=None, detect_language=None):
+    """
+    Parse NDJSON lines into items. Returns (items, errors) where errors are
+    ready-to-send result lines for malformed entries.
+    """
+    max_items = max_items or Config.BATCH_MAX_ITEMS
+    items, errors = [], []
+    for line_no, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+            if not isinstance(entry, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            errors.append({"id": None, "line": line_no, "error": f"Invalid JSON: {e}"})
+            continue
+        item_id = entry.get("id", line_no)
+        message = str(entry.get("message") or "").strip()
+        if not message:
+            errors.append({"id": item_id, "error": "Missing message"})
+            continue
+        if len(items) >= max_items:
+            errors.append({"id": item_id, "error": f"Batch limit of {max_items} items exceeded"})
+            continue
+        language = entry.get("language")
+        if language:
+            language = BATCH_LANGUAGES.get(str(language).strip().lower())
+            if not language:
+                errors.append({"id": item_id, "error": f"Unsupported language '{entry['language']}'. "
+                                                      f"Use one of: {', '.join(BATCH_LANGUAGES)}"})
+                continue
+        else:
+            language = detect_language(message) if detect_language else 'english'
+        items.append({"id": item_id, "message": message, "language": language})
+    return items, errors
+
+
+def run_batch(items, answer_fn, concurrency=None):
+    """
+    Answer items with at most `concurrency` questions in flight.
+    answer_fn(message, language) -> (intent, response_text).
+    Yields one result dict per item, in completion order.
+    """
+    concurrency = concurrency or Config.BATCH_CONCURRENCY
+    groups = {}
+    for item in items:
+        groups.setdefault(query_key(item["message"], item["language"]), []).append(item)
+
+    def answer(item):
+        started = time.perf_counter()
+        intent, response_text = answer_fn(item["message"], item["language"])
+        return intent, response_text, (time.perf_counter() - started) * 1000
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+    try:
+        pending = {}
+        queue = iter(groups.values())
+        for group in queue:
+            pending[executor.submit(answer, group[0])] = group
+            if len(pending) >= concurrency:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                group = pending.pop(future)
+                try:
+                    intent, response_text, elapsed_ms = future.result()
+                    results = [{"id": item["id"], "intent": intent, "language": item["language"],
+                                "response": response_text, "deduplicated": i > 0,
+                                "elapsed_ms": round(elapsed_ms, 1)}
+                               for i, item in enumerate(group)]
+                except Exception as e:
+                    results = [{"id": item["id"], "error": f"{type(e).__name__}: {e}"} for item in group]
+                yield from results
+                # Keep the pool full
+                next_group = next(queue, None)
+                if next_group:
+                    pending[executor.submit(answer, next_group[0])] = next_group
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def to_ndjson(results):
+    for result in results:
+        yield json.dumps(result, ensure_ascii=False) + '\n'
@@ -0,0 +1,285 @@
+"""
+Concurrency benchmark: Flask (sync) webhook vs the ASGI (async) webhook
+
+Starts local stand-ins for the slow upstreams - mock_groq.py for Groq and
+a small Nominatim / Overpass server with fixed latencies - and replays a
+mix of health questions, facility searches and direct (catalog) answers
+against both serving modes:
+
+- sync: the Flask test client called from a pool of --sync-workers threads
+  (what gunicorn workers x threads give us today)
+- async: asgi_app.app called directly, --concurrency requests in flight on
+  one event loop
+
+Every message is unique so the response and geo caches do not hide the
+upstream latency. Each mode runs in its own process and scratch directory
+(fresh healnet.db). Reports throughput and p50/p95/max latency per mode,
+and checks that both modes returned the same TwiML for every message.
+
+    python benchmarks/bench_concurrency.py --requests 200 --concurrency 50
+    python benchmarks/bench_concurrency.py --llm-latency 1.0 --overpass-latency 2.0 --output run.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYMPTOMS = ["tiredness", "back ache", "itchy eyes", "knee swelling", "dry skin", "poor sleep", "ear pain",
+            "sore throat", "leg cramps", "acidity", "hair fall", "dizziness", "mouth ulcers", "wrist pain"]
+PEOPLE = ["my father", "my sister", "my neighbour", "my son", "my grandmother", "my friend", "my colleague"]
+TOWNS = ["Rampur", "Sitapur", "Bhadohi", "Kasganj", "Hapur", "Etah", "Banda", "Unnao", "Rewari", "Palwal"]
+
+
+def build_messages(count, seed=7):
+    """Unique webhook form payloads: ~60% health questions, ~30% facility searches, ~10% catalog answers"""
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.6:
+            body = (f"{rng.choice(PEOPLE)} has {rng.choice(SYMPTOMS)} and {rng.choice(SYMPTOMS)} "
+                    f"since {i + 2} days, what should we do")
+        elif roll < 0.9:
+            body = f"find {rng.choice(['hospital', 'pharmacy', 'clinic'])} near {rng.choice(TOWNS)} sector {i}"
+        else:
+            body = rng.choice(["ayushman yojana", "health insurance policy"])
+        messages.append({"Body": body, "From": f"whatsapp:+9190000{i:05d}", "To": "whatsapp:+14155238886"})
+    return messages
+
+
+# --- Upstream stand-ins (parent process) ------------------------------------------
+
+def start_geo_server(nominatim_latency, overpass_latency):
+    """Nominatim (/search, /reverse) and Overpass (POST /interpreter) with fixed latencies"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def reply(self, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            time.sleep(nominatim_latency)
+            if url.path.endswith("/reverse"):
+                return self.reply({"display_name": "Shared location"})
+            place = query.get("q", [""])[0]
+            # Spread places ~20 km apart so facility searches do not share cache cells
+            offset = (sum(place.encode()) % 500) * 0.2
+            self.reply([{"lat": str(20.0 + offset / 10), "lon": str(75.0 + offset / 7),
+                         "display_name": place.title()}])
+
+        def do_POST(self):
+            form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode())
+            time.sleep(overpass_latency)
+            around = form["data"][0].split("around:", 1)[1].split(")", 1)[0].split(",")
+            lat, lon = float(around[1]), float(around[2])
+            self.reply({"elements": [{"type": "node", "id": i, "lat": lat + i * 0.004, "lon": lon,
+                                      "tags": {"name": f"Facility {i}", "addr:city": "Testpur"}}
+                                     for i in range(8)]})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-geo", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# --- One serving mode (child process) ---------------------------------------------
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def summarize(mode, latencies, elapsed, workers):
+    return {
+        "mode": mode,
+        "in_flight": workers,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1),
+    }
+
+
+def run_sync(messages, workers):
+    import app
+    app.NOMINATIM_URL = os.environ["BENCH_NOMINATIM_URL"]
+    client_local = threading.local()
+
+    def post(form):
+        if not hasattr(client_local, "client"):
+            client_local.client = app.app.test_client()
+        started = time.perf_counter()
+        body = client_local.client.post("/webhook", data=form).get_data(as_text=True)
+        return body, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(post, messages))
+    return results, time.perf_counter() - started
+
+
+def run_async(messages, concurrency):
+    import app
+    import asgi_app
+    from urllib.parse import urlencode
+    app.NOMINATIM_URL = os.environ["BENCH_NOMINATIM_URL"]
+
+    async def post(form, gate):
+        async with gate:
+            body = urlencode(form).encode()
+            scope = {"type": "http", "method": "POST", "path": "/webhook", "query_string": b"",
+                     "headers": [(b"content-type", b"application/x-www-form-urlencoded")]}
+            sent = []
+
+            async def receive():
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            async def send(event):
+                sent.append(event)
+
+            started = time.perf_counter()
+            await asgi_app.app(scope, receive, send)
+            return sent[1]["body"].decode(), time.perf_counter() - started
+
+    async def main():
+        gate = asyncio.Semaphore(concurrency)
+        await asgi_app.get_services()
+        started = time.perf_counter()
+        results = await asyncio.gather(*[post(form, gate) for form in messages])
+        elapsed = time.perf_counter() - started
+        await asgi_app.SERVICES.aclose()
+        return results, elapsed
+
+    return asyncio.run(main())
+
+
+def child(args):
+    with open(args.messages, encoding="utf-8") as f:
+        messages = json.load(f)
+    if args.child == "sync":
+        results, elapsed = run_sync(messages, args.sync_workers)
+        workers = args.sync_workers
+    else:
+        results, elapsed = run_async(messages, args.concurrency)
+        workers = args.concurrency
+    report = summarize(args.child, [latency for _, latency in results], elapsed, workers)
+    report["replies"] = [body for body, _ in results]
+    with open(args.result, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False)
+
+
+# --- Orchestration (parent process) -----------------------------------------------
+
+def run_mode(mode, args, env, messages_path):
+    workdir = tempfile.mkdtemp(prefix=f"bench-{mode}-")
+    result = os.path.join(workdir, "result.json")
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--messages", messages_path,
+               "--result", result, "--sync-workers", str(args.sync_workers),
+               "--concurrency", str(args.concurrency)]
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "w") as log:
+        completed = subprocess.run(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    if completed.returncode != 0:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            print(f.read()[-3000:])
+        raise SystemExit(f"{mode} run failed (log: {log_path})")
+    with open(result, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync (Flask) vs async (ASGI) webhook concurrency benchmark")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight in async mode")
+    parser.add_argument("--sync-workers", type=int, default=8, help="Threads serving the Flask webhook")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per mock Groq answer")
+    parser.add_argument("--nominatim-latency", type=float, default=0.3)
+    parser.add_argument("--overpass-latency", type=float, default=0.8)
+    parser.add_argument("--output", help="Write the summary to this JSON file")
+    parser.add_argument("--child", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--messages", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return child(args)
+
+    import mock_groq
+
+    groq_server, groq_url, _ = mock_groq.run_in_thread(latency=f"constant:{args.llm_latency}", tokens_per_second=0)
+    geo_server, geo_url = start_geo_server(args.nominatim_latency, args.overpass_latency)
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]),
+        "GROQ_API_KEY": "mock",
+        "GROQ_BASE_URL": groq_url,
+        "BENCH_NOMINATIM_URL": geo_url,
+        "OVERPASS_MIRRORS": f"{geo_url}/interpreter",
+        "OVERPASS_HEDGE_DELAY": "30",
+        "LLM_HEDGE_DELAY": "30",
+        "LLM_POOL_SIZE": str(max(args.sync_workers, args.concurrency)),
+        "NEAR_DUPLICATE_CACHE": "False",
+        "RETRIEVAL_ENABLED": "False",
+        "GROQ_STREAMING": "False",
+        "TWILIO_ACCOUNT_SID": "",
+    }
+
+    messages = build_messages(args.requests)
+    messages_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "messages.json")
+    with open(messages_path, "w", encoding="utf-8") as f:
+        json.dump(messages, f, ensure_ascii=False)
+
+    print(f"⏱️ {args.requests} requests | Groq {args.llm_latency}s, Nominatim {args.nominatim_latency}s, "
+          f"Overpass {args.overpass_latency}s")
+    reports = [run_mode("sync", args, env, messages_path), run_mode("async", args, env, messages_path)]
+    groq_server.shutdown()
+    geo_server.shutdown()
+
+    mismatched = [i for i, (a, b) in enumerate(zip(reports[0]["replies"], reports[1]["replies"])) if a != b]
+    print(f"\n{'mode':<8}{'in flight':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for report in reports:
+        print(f"{report['mode']:<8}{report['in_flight']:>10}{report['throughput_rps']:>10}"
+              f"{report['p50_ms']:>10}{report['p95_ms']:>10}{report['max_ms']:>10}")
+    print(f"\nTwiML identical: {not mismatched} ({len(messages) - len(mismatched)}/{len(messages)})")
+    for i in mismatched[:3]:
+        print(f"  #{i} {messages[i]['Body']!r}\n    sync:  {reports[0]['replies'][i][:160]}"
+              f"\n    async: {reports[1]['replies'][i][:160]}")
+
+    summary = {"settings": {key: value for key, value in vars(args).items()
+                            if key not in ("child", "messages", "result", "output")},
+               "modes": [{k: v for k, v in report.items() if k != "replies"} for report in reports],
+               "twiml_identical": not mismatched}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
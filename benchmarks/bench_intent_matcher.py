@@ -0,0 +1,132 @@
+"""
+Intent routing benchmark: Aho-Corasick matcher vs repeated substring scans
+
+Replays benchmarks/data/intent_messages.txt through the previous routing
+(one `any(keyword in message_lower ...)` chain per check, copied below) and
+through the single-pass matcher, checks both give identical results and
+reports the time per message.
+
+    python benchmarks/bench_intent_matcher.py [--repeat 200]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import utils  # noqa: E402
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intent_messages.txt")
+
+
+# --- Previous implementation --------------------------------------------------
+
+def legacy_detect_emergency(message):
+    return any(keyword in message.lower() for keyword in app.EMERGENCY_KEYWORDS)
+
+
+def legacy_handle_intent(message, language='english'):
+    message_lower = message.lower()
+    if legacy_detect_emergency(message):
+        return "emergency", app.get_emergency_response(language)
+    if any(keyword in message_lower for keyword in app.INSURANCE_KEYWORDS):
+        return "insurance", app.get_insurance_info(language)
+    if any(keyword in message_lower for keyword in app.SCHEME_KEYWORDS):
+        return "schemes", app.get_govt_schemes(language)
+    for keyword in app.AWARENESS_KEYWORDS:
+        if keyword in message_lower:
+            for disease in app.DISEASE_AWARENESS.keys():
+                if disease in message_lower or keyword in disease:
+                    return "awareness", app.get_disease_awareness(disease, language)
+    has_facility_word = any(word in message_lower for word in app.FACILITY_WORDS)
+    has_action_word = re.search(r'\b(find|locate|search|खोजें)\b', message_lower) is not None
+    has_location_prep = re.search(r'\b(in|near|at)\b', message_lower) is not None or (' में ' in f' {message_lower} ') or (' पास ' in f' {message_lower} ')
+    if (has_facility_word and has_location_prep) or (has_action_word and has_location_prep):
+        return "location_request", None
+    return "health_query", None
+
+
+def legacy_detect_facility_type(message):
+    message_lower = message.lower()
+    for facility_type, keywords in app.FACILITY_TYPE_KEYWORDS.items():
+        if any(word in message_lower for word in keywords):
+            return facility_type
+    return "hospital"
+
+
+def legacy_extract_symptoms(message):
+    message_lower = message.lower()
+    return [symptom for symptom, keywords in utils.SYMPTOM_KEYWORDS.items()
+            if any(keyword in message_lower for keyword in keywords)]
+
+
+def legacy_get_intent(message):
+    message_lower = message.lower()
+    if any(word in message_lower for word in utils.INTENT_KEYWORDS["emergency"]):
+        return "emergency"
+    if any(word in message_lower for word in utils.INTENT_KEYWORDS["find_facility"]):
+        return "find_facility"
+    if legacy_extract_symptoms(message):
+        return "symptom_check"
+    if any(keyword in message_lower for keyword in utils.INTENT_KEYWORDS["disease_info"]):
+        return "disease_info"
+    if any(word in message_lower for word in utils.INTENT_KEYWORDS["medication_info"]):
+        return "medication_info"
+    return "general_health"
+
+
+def legacy_suggest_specialty(message):
+    message_lower = message.lower()
+    for specialty, keywords in utils.MEDICAL_SPECIALTIES.items():
+        if any(keyword in message_lower for keyword in keywords):
+            return specialty.title()
+    return "General Medicine"
+
+
+# --- Routing per message ------------------------------------------------------
+
+def route_legacy(message):
+    return (legacy_handle_intent(message), legacy_detect_facility_type(message),
+            legacy_get_intent(message), legacy_extract_symptoms(message), legacy_suggest_specialty(message))
+
+
+def route_matcher(message):
+    matches = app.INTENT_MATCHER.match(message)
+    return (app.handle_intent(message, matches=matches), app.detect_facility_type(message, matches),
+            utils.get_intent(message, matches), utils.extract_symptoms(message, matches),
+            utils.suggest_specialty(message, matches))
+
+
+def load_messages(path=DATA):
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f if line.strip() and not line.startswith('#')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help="Passes over the corpus per timing")
+    parser.add_argument('--data', default=DATA)
+    args = parser.parse_args(argv)
+
+    messages = load_messages(args.data)
+    mismatches = [m for m in messages if route_legacy(m) != route_matcher(m)]
+    for message in mismatches:
+        print(f"MISMATCH: {message!r}\n  legacy:  {route_legacy(message)[:1]}\n  matcher: {route_matcher(message)[:1]}")
+
+    print(f"{len(messages)} messages, {app.INTENT_MATCHER.states} automaton states, "
+          f"{len(mismatches)} routing mismatches")
+    results = {}
+    for name, fn in (("legacy", route_legacy), ("matcher", route_matcher)):
+        best = min(timeit.repeat(lambda: [fn(m) for m in messages], number=args.repeat, repeat=5))
+        results[name] = best / (args.repeat * len(messages)) * 1e6
+        print(f"{name:>8}: {results[name]:7.2f} µs/message")
+    print(f" speedup: {results['legacy'] / results['matcher']:.2f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
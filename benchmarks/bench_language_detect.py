@@ -0,0 +1,103 @@
+"""
+Language detection benchmark on short WhatsApp-length messages
+
+Scores the script-histogram detector (language_detect) against the two
+detectors it replaced - app.py's Devanagari-share check and utils.py's
+substring patterns, copied below - on labelled messages, and times each.
+
+Two sets are scored separately:
+
+- development (benchmarks/data/language_messages.tsv): messages looked at
+  while building language_detect.WORD_MODEL, so its accuracy is optimistic
+- held-out (benchmarks/data/language_messages_heldout.tsv): messages
+  written afterwards and never used to tune the model - the number to quote
+
+    python benchmarks/bench_language_detect.py [--repeat 500] [--set held-out]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import language_detect  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DATA_SETS = {
+    "development": os.path.join(DATA_DIR, "language_messages.tsv"),
+    "held-out": os.path.join(DATA_DIR, "language_messages_heldout.tsv"),
+}
+
+# --- Previous implementations -------------------------------------------------
+
+LEGACY_PATTERNS = {
+    "hi": ["है", "में", "को", "का", "की", "से", "मैं", "दर्द", "बुखार"],
+    "es": ["el", "la", "de", "en", "es", "dolor", "fiebre", "médico"],
+    "fr": ["le", "la", "de", "je", "est", "douleur", "fièvre", "médecin"],
+    "bn": ["আমি", "এটা", "হয়", "আছে", "ব্যথা", "জ্বর"],
+    "te": ["నాకు", "ఉంది", "నొప్పి", "జ్వరం"],
+    "ta": ["எனக்கு", "உள்ளது", "வலி", "காய்ச்சல்"],
+}
+
+
+def legacy_utils_detect(text):
+    text_lower = text.lower()
+    for lang_code, patterns in LEGACY_PATTERNS.items():
+        if any(pattern in text_lower for pattern in patterns):
+            return lang_code
+    return "en"
+
+
+def legacy_app_detect(text):
+    hindi_chars = re.findall(r'[\u0900-\u097F]', text)
+    return 'hi' if len(hindi_chars) > len(text) * 0.3 else 'en'
+
+
+def load_messages(path=DATA_SETS["held-out"]):
+    rows = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                language, message = line.rstrip('\n').split('\t', 1)
+                rows.append((language, message))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=500, help="Passes over the corpus per timing")
+    parser.add_argument('--set', choices=["both"] + list(DATA_SETS), default="both", help="Message set(s) to score")
+    parser.add_argument('--data', help="Score this TSV file instead of the bundled sets")
+    parser.add_argument('--errors', action='store_true', help="List misclassified messages")
+    args = parser.parse_args(argv)
+
+    if args.data:
+        sets = {os.path.basename(args.data): args.data}
+    elif args.set == "both":
+        sets = DATA_SETS
+    else:
+        sets = {args.set: DATA_SETS[args.set]}
+    detectors = {
+        "app (hi/en share)": legacy_app_detect,
+        "utils (patterns)": legacy_utils_detect,
+        "language_detect": lambda text: language_detect.detect(text).language,
+    }
+    for set_name, path in sets.items():
+        rows = load_messages(path)
+        print(f"\n{set_name}: {len(rows)} messages, {len({lang for lang, _ in rows})} languages")
+        for name, fn in detectors.items():
+            wrong = [(lang, message, fn(message)) for lang, message in rows if fn(message) != lang]
+            seconds = min(timeit.repeat(lambda: [fn(message) for _, message in rows], number=args.repeat, repeat=5))
+            per_message = seconds / (args.repeat * len(rows)) * 1e6
+            print(f"{name:>18}: accuracy {1 - len(wrong) / len(rows):6.1%}  {per_message:6.2f} µs/message")
+            if args.errors:
+                for lang, message, got in wrong:
+                    print(f"{'':>20}{lang:>8} -> {got:<8} {message}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
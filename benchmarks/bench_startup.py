@@ -0,0 +1,180 @@
+"""
+Startup benchmark: import time, warmup hooks and memory of a fresh process
+
+For each stage it starts a new interpreter in a scratch directory (so the
+real healnet.db is never touched) and measures:
+
+- import: `python -X importtime -c "import app"` - total and self time of
+  the heaviest modules, and whether TensorFlow / PIL / twilio.rest were
+  imported (a text-only process should import none of them)
+- create_app: seconds per warmup hook (Config.WARMUP) and peak RSS
+- models: the "models" hook on top (TensorFlow import and model loading),
+  with --models
+
+Each stage runs --repeat times and the fastest run is kept. Results can
+be written to JSON and compared against an earlier run:
+
+    python benchmarks/bench_startup.py --output before.json
+    python benchmarks/bench_startup.py --baseline before.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("tensorflow", "PIL.Image", "twilio.rest", "groq")
+
+STAGES = {
+    "import": "import app",
+    "create_app": "import app; app.create_app()",
+    "models": "import app; app.create_app(); app.warmup(['models'])",
+}
+
+# Runs in the measured process after the stage's statements
+PROBE = """
+import json, resource, sys, time
+print("__STARTUP__" + json.dumps({
+    "seconds": time.perf_counter() - __started,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    "modules": len(sys.modules),
+    "heavy": [name for name in %r if name in sys.modules],
+    "warmup": dict(getattr(sys.modules.get("app"), "WARMUP_TIMINGS", {})),
+}))
+""" % (HEAVY_MODULES,)
+
+
+def parse_importtime(stderr, top=15):
+    """(total_us of `app`, heaviest modules by cumulative time) from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # header line
+        name = fields[2].rstrip()
+        rows.append((name.strip(), self_us, cumulative_us, len(name) - len(name.lstrip())))
+    total = next((cumulative for name, _, cumulative, _ in rows if name == "app"), None)
+    # Direct imports of app.py (one level below it) show where its import time goes
+    depth = next((indent for name, _, _, indent in rows if name == "app"), 0)
+    children = [row for row in rows if row[3] == depth + 2]
+    heaviest = sorted(children, key=lambda row: -row[2])[:top]
+    return total, [{"module": name, "self_ms": round(s / 1000, 1), "cumulative_ms": round(c / 1000, 1)}
+                   for name, s, c, _ in heaviest]
+
+
+def run_stage(stage, env, importtime=False):
+    code = "import time; __started = time.perf_counter()\n" + STAGES[stage] + "\n" + PROBE
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as workdir:
+        completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, timeout=600)
+    marker = [line for line in completed.stdout.splitlines() if line.startswith("__STARTUP__")]
+    if completed.returncode != 0 or not marker:
+        print(completed.stdout[-2000:], completed.stderr[-2000:])
+        raise SystemExit(f"{stage} stage failed")
+    result = json.loads(marker[0][len("__STARTUP__"):])
+    if importtime:
+        result["import_total_ms"], result["heaviest_imports"] = parse_importtime(completed.stderr)
+        if result["import_total_ms"] is not None:
+            result["import_total_ms"] = round(result["import_total_ms"] / 1000, 1)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print per-stage change against a baseline run; returns the regressed stages"""
+    regressions = []
+    print(f"\n{'stage':<14}{'baseline s':>12}{'current s':>12}{'change':>10}")
+    for stage, current in results.items():
+        before = baseline.get("results", {}).get(stage)
+        if not before:
+            print(f"{stage:<14}{'-':>12}{current['seconds']:>12.3f}{'new':>10}")
+            continue
+        change = current["seconds"] / before["seconds"] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(stage)
+            flag = "  REGRESSION"
+        print(f"{stage:<14}{before['seconds']:>12.3f}{current['seconds']:>12.3f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage (fastest is kept)")
+    parser.add_argument('--models', action='store_true', help="Also time loading the image models")
+    parser.add_argument('--top', type=int, default=12, help="Heaviest imports to list")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare with results JSON from an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.20,
+                        help="Allowed slowdown against the baseline before failing")
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]),
+           "PREWARM_ON_STARTUP": "False", "FACILITY_PREFETCH_ENABLED": "False"}
+    stages = ["import", "create_app"] + (["models"] if args.models else [])
+
+    results = {}
+    for stage in stages:
+        runs = [run_stage(stage, env) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run["seconds"])
+        if stage == "import":
+            best.update({k: v for k, v in run_stage(stage, env, importtime=True).items()
+                         if k in ("import_total_ms", "heaviest_imports")})
+        best["seconds"] = round(best["seconds"], 3)
+        best["max_rss_mb"] = round(best["max_rss_mb"], 1)
+        results[stage] = best
+
+    print(f"{'stage':<14}{'seconds':>10}{'RSS MB':>10}{'modules':>10}  heavy imports")
+    for stage, result in results.items():
+        print(f"{stage:<14}{result['seconds']:>10.3f}{result['max_rss_mb']:>10.1f}{result['modules']:>10}  "
+              f"{', '.join(result['heavy']) or '-'}")
+    warmup = results["create_app"]["warmup"]
+    print(f"\nWarmup hooks (s): {warmup}")
+    print(f"\nHeaviest imports of app.py (total {results['import'].get('import_total_ms')} ms):")
+    for row in results["import"]["heaviest_imports"][:args.top]:
+        print(f"  {row['module']:<28}{row['cumulative_ms']:>10.1f} ms")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Microbenchmarks for the CPU work done on every text message
+
+Times language detection, emergency detection, intent routing, location
+extraction, the utils classifiers, reply chunking and the whole text
+routing path (everything the webhook does for a text message short of
+database, cache and network calls) over benchmarks/data/corpus.jsonl.
+
+For each benchmark it reports ops/sec, microseconds per call and the
+average peak memory allocated during one call (tracemalloc). Results can
+be written to JSON and compared against an earlier run:
+
+    python benchmarks/bench_text_path.py --output before.json
+    python benchmarks/bench_text_path.py --baseline before.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+import response_catalog  # noqa: E402
+import utils  # noqa: E402
+
+CORPUS = os.path.join(ROOT, "benchmarks", "data", "corpus.jsonl")
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def reply_corpus(messages):
+    """Replies of realistic sizes for the chunking benchmark"""
+    replies = [entry.text for entry in app.RESPONSE_CATALOG.entries.values()]
+    # A long LLM-style answer (paragraphs, several WhatsApp messages)
+    paragraph = "\n".join(messages[:12])
+    replies.append(("\n\n".join([paragraph] * 6)) + app.DISCLAIMER)
+    return replies
+
+
+def route_text(message):
+    """The webhook's text routing without database, cache or network calls"""
+    language = app.detect_language(message)
+    matches = app.INTENT_MATCHER.match(message)
+    intent, direct_response = app.handle_intent(message, language, matches)
+    if intent == "location_request":
+        location = app.extract_location_query(message)
+        return intent, location, app.detect_facility_type(message, matches)
+    if direct_response:
+        entry = app.RESPONSE_CATALOG.for_text(direct_response)
+        return intent, entry.twiml if entry else response_catalog.split_message(direct_response)
+    return intent, utils.get_intent(message, matches)
+
+
+def benchmarks(messages):
+    replies = reply_corpus(messages)
+    return {
+        "detect_language": (app.detect_language, messages),
+        "detect_emergency": (app.detect_emergency, messages),
+        "handle_intent": (app.handle_intent, messages),
+        "extract_location_query": (app.extract_location_query, messages),
+        "detect_facility_type": (app.detect_facility_type, messages),
+        "utils.extract_symptoms": (utils.extract_symptoms, messages),
+        "utils.get_intent": (utils.get_intent, messages),
+        "utils.suggest_specialty": (utils.suggest_specialty, messages),
+        "split_message": (response_catalog.split_message, replies),
+        "text_path": (route_text, messages),
+    }
+
+
+def measure(fn, inputs, min_time=0.2, repeat=5):
+    """(ops_per_sec, us_per_call, peak_alloc_bytes) for fn over inputs"""
+    def run():
+        for value in inputs:
+            fn(value)
+
+    run()  # warm caches and lazy imports
+    number = 1
+    while True:
+        elapsed = timeit.timeit(run, number=number)
+        if elapsed >= min_time:
+            break
+        number *= 2
+    best = min(timeit.repeat(run, number=number, repeat=repeat))
+    per_call = best / (number * len(inputs))
+
+    tracemalloc.start()
+    peaks = []
+    for value in inputs:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        fn(value)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    tracemalloc.stop()
+    return 1.0 / per_call, per_call * 1e6, sum(peaks) / len(peaks)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print per-benchmark change against a baseline run; returns the regressed names"""
+    regressions = []
+    print(f"\n{'benchmark':<26}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, current in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            print(f"{name:<26}{'-':>12}{current['ops_per_sec']:>12.0f}{'new':>10}")
+            continue
+        change = current["ops_per_sec"] / before["ops_per_sec"] - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<26}{before['ops_per_sec']:>12.0f}{current['ops_per_sec']:>12.0f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', default=CORPUS)
+    parser.add_argument('--only', nargs='*', help="Run only these benchmarks")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds per timing loop")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare with results JSON from an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed ops/sec drop against the baseline before failing")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    messages = [row["message"] for row in corpus]
+    print(f"Corpus: {len(messages)} messages in {len({row['language'] for row in corpus})} languages, "
+          f"{min(map(len, messages))}-{max(map(len, messages))} chars\n")
+    print(f"{'benchmark':<26}{'ops/sec':>12}{'us/call':>10}{'peak alloc':>12}")
+
+    results = {}
+    for name, (fn, inputs) in benchmarks(messages).items():
+        if args.only and name not in args.only:
+            continue
+        ops, us, peak = measure(fn, inputs, args.min_time)
+        results[name] = {"ops_per_sec": round(ops, 1), "us_per_call": round(us, 3),
+                         "peak_alloc_bytes": round(peak)}
+        print(f"{name:<26}{ops:>12.0f}{us:>10.2f}{peak:>11.0f}B")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": os.path.relpath(args.corpus, ROOT),
+            "messages": len(messages)
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
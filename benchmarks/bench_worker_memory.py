@@ -0,0 +1,259 @@
+"""
+Worker memory benchmark: unique vs shared memory of gunicorn workers
+
+Starts gunicorn with gunicorn_conf.py in a scratch directory (fresh
+healnet.db), sends a few webhook and stats requests so every worker has
+touched its state, then reads /proc/<pid>/smaps_rollup of the master and
+each worker:
+
+- unique: Private_Clean + Private_Dirty - what the worker alone holds
+  (freed if it exits)
+- shared: Shared_Clean + Shared_Dirty - pages still shared with the master
+  and the other workers (indexes, frozen heap, preloaded models with PRELOAD_MODELS=True)
+- pss: proportional set size; the PSS sum over all processes is the real
+  footprint of the deployment
+
+By default it runs with preload (GUNICORN_PRELOAD=True) and without, so
+the saving is visible side by side. Linux only (reads /proc).
+
+    python benchmarks/bench_worker_memory.py --workers 4
+    python benchmarks/bench_worker_memory.py --mode preload --output after.json
+    python benchmarks/bench_worker_memory.py --pid 12345   # a running master
+"""
+
+import argparse
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROLLUP_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+# No LLM or network needed: catalog answers, the stats page and the health check
+WARM_REQUESTS = [
+    ("POST", "/webhook", {"Body": "ayushman yojana", "From": "whatsapp:+919000000001"}),
+    ("POST", "/webhook", {"Body": "health insurance policy", "From": "whatsapp:+919000000002"}),
+    ("POST", "/webhook", {"Body": "hi", "From": "whatsapp:+919000000003"}),
+    ("GET", "/stats", None),
+    ("GET", "/health", None),
+]
+
+
+def read_rollup(pid):
+    """{field: kB} from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in ROLLUP_FIELDS:
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # "pid (comm) state ppid ..." - comm may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def measure(master_pid):
+    """Memory of the master and each of its workers, in MB"""
+    processes = []
+    for role, pid in [("master", master_pid)] + [("worker", pid) for pid in child_pids(master_pid)]:
+        try:
+            rollup = read_rollup(pid)
+        except OSError:
+            continue  # exited meanwhile
+        processes.append({
+            "role": role,
+            "pid": pid,
+            "rss_mb": round(rollup.get("Rss", 0) / 1024, 1),
+            "pss_mb": round(rollup.get("Pss", 0) / 1024, 1),
+            "unique_mb": round((rollup.get("Private_Clean", 0) + rollup.get("Private_Dirty", 0)) / 1024, 1),
+            "shared_mb": round((rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0)) / 1024, 1),
+        })
+    workers = [p for p in processes if p["role"] == "worker"]
+    return {
+        "processes": processes,
+        "workers": len(workers),
+        "total_pss_mb": round(sum(p["pss_mb"] for p in processes), 1),
+        "worker_unique_mb": round(sum(p["unique_mb"] for p in workers) / len(workers), 1) if workers else None,
+        "worker_shared_mb": round(sum(p["shared_mb"] for p in workers) / len(workers), 1) if workers else None,
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(base_url, method, path, form=None):
+    data = urllib.parse.urlencode(form).encode() if form else None
+    with urllib.request.urlopen(urllib.request.Request(base_url + path, data=data, method=method), timeout=30) as r:
+        return r.status
+
+
+def wait_ready(process, base_url, workers, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with {process.returncode}")
+        try:
+            if request(base_url, "GET", "/health") == 200 and len(child_pids(process.pid)) >= workers:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"gunicorn not ready after {timeout}s")
+
+
+def run_mode(preload, args):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]),
+        "FLASK_HOST": "127.0.0.1",
+        "PORT": str(port),
+        "GUNICORN_WORKERS": str(args.workers),
+        "GUNICORN_PRELOAD": str(preload),
+        "PREWARM_ON_STARTUP": "False",
+        "FACILITY_PREFETCH_ENABLED": "False",
+    }
+    command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn_conf.py"), "wsgi:application"]
+    with tempfile.TemporaryDirectory(prefix="bench-memory-") as workdir:
+        log_path = os.path.join(workdir, "gunicorn.log")
+        with open(log_path, "w") as log:
+            process = subprocess.Popen(command, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                wait_ready(process, base_url, args.workers, args.startup_timeout)
+                # Several rounds so each worker serves some of them
+                for _ in range(args.rounds):
+                    for method, path, form in WARM_REQUESTS:
+                        request(base_url, method, path, form)
+                time.sleep(args.settle)
+                result = measure(process.pid)
+            except SystemExit:
+                with open(log_path, encoding="utf-8", errors="replace") as f:
+                    print(f.read()[-3000:])
+                raise
+            finally:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+    result["preload"] = preload
+    return result
+
+
+def print_result(name, result):
+    print(f"\n{name}: {result['workers']} workers, total PSS {result['total_pss_mb']} MB")
+    print(f"  {'role':<8}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'unique MB':>11}{'shared MB':>11}")
+    for p in result["processes"]:
+        print(f"  {p['role']:<8}{p['pid']:>8}{p['rss_mb']:>10}{p['pss_mb']:>10}{p['unique_mb']:>11}{p['shared_mb']:>11}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print total PSS change against a baseline run; returns the regressed modes"""
+    regressions = []
+    print(f"\n{'mode':<12}{'baseline MB':>13}{'current MB':>12}{'change':>10}")
+    for mode, current in results.items():
+        before = baseline.get("results", {}).get(mode)
+        if not before:
+            print(f"{mode:<12}{'-':>13}{current['total_pss_mb']:>12.1f}{'new':>10}")
+            continue
+        change = current["total_pss_mb"] / before["total_pss_mb"] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(mode)
+            flag = "  REGRESSION"
+        print(f"{mode:<12}{before['total_pss_mb']:>13.1f}{current['total_pss_mb']:>12.1f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--mode', choices=["both", "preload", "no-preload"], default="both")
+    parser.add_argument('--rounds', type=int, default=4, help="Rounds of warm-up requests before measuring")
+    parser.add_argument('--settle', type=float, default=1.0, help="Seconds to wait before reading /proc")
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    parser.add_argument('--pid', type=int, help="Measure an already running gunicorn master instead")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare with results JSON from an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed growth of total PSS against the baseline before failing")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("Needs Linux with /proc/<pid>/smaps_rollup (kernel 4.14+)")
+
+    if args.pid:
+        results = {"running": measure(args.pid)}
+    else:
+        modes = {"preload": [True], "no-preload": [False], "both": [True, False]}[args.mode]
+        results = {("preload" if preload else "no-preload"): run_mode(preload, args) for preload in modes}
+    for name, result in results.items():
+        print_result(name, result)
+
+    print(f"\n{'mode':<12}{'total PSS MB':>14}{'worker unique MB':>18}{'worker shared MB':>18}")
+    for name, result in results.items():
+        print(f"{name:<12}{result['total_pss_mb']:>14}{result['worker_unique_mb']!s:>18}"
+              f"{result['worker_shared_mb']!s:>18}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workers": args.workers
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} mode(s) above baseline memory by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,7 @@ Configuration management for HealNet
 """
 
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -77,6 +78,112 @@ class Config:
     ENABLE_LOCATION_SERVICES = os.getenv('ENABLE_LOCATION_SERVICES', 'True').lower() == 'true'
     ENABLE_CACHING = os.getenv('ENABLE_CACHING', 'True').lower() == 'true'
     
+    GROQ_STREAMING = os.getenv('GROQ_STREAMING', 'False').lower() == 'true'
+    STREAM_FIRST_MESSAGE_CHARS = int(os.getenv('STREAM_FIRST_MESSAGE_CHARS', '200'))
+    
+    SINGLEFLIGHT_TIMEOUT = float(os.getenv('SINGLEFLIGHT_TIMEOUT', '20'))
+    SINGLEFLIGHT_CROSS_PROCESS = os.getenv('SINGLEFLIGHT_CROSS_PROCESS', 'False').lower() == 'true'
+    
+    GROQ_BASE_URL = os.getenv('GROQ_BASE_URL')  # e.g. http://127.0.0.1:8765 for mock_groq.py
+    LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', '12'))
+    LLM_HEDGE_DELAY = float(os.getenv('LLM_HEDGE_DELAY', '0'))  # 0 = use observed p95
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+    LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', '0.5'))
+    LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '10'))
+    
+    ASYNC_HTTP_POOL_SIZE = int(os.getenv('ASYNC_HTTP_POOL_SIZE', '100'))  # asgi_app.py Nominatim/media connections
+    ASYNC_INFERENCE_WORKERS = int(os.getenv('ASYNC_INFERENCE_WORKERS', '2'))  # threads for image inference
+    
+    NEAR_DUPLICATE_CACHE = os.getenv('NEAR_DUPLICATE_CACHE', 'True').lower() == 'true'
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.6'))
+    
+    ADAPTIVE_GENERATION_BUDGET = os.getenv('ADAPTIVE_GENERATION_BUDGET', 'True').lower() == 'true'
+    GENERATION_LONG_MESSAGE_WORDS = int(os.getenv('GENERATION_LONG_MESSAGE_WORDS', '40'))
+    
+    RETRIEVAL_ENABLED = os.getenv('RETRIEVAL_ENABLED', 'True').lower() == 'true'
+    RETRIEVAL_THRESHOLD = float(os.getenv('RETRIEVAL_THRESHOLD', '0.8'))
+    RETRIEVAL_ARTICLES_DIR = os.getenv('RETRIEVAL_ARTICLES_DIR')
+    
+    BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+    # /api/chat/batch is refused until keys are configured
+    BATCH_API_KEYS = [k.strip() for k in os.getenv('BATCH_API_KEYS', '').split(',') if k.strip()]
+    
+    # Nominatim's usage policy: at most 1 request/s, shared by all workers through the rate file
+    NOMINATIM_RATE_PER_MINUTE = int(os.getenv('NOMINATIM_RATE_PER_MINUTE', '60'))
+    NOMINATIM_RATE_FILE = os.getenv('NOMINATIM_RATE_FILE', os.path.join(tempfile.gettempdir(), 'healnet-nominatim.rate'))
+    # Longest a webhook waits for a Nominatim slot before falling back to the gazetteer
+    NOMINATIM_MAX_WAIT = float(os.getenv('NOMINATIM_MAX_WAIT', '2'))
+    
+    # /export/chat_logs is refused until keys are configured
+    EXPORT_API_KEYS = [k.strip() for k in os.getenv('EXPORT_API_KEYS', '').split(',') if k.strip()]
+    
+    # Pre-warm, facility prefetch and model probes run in the one process holding this lock (see leader.py)
+    BACKGROUND_LOCK_FILE = os.getenv('BACKGROUND_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'healnet-background.lock'))
+    BACKGROUND_ELECTION_INTERVAL = float(os.getenv('BACKGROUND_ELECTION_INTERVAL', '30'))
+    
+    PREWARM_ON_STARTUP = os.getenv('PREWARM_ON_STARTUP', 'False').lower() == 'true'
+    PREWARM_TTL_HOURS = int(os.getenv('PREWARM_TTL_HOURS', '168'))
+    PREWARM_RATE_PER_MINUTE = int(os.getenv('PREWARM_RATE_PER_MINUTE', '20'))
+    
+    MODEL_STATS_WINDOW = int(os.getenv('MODEL_STATS_WINDOW', '50'))
+    MODEL_DEGRADED_COOLDOWN = float(os.getenv('MODEL_DEGRADED_COOLDOWN', '30'))
+    MODEL_EXPLORE_RATE = float(os.getenv('MODEL_EXPLORE_RATE', '0.05'))
+    MODEL_PROBE_INTERVAL = float(os.getenv('MODEL_PROBE_INTERVAL', '15'))
+    MODEL_PROBE_TIMEOUT = float(os.getenv('MODEL_PROBE_TIMEOUT', '5'))
+    
+    # Startup hooks run by app.create_app(): database, clients, indexes, models, background
+    WARMUP = [h.strip() for h in os.getenv('WARMUP', 'database,clients,indexes,background').split(',') if h.strip()]
+    MODELS_PATH = os.getenv('MODELS_PATH', '/Users/anshikalohan/Documents/pbl')
+    
+    # Production launch: gunicorn -c gunicorn_conf.py wsgi:application
+    GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', '4'))
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', '8'))
+    GUNICORN_TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+    GUNICORN_PRELOAD = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+    # TensorFlow is not fork-safe once initialised: only preload models in the master when opted in
+    PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'False').lower() == 'true'
+    
+    # Worker metrics files summed by /metrics (gunicorn_conf.py sets a per-master directory)
+    METRICS_DIR = os.getenv('METRICS_DIR', '')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+    
+    # Request profiling (see profiling.py): X-HealNet-Profile header or a random sample
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    # X-HealNet-Profile must carry this token; without one the header is ignored
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+    PROFILE_SLOW_SECONDS = float(os.getenv('PROFILE_SLOW_SECONDS', '2'))
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '200'))
+    
+    GAZETTEER_DB_PATH = os.getenv('GAZETTEER_DB_PATH', 'gazetteer.db')
+    FACILITY_INDEX_DIR = os.getenv('FACILITY_INDEX_DIR', 'facility_index')
+    FACILITY_OVERPASS_FALLBACK = os.getenv('FACILITY_OVERPASS_FALLBACK', 'True').lower() == 'true'
+    
+    OVERPASS_MIRRORS = [u.strip() for u in os.getenv('OVERPASS_MIRRORS', ','.join([
+        'https://lz4.overpass-api.de/api/interpreter',
+        'https://z.overpass-api.de/api/interpreter',
+        'https://overpass-api.de/api/interpreter'
+    ])).split(',') if u.strip()]
+    OVERPASS_DEADLINE = float(os.getenv('OVERPASS_DEADLINE', '8'))
+    OVERPASS_HEDGE_DELAY = float(os.getenv('OVERPASS_HEDGE_DELAY', '1.5'))  # 0 = race all mirrors at once
+    OVERPASS_MIRROR_COOLDOWN = float(os.getenv('OVERPASS_MIRROR_COOLDOWN', '30'))
+    
+    FACILITY_PREFETCH_ENABLED = os.getenv('FACILITY_PREFETCH_ENABLED', 'False').lower() == 'true'
+    FACILITY_PREFETCH_INTERVAL = float(os.getenv('FACILITY_PREFETCH_INTERVAL', '3600'))
+    FACILITY_PREFETCH_TOP_N = int(os.getenv('FACILITY_PREFETCH_TOP_N', '30'))
+    FACILITY_PREFETCH_DAYS = int(os.getenv('FACILITY_PREFETCH_DAYS', '30'))
+    FACILITY_PREFETCH_BUDGET = int(os.getenv('FACILITY_PREFETCH_BUDGET', '20'))  # searches refreshed per run
+    FACILITY_PREFETCH_RATE_PER_MINUTE = int(os.getenv('FACILITY_PREFETCH_RATE_PER_MINUTE', '6'))
+    FACILITY_PREFETCH_MARGIN_HOURS = float(os.getenv('FACILITY_PREFETCH_MARGIN_HOURS', '24'))
+    
+    GEO_CACHE_PRECISION = int(os.getenv('GEO_CACHE_PRECISION', '6'))  # ~1.2 x 0.6 km cells
+    GEO_CACHE_SHARE_KM = float(os.getenv('GEO_CACHE_SHARE_KM', '1.0'))
+    GEO_CACHE_GEOCODE_TTL = int(os.getenv('GEO_CACHE_GEOCODE_TTL', str(30 * 24 * 3600)))
+    GEO_CACHE_REVERSE_TTL = int(os.getenv('GEO_CACHE_REVERSE_TTL', str(30 * 24 * 3600)))
+    GEO_CACHE_FACILITY_TTL = int(os.getenv('GEO_CACHE_FACILITY_TTL', str(7 * 24 * 3600)))
+    
     @staticmethod
     def validate():
         """Validate required configuration"""
@@ -0,0 +1,261 @@
+"""
+Streaming export of chat_logs for usage analysis
+
+Rows are read in keyset-paginated batches (WHERE id > last_id ORDER BY id),
+so each read is short, the database is never locked for the length of the
+export and memory stays flat regardless of table size. Every row carries its
+id, so an interrupted export can be resumed with after_id.
+
+The HTTP export fixes its last row before streaming (export_bounds), so the
+id to resume from after a complete download is known up front and sent as
+a header; rows logged while it streams are left for the next export.
+
+Usage:
+    python export.py --format ndjson --since 2026-01-01 --intent health_query
+    python export.py --format csv --gzip -o chat_logs.csv.gz --after-id 1200
+"""
+
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+import zlib
+
+from config import Config
+
+EXPORT_COLUMNS = ['id', 'intent', 'language', 'user_location', 'timestamp', 'success']
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_BATCH_SIZE = 500
+
+
+def _parse_timestamp(value):
+    """Normalize an ISO date/datetime to SQLite's CURRENT_TIMESTAMP format"""
+    value = value.strip().replace('T', ' ').rstrip('Z')
+    if len(value) == 10:
+        value += ' 00:00:00'
+    if len(value) < 19 or value[4] != '-' or value[13] != ':':
+        raise ValueError(f"Invalid timestamp '{value}'. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS")
+    return value[:19]
+
+
+def _parse_success(value):
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return 1
+    if value in ('0', 'false', 'no'):
+        return 0
+    raise ValueError(f"Invalid success filter '{value}'. Use true or false")
+
+
+def parse_filters(since=None, until=None, intent=None, language=None, success=None):
+    """
+    Validate raw filter values (query args or CLI flags).
+    intent and language accept comma-separated lists.
+    """
+    filters = {}
+    if since:
+        filters['since'] = _parse_timestamp(since)
+    if until:
+        filters['until'] = _parse_timestamp(until)
+    if intent:
+        filters['intent'] = [i.strip() for i in intent.split(',') if i.strip()]
+    if language:
+        filters['language'] = [l.strip() for l in language.split(',') if l.strip()]
+    if success is not None and success != '':
+        filters['success'] = _parse_success(success)
+    return filters
+
+
+def parse_limit(value):
+    """Row limit from a query arg or CLI flag: None for no limit, otherwise a count >= 0"""
+    if value is None or value == '':
+        return None
+    limit = int(value)
+    if limit < 0:
+        # SQLite reads a negative LIMIT as no limit at all
+        raise ValueError(f"Invalid limit {limit}. Use 0 or more")
+    return limit
+
+
+def _where(filters, after_id=0, until_id=None):
+    clauses = ["id > ?"]
+    params = [after_id]
+    if until_id is not None:
+        clauses.append("id <= ?")
+        params.append(until_id)
+    if 'since' in filters:
+        clauses.append("timestamp >= ?")
+        params.append(filters['since'])
+    if 'until' in filters:
+        clauses.append("timestamp < ?")
+        params.append(filters['until'])
+    for column in ('intent', 'language'):
+        if filters.get(column):
+            clauses.append(f"{column} IN ({', '.join('?' for _ in filters[column])})")
+            params.extend(filters[column])
+    if 'success' in filters:
+        clauses.append("success = ?")
+        params.append(filters['success'])
+    return ' AND '.join(clauses), params
+
+
+def build_export_query(filters, after_id=0, batch_size=EXPORT_BATCH_SIZE, until_id=None):
+    """Build one keyset page query for the given filters"""
+    where, params = _where(filters, after_id, until_id)
+    sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM chat_logs WHERE {where} ORDER BY id LIMIT ?"
+    return sql, params + [batch_size]
+
+
+def export_bounds(filters=None, after_id=0, limit=None, db_path=None):
+    """
+    (last_id, rows) an export with these filters would return right now.
+    Pass last_id as until_id to stream exactly those rows; last_id is None
+    when there are none.
+    """
+    where, params = _where(filters or {}, after_id)
+    conn = sqlite3.connect(db_path or Config.DATABASE_PATH)
+    try:
+        last_id, rows = conn.execute(
+            f"SELECT MAX(id), COUNT(*) FROM (SELECT id FROM chat_logs WHERE {where} ORDER BY id LIMIT ?)",
+            params + [-1 if limit is None else limit]).fetchone()
+    finally:
+        conn.close()
+    return last_id, rows
+
+
+def iter_chat_logs(filters=None, after_id=0, limit=None, db_path=None, batch_size=EXPORT_BATCH_SIZE,
+                   until_id=None):
+    """
+    Yield chat_logs rows as dicts in id order, one keyset page at a time.
+    Stops after `limit` rows, and after id `until_id`, when given.
+    """
+    filters = filters or {}
+    conn = sqlite3.connect(db_path or Config.DATABASE_PATH)
+    try:
+        c = conn.cursor()
+        last_id = int(after_id or 0)
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = batch_size if remaining is None else min(batch_size, remaining)
+            sql, params = build_export_query(filters, last_id, page_size, until_id)
+            c.execute(sql, params)
+            rows = 0
+            for row in c:
+                rows += 1
+                last_id = row[0]
+                record = dict(zip(EXPORT_COLUMNS, row))
+                if record['success'] is not None:
+                    record['success'] = bool(record['success'])
+                yield record
+            if remaining is not None:
+                remaining -= rows
+            if rows < page_size:
+                break
+    finally:
+        conn.close()
+
+
+def iter_csv(records):
+    """Encode records as CSV, one chunk per row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode('utf-8')
+    for record in records:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([record[col] for col in EXPORT_COLUMNS])
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_ndjson(records):
+    """Encode records as newline-delimited JSON"""
+    for record in records:
+        yield (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def iter_gzip(chunks, flush_bytes=64 * 1024):
+    """Gzip a byte stream on the fly, flushing roughly every flush_bytes of input"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    pending = 0
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_bytes:
+            out += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def stream_export(fmt='csv', filters=None, after_id=0, limit=None, gzip=False, db_path=None, until_id=None):
+    """Return a generator of encoded export bytes"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    records = iter_chat_logs(filters, after_id, limit, db_path, until_id=until_id)
+    chunks = iter_csv(records) if fmt == 'csv' else iter_ndjson(records)
+    return iter_gzip(chunks) if gzip else chunks
+
+
+def export_content_type(fmt, gzip=False):
+    """MIME type and download filename for an export"""
+    if gzip:
+        return 'application/gzip', f"chat_logs.{fmt}.gz"
+    if fmt == 'csv':
+        return 'text/csv; charset=utf-8', "chat_logs.csv"
+    return 'application/x-ndjson; charset=utf-8', "chat_logs.ndjson"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export HealNet chat_logs as CSV or NDJSON")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--since', help="Only rows at or after this time (YYYY-MM-DD[THH:MM:SS])")
+    parser.add_argument('--until', help="Only rows before this time")
+    parser.add_argument('--intent', help="Comma-separated intents")
+    parser.add_argument('--language', help="Comma-separated languages")
+    parser.add_argument('--success', help="true or false")
+    parser.add_argument('--after-id', type=int, default=0, help="Resume after this chat_logs id")
+    parser.add_argument('--limit', help="Maximum number of rows")
+    parser.add_argument('--gzip', action='store_true', help="Gzip the output")
+    parser.add_argument('--db', default=Config.DATABASE_PATH, help="SQLite database path")
+    parser.add_argument('-o', '--output', help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        filters = parse_filters(args.since, args.until, args.intent, args.language, args.success)
+        args.limit = parse_limit(args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+
+    last_id = args.after_id
+    count = 0
+
+    def tracked(records):
+        nonlocal last_id, count
+        for record in records:
+            last_id = record['id']
+            count += 1
+            yield record
+
+    records = tracked(iter_chat_logs(filters, args.after_id, args.limit, args.db))
+    chunks = iter_csv(records) if args.format == 'csv' else iter_ndjson(records)
+    if args.gzip:
+        chunks = iter_gzip(chunks)
+
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+        else:
+            out.flush()
+        print(f"Exported {count} rows. Resume with --after-id {last_id}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
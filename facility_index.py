@@ -0,0 +1,592 @@
+"""
+Local spatial index of health facilities from an OSM extract
+
+Imports hospital, clinic, doctors and pharmacy (plus shop=chemist and the
+matching healthcare=* tags) from a local OpenStreetMap extract into a
+compact on-disk index, so "find hospitals in X" is answered without a
+round trip to Overpass:
+
+    python facility_index.py import india-latest.osm.bz2
+    python facility_index.py import --incremental karnataka-newer.osm.pbf
+    python facility_index.py import --incremental changes-1234.osc.gz
+    python facility_index.py nearest 12.9716 77.5946 --kinds hospital clinic
+
+XML extracts (.osm, .osc, optionally .gz / .bz2) are read with the standard
+library; .pbf needs the optional `osmium` package. Ways and multipolygon
+relations are placed at the centroid of their nodes.
+
+The index is a directory of NumPy arrays (coordinates, kinds, OSM ids,
+versions) sorted by a fixed-size grid cell key, plus a UTF-8 blob of names
+and addresses. Everything is memory-mapped at load, so the process only
+touches the pages of cells a query actually reads. Radius and k-nearest
+queries gather the candidate cells with one binary search per grid row and
+rank them by haversine distance.
+
+An incremental import merges into the existing index by OSM id and
+version: osmChange files apply their create/modify/delete actions, and a
+newer full extract of the same source (the file name without date or
+"-latest" suffix, or --source) replaces that source's facilities inside
+its bounding box. Facilities imported from other sources are never
+dropped by a bounding box: a state extract's box also covers parts of
+its neighbours.
+"""
+
+import argparse
+import bz2
+import gzip
+import json
+import math
+import os
+import re
+import shutil
+import time
+import threading
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+import numpy as np
+
+from config import Config
+
+try:
+    import osmium
+except Exception:
+    osmium = None
+
+Facility = namedtuple("Facility", ["osm_type", "osm_id", "version", "kind", "name", "address",
+                                   "lat", "lon", "distance_km"], defaults=(None,))
+
+# Index kinds use the names find_nearby_facilities asks for
+KINDS = ["hospital", "clinic", "doctors", "pharmacy", "chemist"]
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+HEALTHCARE_KINDS = {"hospital": "hospital", "clinic": "clinic", "doctor": "doctors", "pharmacy": "pharmacy"}
+
+OSM_TYPES = ["node", "way", "relation"]
+OSM_TYPE_CODES = {osm_type: code for code, osm_type in enumerate(OSM_TYPES)}
+
+ADDRESS_TAGS = ("addr:street", "addr:city", "addr:state")
+
+# Grid cell size in degrees (~5.5 km of latitude); cell key = row * GRID_COLUMNS + column
+CELL_DEGREES = 0.05
+GRID_COLUMNS = int(round(360 / CELL_DEGREES))
+
+EARTH_RADIUS_KM = 6371.0
+
+ARRAYS = ("lat", "lon", "kind", "osm_type", "osm_id", "version", "cell", "text_offsets")
+# Index of each facility's source in meta["source_names"]; indexes built before it have none
+OPTIONAL_ARRAYS = ("source",)
+
+# An imported extract answers searches only where it has facilities this close
+COVERAGE_RADIUS_KM = 15.0
+
+_EXTRACT_SUFFIXES = re.compile(r'(\.(osm|osc|pbf|xml|gz|bz2))+$')
+_VERSION_SUFFIX = re.compile(r'-(latest|newer|internal|\d{6,8}(T\d+Z)?)$')
+
+# One element from an extract; lat/lon for nodes, refs for ways, members for relations
+_Element = namedtuple("_Element", ["action", "osm_type", "osm_id", "version", "tags",
+                                   "lat", "lon", "refs", "members"])
+
+
+def facility_kind(tags):
+    """Index kind for a tag dict, or None if the element is not a health facility"""
+    amenity = tags.get("amenity")
+    if amenity in KIND_CODES:
+        return amenity
+    if tags.get("shop") == "chemist":
+        return "chemist"
+    return HEALTHCARE_KINDS.get(tags.get("healthcare"))
+
+
+def source_name(path):
+    """Source an extract updates: "karnataka" for karnataka-latest.osm.pbf or karnataka-240101.osm.pbf"""
+    name = _EXTRACT_SUFFIXES.sub("", os.path.basename(path))
+    return _VERSION_SUFFIX.sub("", name) or name
+
+
+def cell_key(lat, lon):
+    """Grid cell key for scalars or NumPy arrays"""
+    row = np.floor((np.asarray(lat, dtype=np.float64) + 90.0) / CELL_DEGREES).astype(np.int64)
+    col = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / CELL_DEGREES).astype(np.int64) % GRID_COLUMNS
+    return row * GRID_COLUMNS + col
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Distance from one point to arrays of points"""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats.astype(np.float64)), np.radians(lons.astype(np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# --- Reading extracts ---------------------------------------------------------------
+
+def _open_extract(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _iter_xml(path):
+    """(bounds, elements) of an .osm / .osc file, streamed with iterparse"""
+    bounds = [None]
+
+    def elements():
+        action = "create"
+        root = None
+        with _open_extract(path) as f:
+            for event, elem in ET.iterparse(f, events=("start", "end")):
+                tag = elem.tag
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    elif tag in ("create", "modify", "delete"):
+                        action = tag
+                    elif tag == "bounds":
+                        bounds[0] = tuple(float(elem.get(k)) for k in ("minlat", "minlon", "maxlat", "maxlon"))
+                    continue
+                if tag not in OSM_TYPE_CODES:
+                    if tag in ("create", "modify", "delete"):
+                        elem.clear()
+                    continue
+                tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+                lat = lon = None
+                refs = members = ()
+                if tag == "node" and elem.get("lat") is not None:
+                    lat, lon = float(elem.get("lat")), float(elem.get("lon"))
+                elif tag == "way":
+                    refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                elif tag == "relation":
+                    members = [int(m.get("ref")) for m in elem.iter("member")
+                               if m.get("type") == "way" and m.get("role") in ("outer", "")]
+                yield _Element(action, tag, int(elem.get("id")), int(elem.get("version") or 0), tags,
+                               lat, lon, refs, members)
+                # Drop parsed elements so memory stays flat on country-sized files
+                root.clear()
+
+    return bounds, elements
+
+
+def _iter_pbf(path):
+    """(bounds, elements) of a .pbf file through pyosmium"""
+    if osmium is None:
+        raise RuntimeError("Reading .pbf extracts needs the 'osmium' package (pip install osmium)")
+    bounds = [None]
+
+    def elements():
+        processor = osmium.FileProcessor(path)
+        box = processor.header.box()
+        if box.valid():
+            bounds[0] = (box.bottom_left.lat, box.bottom_left.lon, box.top_right.lat, box.top_right.lon)
+        for obj in processor:
+            tags = {tag.k: tag.v for tag in obj.tags}
+            action = "delete" if obj.deleted else "create"
+            if obj.is_node():
+                location = obj.location
+                lat, lon = (location.lat, location.lon) if location.valid() else (None, None)
+                yield _Element(action, "node", obj.id, obj.version, tags, lat, lon, (), ())
+            elif obj.is_way():
+                yield _Element(action, "way", obj.id, obj.version, tags, None, None,
+                               [node.ref for node in obj.nodes], ())
+            elif obj.is_relation():
+                members = [m.ref for m in obj.members if m.type == "w" and m.role in ("outer", "")]
+                yield _Element(action, "relation", obj.id, obj.version, tags, None, None, (), members)
+
+    return bounds, elements
+
+
+def _reader(path):
+    return _iter_pbf(path) if path.endswith(".pbf") else _iter_xml(path)
+
+
+def _address(tags):
+    return ", ".join(tags[key] for key in ADDRESS_TAGS if tags.get(key))
+
+
+def _centroid(refs, coords):
+    points = [coords[ref] for ref in refs if ref in coords]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]  # closed way: first node repeats
+    if not points:
+        return None
+    return sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points)
+
+
+def read_extract(path):
+    """
+    (bounds, facilities, removed) from an extract or osmChange file.
+    facilities: {(osm_type, osm_id): Facility}; removed: keys deleted or no
+    longer tagged as a facility (only reported by osmChange files). Ways and
+    relations whose nodes are not in the file (osmChange) come back with
+    lat/lon None.
+
+    Up to three streaming passes: tagged elements (plus relation member
+    ways), then node lists of member ways, then node coordinates.
+    """
+    bounds, elements = _reader(path)
+    # Extracts are sorted nodes, ways, relations; osmChange files are not
+    is_sorted = ".osc" not in os.path.basename(path)
+    nodes, ways, relations, removed = {}, {}, {}, set()
+    for el in elements():
+        key = (el.osm_type, el.osm_id)
+        kind = facility_kind(el.tags) if el.action != "delete" else None
+        if kind is None:
+            if el.action != "create":
+                removed.add(key)
+            continue
+        name = el.tags.get("name:en") or el.tags.get("name") or "N/A"
+        record = (el.version, kind, name, _address(el.tags))
+        if el.osm_type == "node":
+            if el.lat is not None:
+                nodes[key] = Facility(*key, *record, el.lat, el.lon)
+        elif el.osm_type == "way":
+            ways[key] = (record, el.refs)
+        else:
+            relations[key] = (record, el.members)
+
+    member_ways = {way_id for _, members in relations.values() for way_id in members}
+    way_refs = {key[1]: refs for key, (_, refs) in ways.items()}
+    if member_ways - set(way_refs):
+        for el in elements():
+            if el.osm_type == "way" and el.osm_id in member_ways:
+                way_refs.setdefault(el.osm_id, el.refs)
+            elif el.osm_type == "relation" and is_sorted:
+                break
+
+    needed = {ref for refs in way_refs.values() for ref in refs}
+    coords = {}
+    if needed:
+        for el in elements():
+            if el.osm_type != "node":
+                if is_sorted:
+                    break
+                continue
+            if el.osm_id in needed and el.lat is not None:
+                coords[el.osm_id] = (el.lat, el.lon)
+
+    facilities = dict(nodes)
+    for key, (record, refs) in ways.items():
+        facilities[key] = Facility(*key, *record, *(_centroid(refs, coords) or (None, None)))
+    for key, (record, members) in relations.items():
+        refs = [ref for way_id in members for ref in way_refs.get(way_id, ())]
+        facilities[key] = Facility(*key, *record, *(_centroid(refs, coords) or (None, None)))
+    return bounds[0], facilities, removed
+
+
+# --- Writing the index ----------------------------------------------------------------
+
+def write_index(facilities, index_dir=None, meta=None, sources=None):
+    """
+    Write facilities as a sorted grid index; the directory is swapped in atomically.
+    sources maps (osm_type, osm_id) to the name of the source it came from.
+    """
+    index_dir = index_dir or Config.FACILITY_INDEX_DIR
+    facilities = list(facilities)
+    sources = sources or {}
+    source_names = sorted({sources.get((f.osm_type, f.osm_id), "") for f in facilities})
+    source_codes = {name: code for code, name in enumerate(source_names)}
+    lat = np.array([f.lat for f in facilities], dtype=np.float32)
+    lon = np.array([f.lon for f in facilities], dtype=np.float32)
+    cells = cell_key(lat, lon)
+    order = np.argsort(cells, kind="stable")
+
+    texts = [f"{facilities[i].name}\x1f{facilities[i].address}".encode("utf-8") for i in order]
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in texts], out=offsets[1:])
+    arrays = {
+        "lat": lat[order], "lon": lon[order], "cell": cells[order],
+        "kind": np.array([KIND_CODES[f.kind] for f in facilities], dtype=np.uint8)[order],
+        "osm_type": np.array([OSM_TYPE_CODES[f.osm_type] for f in facilities], dtype=np.uint8)[order],
+        "osm_id": np.array([f.osm_id for f in facilities], dtype=np.int64)[order],
+        "version": np.array([f.version for f in facilities], dtype=np.int32)[order],
+        "source": np.array([source_codes[sources.get((f.osm_type, f.osm_id), "")] for f in facilities],
+                           dtype=np.uint16)[order],
+        "text_offsets": offsets,
+    }
+
+    tmp_dir = f"{index_dir.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "text.bin"), "wb") as f:
+        f.write(b"".join(texts))
+    meta = dict(meta or {})
+    meta.update({"count": len(facilities), "source_names": source_names, "cell_degrees": CELL_DEGREES, "built_at": time.time(),
+                 "kinds": {kind: int((arrays["kind"] == code).sum()) for kind, code in KIND_CODES.items()}})
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    # Readers keep their memory maps of the old files until they reload
+    old_dir = f"{index_dir.rstrip(os.sep)}.old-{os.getpid()}"
+    if os.path.exists(index_dir):
+        os.rename(index_dir, old_dir)
+    os.rename(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return len(facilities)
+
+
+def _inside(bounds, lat, lon):
+    return bounds[0] <= lat <= bounds[2] and bounds[1] <= lon <= bounds[3]
+
+
+def import_extract(path, index_dir=None, incremental=False, source=None):
+    """Build (or merge into) the facility index from an extract; returns the facility count"""
+    index_dir = index_dir or Config.FACILITY_INDEX_DIR
+    source = source or source_name(path)
+    started = time.perf_counter()
+    bounds, found, removed = read_extract(path)
+    is_change = ".osc" in os.path.basename(path)
+    print(f"📥 Read {len(found)} facilities from {path} (source {source}, {time.perf_counter() - started:.1f}s)")
+
+    existing = FacilityIndex(index_dir)
+    meta = {"sources": []}
+    if incremental and existing.load():
+        meta = existing.meta
+        merged = {(f.osm_type, f.osm_id): f for f in existing.all()}
+        sources = existing.sources()
+        dropped = 0
+        if not is_change and bounds:
+            # A full extract is authoritative inside its bounding box, for its own source only
+            stale = [key for key, f in merged.items()
+                     if sources.get(key) == source and _inside(bounds, f.lat, f.lon) and key not in found]
+            for key in stale:
+                del merged[key]
+            dropped += len(stale)
+        for key in removed:
+            if key in merged and key not in found:
+                del merged[key]
+                dropped += 1
+        updated = 0
+        for key, facility in found.items():
+            current = merged.get(key)
+            if facility.lat is None:
+                if current is None:
+                    continue
+                # Tags changed but the geometry's nodes are not in this file
+                facility = facility._replace(lat=current.lat, lon=current.lon)
+            if current is None or facility.version >= current.version:
+                merged[key] = facility
+                # osmChange files edit whatever the facility was imported from
+                if current is None or not is_change:
+                    sources[key] = source
+                updated += 1
+        print(f"🔁 Merged: {updated} added/updated, {dropped} removed")
+        facilities = merged.values()
+    else:
+        facilities = [f for f in found.values() if f.lat is not None]
+        sources = {key: source for key in found}
+
+    meta.setdefault("sources", []).append({"path": os.path.basename(path), "source": source, "bounds": bounds,
+                                            "facilities": len(found), "imported_at": time.time()})
+    count = write_index(facilities, index_dir, meta, sources)
+    print(f"✅ Facility index written: {count} facilities in {index_dir} ({time.perf_counter() - started:.1f}s)")
+    return count
+
+
+# --- Queries --------------------------------------------------------------------------
+
+class FacilityIndex:
+    """Memory-mapped grid index with radius and k-nearest queries"""
+
+    def __init__(self, index_dir=None):
+        self.index_dir = index_dir or Config.FACILITY_INDEX_DIR
+        self.arrays = {}
+        self.text = None
+        self.meta = {}
+        self.cells = None
+        self.cell_starts = None
+        self._loaded_at = None
+        self.stats = {"queries": 0, "hits": 0, "misses": 0, "reloads": 0}
+        self._lock = threading.Lock()
+
+    def _meta_path(self):
+        return os.path.join(self.index_dir, "meta.json")
+
+    def load(self):
+        """Map the index into memory; returns the number of facilities (0 when none was imported)"""
+        meta_path = self._meta_path()
+        if not os.path.exists(meta_path):
+            print(f"ℹ️ No facility index at {self.index_dir} - facility search uses Overpass")
+            return 0
+        try:
+            stamp = os.stat(meta_path).st_mtime_ns
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(self.index_dir, f"{name}.npy"), mmap_mode="r")
+                      for name in ARRAYS}
+            for name in OPTIONAL_ARRAYS:
+                if os.path.exists(os.path.join(self.index_dir, f"{name}.npy")):
+                    arrays[name] = np.load(os.path.join(self.index_dir, f"{name}.npy"), mmap_mode="r")
+            text_path = os.path.join(self.index_dir, "text.bin")
+            text = np.memmap(text_path, dtype=np.uint8, mode="r") if os.path.getsize(text_path) else b""
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Facility index load error: {e}")
+            return 0
+        # Occupied cells and where each starts (small: one entry per non-empty cell)
+        cells, cell_starts = np.unique(np.asarray(arrays["cell"]), return_index=True)
+        with self._lock:
+            self.arrays, self.text, self.meta = arrays, text, meta
+            self.cells = cells
+            self.cell_starts = np.append(cell_starts, len(arrays["cell"])).astype(np.int64)
+            self._loaded_at = stamp
+        print(f"✅ Facility index loaded: {meta.get('count', 0)} facilities in {len(cells)} cells")
+        return int(meta.get("count", 0))
+
+    def reload_if_changed(self):
+        """Pick up an index rewritten by a later import; True if reloaded"""
+        try:
+            stamp = os.stat(self._meta_path()).st_mtime_ns
+        except OSError:
+            return False
+        if stamp == self._loaded_at:
+            return False
+        self.stats["reloads"] += 1
+        return self.load() > 0
+
+    def __len__(self):
+        return len(self.arrays["lat"]) if self.arrays else 0
+
+    @property
+    def available(self):
+        return len(self) > 0
+
+    def covers(self, lat, lon, kinds=None, radius_km=COVERAGE_RADIUS_KM):
+        """
+        True if the imported data answers a search at this point: an imported
+        extract's bounding box contains it and the index has facilities (of
+        these kinds) within radius_km. A bounding box alone says nothing about
+        what the extract actually held there.
+        """
+        if not any(source.get("bounds") and _inside(source["bounds"], lat, lon)
+                   for source in self.meta.get("sources", [])):
+            return False
+        candidates, _ = self._within(lat, lon, radius_km, kinds)
+        return len(candidates) > 0
+
+    def sources(self):
+        """{(osm_type, osm_id): source name} of every facility ("" when imported before sources were kept)"""
+        if "source" not in self.arrays:
+            return {}
+        names = self.meta.get("source_names") or [""]
+        a = self.arrays
+        return {(OSM_TYPES[t], int(i)): names[c] for t, i, c in zip(a["osm_type"], a["osm_id"], a["source"])}
+
+    def _facility(self, i, distance_km=None):
+        a = self.arrays
+        start, end = int(a["text_offsets"][i]), int(a["text_offsets"][i + 1])
+        name, _, address = bytes(self.text[start:end]).decode("utf-8").partition("\x1f")
+        return Facility(OSM_TYPES[a["osm_type"][i]], int(a["osm_id"][i]), int(a["version"][i]),
+                        KINDS[a["kind"][i]], name, address, float(a["lat"][i]), float(a["lon"][i]),
+                        distance_km)
+
+    def all(self):
+        return [self._facility(i) for i in range(len(self))]
+
+    def _candidates(self, lat, lon, radius_km):
+        """Indices of facilities in the grid cells overlapping the query circle's bounding box"""
+        dlat = radius_km / 111.0
+        dlon = min(180.0, radius_km / (111.32 * max(math.cos(math.radians(lat)), 0.01)))
+        row0 = int(math.floor((max(lat - dlat, -90.0) + 90.0) / CELL_DEGREES))
+        row1 = int(math.floor((min(lat + dlat, 90.0) + 90.0) / CELL_DEGREES))
+        col0 = int(math.floor((lon - dlon + 180.0) / CELL_DEGREES))
+        col1 = int(math.floor((lon + dlon + 180.0) / CELL_DEGREES))
+        if col1 - col0 + 1 >= GRID_COLUMNS:
+            spans = [(0, GRID_COLUMNS - 1)]
+        elif col0 < 0:
+            spans = [(0, col1), (col0 + GRID_COLUMNS, GRID_COLUMNS - 1)]
+        elif col1 >= GRID_COLUMNS:
+            spans = [(col0, GRID_COLUMNS - 1), (0, col1 - GRID_COLUMNS)]
+        else:
+            spans = [(col0, col1)]
+        # Within a row the cells of a column span have consecutive keys, so
+        # each (row, span) is one contiguous slice of the sorted arrays
+        rows = np.arange(row0, row1 + 1, dtype=np.int64) * GRID_COLUMNS
+        lo = np.concatenate([rows + c0 for c0, _ in spans])
+        hi = np.concatenate([rows + c1 for _, c1 in spans])
+        first = np.searchsorted(self.cells, lo, side="left")
+        last = np.searchsorted(self.cells, hi, side="right")
+        slices = [np.arange(self.cell_starts[a], self.cell_starts[b])
+                  for a, b in zip(first, last) if b > a]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def _within(self, lat, lon, radius_km, kinds=None):
+        """(indices, distances) of the facilities (of these kinds) within radius_km"""
+        if not self.available:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        candidates = self._candidates(lat, lon, radius_km)
+        if kinds:
+            codes = [KIND_CODES[k] for k in kinds if k in KIND_CODES]
+            candidates = candidates[np.isin(self.arrays["kind"][candidates], codes)]
+        if not len(candidates):
+            return candidates, np.empty(0)
+        distances = haversine_km(lat, lon, self.arrays["lat"][candidates], self.arrays["lon"][candidates])
+        inside = distances <= radius_km
+        return candidates[inside], distances[inside]
+
+    def radius(self, lat, lon, radius_km, kinds=None, limit=None):
+        """Facilities within radius_km of (lat, lon), nearest first"""
+        self.stats["queries"] += 1
+        if not self.available:
+            return []
+        candidates, distances = self._within(lat, lon, radius_km, kinds)
+        order = np.argsort(distances, kind="stable")[:limit]
+        self.stats["hits" if len(order) else "misses"] += 1
+        return [self._facility(int(candidates[i]), round(float(distances[i]), 3)) for i in order]
+
+    def nearest(self, lat, lon, k=5, kinds=None, max_km=50.0):
+        """The k facilities nearest to (lat, lon), searching out to max_km"""
+        radius_km = CELL_DEGREES * 111.0
+        while True:
+            radius_km = min(radius_km, max_km)
+            found = self.radius(lat, lon, radius_km, kinds, limit=k)
+            # Everything within radius_km was seen, so k results there are the true k nearest
+            if len(found) >= k or radius_km >= max_km:
+                return found
+            radius_km *= 2
+
+    def snapshot(self):
+        return {"facilities": len(self), "cells": len(self.cells) if self.cells is not None else 0,
+                "kinds": self.meta.get("kinds", {}), "built_at": self.meta.get("built_at"), **self.stats}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local health facility index from OSM extracts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import an OSM extract (.osm/.osc[.gz|.bz2] or .pbf)")
+    imp.add_argument('extracts', nargs='+')
+    imp.add_argument('--incremental', action='store_true',
+                     help="Merge into the existing index instead of rebuilding it")
+    imp.add_argument('--source', help="Source the extracts update (default: from each file name)")
+    imp.add_argument('--dir', default=Config.FACILITY_INDEX_DIR)
+    near = sub.add_parser("nearest", help="Query the index")
+    near.add_argument('lat', type=float)
+    near.add_argument('lon', type=float)
+    near.add_argument('-k', type=int, default=5)
+    near.add_argument('--radius', type=float, help="Radius query in km instead of k-nearest")
+    near.add_argument('--kinds', nargs='*', choices=KINDS)
+    near.add_argument('--dir', default=Config.FACILITY_INDEX_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        for number, path in enumerate(args.extracts):
+            import_extract(path, args.dir, incremental=args.incremental or number > 0, source=args.source)
+        return
+
+    index = FacilityIndex(args.dir)
+    index.load()
+    started = time.perf_counter()
+    if args.radius:
+        found = index.radius(args.lat, args.lon, args.radius, args.kinds, limit=args.k)
+    else:
+        found = index.nearest(args.lat, args.lon, args.k, args.kinds)
+    elapsed_us = (time.perf_counter() - started) * 1e6
+    for facility in found:
+        print(f"{facility.distance_km:8.2f} km  {facility.kind:<9} {facility.name} "
+              f"({facility.osm_type}/{facility.osm_id}) {facility.address}")
+    print(f"{len(found)} result(s) in {elapsed_us:.0f} us")
+
+
+if __name__ == '__main__':
+    main()
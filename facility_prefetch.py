@@ -0,0 +1,173 @@
+"""
+Background prefetch of facility searches for popular locations
+
+Mines chat_logs for the locations and facility types people search most
+(intents location_<type> and location_shared_<type>, with the searched
+place in user_location) and refreshes their geocode and facility list in
+the geo cache before the cached entries expire, so popular searches are
+answered from the cache instead of Nominatim and Overpass on the
+request path.
+
+Each run refreshes at most Config.FACILITY_PREFETCH_BUDGET searches,
+spaced out to Config.FACILITY_PREFETCH_RATE_PER_MINUTE to stay well inside
+the public Nominatim / Overpass usage policies. Searches whose entries are
+still fresh (more than the refresh margin left) cost nothing.
+
+Usage:
+    python facility_prefetch.py            # one run, then exit
+    python facility_prefetch.py --top 50 --budget 10
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from config import Config
+from rate_limit import RateLimiter
+from telemetry import Counters
+
+PrefetchJob = namedtuple("PrefetchJob", ["location", "facility_type", "searches"])
+
+INTENT_PREFIXES = ("location_shared_", "location_")
+
+
+def facility_type_of(intent):
+    """Facility type of a logged location intent, or None"""
+    for prefix in INTENT_PREFIXES:
+        if intent and intent.startswith(prefix):
+            return intent[len(prefix):] or None
+    return None
+
+
+def popular_searches(limit=None, days=None, db_path=None):
+    """The most searched (location, facility type) pairs of the last `days` days"""
+    limit = limit or Config.FACILITY_PREFETCH_TOP_N
+    days = days or Config.FACILITY_PREFETCH_DAYS
+    try:
+        conn = sqlite3.connect(db_path or Config.DATABASE_PATH)
+        rows = conn.execute(
+            """SELECT intent, lower(trim(user_location)) AS location, COUNT(*) FROM chat_logs
+               WHERE intent LIKE 'location\\_%' ESCAPE '\\' AND user_location IS NOT NULL
+               AND trim(user_location) != '' AND timestamp >= datetime('now', ?)
+               GROUP BY intent, location""",
+            (f"-{int(days)} days",)
+        ).fetchall()
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"⚠️ Prefetch query error: {e}")
+        return []
+    counts = {}
+    for intent, location, searches in rows:
+        facility_type = facility_type_of(intent)
+        if facility_type:
+            # Typed and shared-location searches of the same place count together
+            counts[(location, facility_type)] = counts.get((location, facility_type), 0) + searches
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [PrefetchJob(location, facility_type, searches) for (location, facility_type), searches in ranked[:limit]]
+
+
+class FacilityPrefetcher:
+    """
+    refresh(location, facility_type) -> bool re-runs a search bypassing the
+    cache; is_fresh(location, facility_type, min_remaining_seconds) -> bool
+    tells whether its cached results will outlive the margin.
+    """
+
+    def __init__(self, refresh, is_fresh, top_n=None, days=None, budget=None,
+                 rate_per_minute=None, margin=None, db_path=None):
+        self.refresh = refresh
+        self.is_fresh = is_fresh
+        self.top_n = top_n or Config.FACILITY_PREFETCH_TOP_N
+        self.days = days or Config.FACILITY_PREFETCH_DAYS
+        self.budget = budget if budget is not None else Config.FACILITY_PREFETCH_BUDGET
+        self.margin = margin if margin is not None else Config.FACILITY_PREFETCH_MARGIN_HOURS * 3600
+        self.db_path = db_path
+        self.limiter = RateLimiter(rate_per_minute if rate_per_minute is not None
+                                   else Config.FACILITY_PREFETCH_RATE_PER_MINUTE)
+        self.counters = Counters("runs", "refreshed", "skipped_fresh", "deferred", "errors")
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """One pass over the popular searches; returns a summary"""
+        jobs = popular_searches(self.top_n, self.days, self.db_path)
+        summary = {"jobs": len(jobs), "refreshed": 0, "skipped_fresh": 0, "deferred": 0, "errors": 0}
+        started = time.time()
+        for job in jobs:
+            if self._stop.is_set():
+                break
+            if self.is_fresh(job.location, job.facility_type, self.margin):
+                summary["skipped_fresh"] += 1
+                continue
+            if summary["refreshed"] + summary["errors"] >= self.budget:
+                # Left for the next run; the most searched places went first
+                summary["deferred"] += 1
+                continue
+            self.limiter.wait()
+            try:
+                ok = self.refresh(job.location, job.facility_type)
+            except Exception as e:
+                ok = False
+                print(f"⚠️ Prefetch failed for {job.facility_type} near '{job.location}': {type(e).__name__}: {e}")
+            summary["refreshed" if ok else "errors"] += 1
+            if ok:
+                print(f"🛰️ Prefetched {job.facility_type} near '{job.location}' ({job.searches} searches)")
+        self.counters.incr("runs")
+        for key in ("refreshed", "skipped_fresh", "deferred", "errors"):
+            self.counters.incr(key, summary[key])
+        self.last_run = {"at": started, "seconds": round(time.time() - started, 2), **summary}
+        print(f"🛰️ Facility prefetch done: {summary}")
+        return summary
+
+    def _loop(self, interval):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ Prefetch run error: {type(e).__name__}: {e}")
+            self._stop.wait(interval)
+
+    def start(self, interval=None):
+        """Run every `interval` seconds on a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        interval = interval or Config.FACILITY_PREFETCH_INTERVAL
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="facility-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {**self.counters.snapshot(), "budget": self.budget, "top_n": self.top_n,
+                "running": bool(self._thread and self._thread.is_alive()), "last_run": self.last_run}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prefetch facility searches for popular locations")
+    parser.add_argument('--top', type=int, help="Number of popular searches to consider")
+    parser.add_argument('--budget', type=int, help="Maximum searches to refresh")
+    parser.add_argument('--list', action='store_true', help="Only list the popular searches")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for job in popular_searches(args.top):
+            print(f"{job.searches:6d}  {job.facility_type:<10} {job.location}")
+        return
+
+    import app
+    app.warmup(["database", "indexes"])
+    prefetcher = app.FACILITY_PREFETCHER
+    if args.top:
+        prefetcher.top_n = args.top
+    if args.budget is not None:
+        prefetcher.budget = args.budget
+    prefetcher.run_once()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Adaptive generation budget per intent, language and message length
+
+Picks max_tokens, a compact or full system-prompt variant and the model for
+each health query, instead of sending everything with max_tokens=800 and the
+long prompt. Generation time is roughly linear in output tokens, so short
+questions get short budgets, while disease overviews keep the full one.
+Hindi needs several times more tokens per word, so its budgets are scaled.
+
+Budgets can be tuned without code changes through GENERATION_BUDGETS (a JSON
+object merged over DEFAULT_BUDGETS) and GENERATION_LANGUAGE_MULTIPLIERS.
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+
+from config import Config
+from telemetry import Counters, LatencyHistogram
+from utils import get_intent
+
+Budget = namedtuple("Budget", ["name", "max_tokens", "prompt", "model", "max_words"])
+
+DEFAULT_BUDGETS = {
+    "brief": {"max_tokens": 220, "prompt": "compact", "model": "llama-3.1-8b-instant", "max_words": 80},
+    "standard": {"max_tokens": 450, "prompt": "compact", "model": "llama-3.1-8b-instant", "max_words": 200},
+    "detailed": {"max_tokens": 800, "prompt": "full", "model": "llama-3.1-8b-instant", "max_words": 500}
+}
+
+DEFAULT_LANGUAGE_MULTIPLIERS = {"english": 1.0, "hindi": 1.8}
+
+# Opening words of yes/no and quick factual questions
+BRIEF_OPENERS = (
+    "is", "are", "can", "could", "should", "does", "do", "will", "may", "am", "was",
+    "kya", "क्या"
+)
+
+DETAIL_KEYWORDS = (
+    "explain", "overview", "everything", "in detail", "detail", "causes", "treatment",
+    "treatments", "prevention", "prevent", "difference", "compare", "diet plan", "cure",
+    "विस्तार", "इलाज", "कारण", "उपचार", "रोकथाम"
+)
+
+_WORD = re.compile(r'[\w\u0900-\u0DFF]+')
+
+
+def _load_json_setting(name, default):
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        print(f"⚠️ Ignoring invalid {name}: {e}")
+        return default
+
+
+def load_budgets():
+    budgets = {name: dict(values) for name, values in DEFAULT_BUDGETS.items()}
+    for name, overrides in _load_json_setting("GENERATION_BUDGETS", {}).items():
+        budgets.setdefault(name, dict(DEFAULT_BUDGETS["standard"])).update(overrides)
+    multipliers = {**DEFAULT_LANGUAGE_MULTIPLIERS,
+                   **_load_json_setting("GENERATION_LANGUAGE_MULTIPLIERS", {})}
+    return budgets, multipliers
+
+
+BUDGETS, LANGUAGE_MULTIPLIERS = load_budgets()
+
+
+def classify(message, intent=None):
+    """Budget class for a message: brief, standard or detailed"""
+    text = message.lower().strip()
+    words = _WORD.findall(text)
+    intent = intent or get_intent(message)
+
+    if len(words) > Config.GENERATION_LONG_MESSAGE_WORDS:
+        return "detailed"
+    if any(keyword in text for keyword in DETAIL_KEYWORDS):
+        return "detailed"
+    if intent == "disease_info" and len(words) > 2:
+        return "detailed"
+    if words and len(words) <= 8 and words[0] in BRIEF_OPENERS:
+        return "brief"
+    return "standard"
+
+
+def select_budget(message, language='english', intent=None):
+    """Resolve the budget (max_tokens scaled for the language) for a message"""
+    if not Config.ADAPTIVE_GENERATION_BUDGET:
+        # One budget for everything, as before
+        name, multiplier = "detailed", 1.0
+    else:
+        name = classify(message, intent)
+        multiplier = LANGUAGE_MULTIPLIERS.get(language, 1.0)
+    values = BUDGETS[name]
+    return Budget(
+        name=name,
+        max_tokens=int(values["max_tokens"] * multiplier),
+        prompt=values["prompt"],
+        model=values["model"],
+        max_words=values["max_words"]
+    )
+
+
+class BudgetStats:
+    """Per-budget-class latency, token usage and truncation counts"""
+
+    def __init__(self):
+        self.latency = {}
+        self.counters = Counters()
+
+    def record(self, budget, language, seconds, completion_tokens=None, finish_reason=None):
+        key = f"{budget.name}:{language}"
+        self.latency.setdefault(key, LatencyHistogram()).observe(seconds)
+        self.counters.incr(f"{key}:calls")
+        if completion_tokens is not None:
+            self.counters.incr(f"{key}:completion_tokens", completion_tokens)
+        if finish_reason == "length":
+            self.counters.incr(f"{key}:truncated")
+        print(f"📏 Budget {key}: {seconds:.2f}s, {completion_tokens if completion_tokens is not None else '?'}"
+              f"/{budget.max_tokens} tokens{' (truncated)' if finish_reason == 'length' else ''}")
+
+    def snapshot(self):
+        counters = self.counters.snapshot()
+        result = {}
+        for key, hist in list(self.latency.items()):
+            calls = counters.get(f"{key}:calls", 0)
+            tokens = counters.get(f"{key}:completion_tokens", 0)
+            result[key] = {
+                "calls": calls,
+                "avg_completion_tokens": round(tokens / calls, 1) if calls else None,
+                "truncated": counters.get(f"{key}:truncated", 0),
+                "latency": hist.snapshot()
+            }
+        return result
+
+
+BUDGET_STATS = BudgetStats()
@@ -0,0 +1,285 @@
+"""
+Geohash-keyed cache for geocoding and facility search results
+
+Keeps the expensive parts of a location search in the local database:
+
+- forward geocodes, keyed by the normalised query text
+  ("Connaught Place,  Delhi" and "connaught place delhi" share an entry)
+- reverse geocodes of shared live locations, keyed by geohash cell
+- facility lists, keyed by geohash cell + facility type
+
+Point lookups also check the 8 neighbouring cells and take the closest
+entry recorded within Config.GEO_CACHE_SHARE_KM, so users a few hundred
+metres apart (or on opposite sides of a cell edge) share one Nominatim /
+Overpass result. Every entry has a TTL per kind.
+"""
+
+import json
+import math
+import sqlite3
+import threading
+import time
+
+import geocoder
+from config import Config
+from telemetry import Counters
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {ch: i for i, ch in enumerate(BASE32)}
+
+KINDS = ("geocode", "reverse", "facilities")
+
+# Delete expired rows once every this many writes
+PURGE_EVERY = 200
+
+
+def geohash(lat, lon, precision=6):
+    """Standard base32 geohash of a point"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def decode(cell):
+    """(lat, lon, lat_half_height, lon_half_width) of a geohash cell's centre"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for ch in cell:
+        value = _BASE32_INDEX[ch]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return ((lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2,
+            (lat_range[1] - lat_range[0]) / 2, (lon_range[1] - lon_range[0]) / 2)
+
+
+def neighbours(cell):
+    """The cell and its (up to) 8 adjacent cells"""
+    lat, lon, dlat, dlon = decode(cell)
+    cells = []
+    for i in (0, -1, 1):
+        for j in (0, -1, 1):
+            nlat = lat + 2 * dlat * i
+            if not -90.0 < nlat < 90.0:
+                continue
+            nlon = (lon + 2 * dlon * j + 180.0) % 360.0 - 180.0
+            neighbour = geohash(nlat, nlon, len(cell))
+            if neighbour not in cells:
+                cells.append(neighbour)
+    return cells
+
+
+def init_geo_cache(conn):
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS geo_cache
+                 (kind TEXT, key TEXT, cell TEXT, lat REAL, lon REAL, value TEXT,
+                  created REAL, expires_at REAL, PRIMARY KEY (kind, key))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_geo_cache_cell ON geo_cache (kind, cell)")
+    conn.commit()
+
+
+class GeoCache:
+    """Persistent TTL cache for location search results (table created by init_geo_cache)"""
+
+    def __init__(self, db_path=None, precision=None, share_km=None, ttls=None):
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.precision = precision or Config.GEO_CACHE_PRECISION
+        self.share_km = Config.GEO_CACHE_SHARE_KM if share_km is None else share_km
+        self.ttls = ttls or {
+            "geocode": Config.GEO_CACHE_GEOCODE_TTL,
+            "reverse": Config.GEO_CACHE_REVERSE_TTL,
+            "facilities": Config.GEO_CACHE_FACILITY_TTL
+        }
+        self.counters = {kind: Counters("hits", "neighbour_hits", "misses", "expired", "stores")
+                         for kind in KINDS}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    # --- Storage ------------------------------------------------------------------
+
+    def _put(self, kind, key, value, lat=None, lon=None, cell=None):
+        """cell: geohash (plus "|facility_type" for facility lists) for neighbour lookups"""
+        now = time.time()
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("INSERT OR REPLACE INTO geo_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (kind, key, cell, lat, lon, json.dumps(value, ensure_ascii=False), now,
+                          now + self.ttls[kind]))
+            with self._lock:
+                self._writes += 1
+                purge = self._writes % PURGE_EVERY == 0
+            if purge:
+                conn.execute("DELETE FROM geo_cache WHERE expires_at <= ?", (now,))
+            conn.commit()
+            conn.close()
+            self.counters[kind].incr("stores")
+        except sqlite3.Error as e:
+            print(f"⚠️ Geo cache write error: {e}")
+
+    def _get(self, kind, key):
+        try:
+            conn = sqlite3.connect(self.db_path)
+            row = conn.execute("SELECT value, expires_at FROM geo_cache WHERE kind = ? AND key = ?",
+                               (kind, key)).fetchone()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Geo cache read error: {e}")
+            return None
+        if row is None:
+            self.counters[kind].incr("misses")
+            return None
+        if row[1] <= time.time():
+            self.counters[kind].incr("expired")
+            self.counters[kind].incr("misses")
+            return None
+        self.counters[kind].incr("hits")
+        return json.loads(row[0])
+
+    def peek(self, kind, key):
+        """(value, seconds until expiry) of an entry without counting a lookup, or (None, 0)"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            row = conn.execute("SELECT value, expires_at FROM geo_cache WHERE kind = ? AND key = ?",
+                               (kind, key)).fetchone()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Geo cache read error: {e}")
+            return None, 0
+        if row is None or row[1] <= time.time():
+            return None, 0
+        return json.loads(row[0]), row[1] - time.time()
+
+    def _get_near(self, kind, lat, lon, suffix=""):
+        """Closest live entry recorded within share_km, searching the cell and its neighbours"""
+        cell = geohash(lat, lon, self.precision) + suffix
+        cells = [neighbour + suffix for neighbour in neighbours(cell[:self.precision])]
+        try:
+            conn = sqlite3.connect(self.db_path)
+            rows = conn.execute(
+                f"""SELECT cell, lat, lon, value FROM geo_cache
+                    WHERE kind = ? AND cell IN ({','.join('?' * len(cells))}) AND expires_at > ?""",
+                (kind, *cells, time.time())).fetchall()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Geo cache read error: {e}")
+            return None
+        best, best_km, best_cell = None, None, None
+        for row_cell, row_lat, row_lon, value in rows:
+            distance = geocoder.haversine_km(lat, lon, row_lat, row_lon)
+            if distance <= self.share_km and (best_km is None or distance < best_km):
+                best, best_km, best_cell = value, distance, row_cell
+        if best is None:
+            self.counters[kind].incr("misses")
+            return None
+        self.counters[kind].incr("hits" if best_cell == cell else "neighbour_hits")
+        return json.loads(best)
+
+    # --- Forward geocodes -----------------------------------------------------------
+
+    @staticmethod
+    def query_key(query):
+        return geocoder.normalize(query) or str(query).strip().lower()
+
+    def get_geocode(self, query):
+        """{"lat", "lon", "display_name"} for a place query, or None"""
+        return self._get("geocode", self.query_key(query))
+
+    def put_geocode(self, query, lat, lon, display_name):
+        lat, lon = float(lat), float(lon)
+        self._put("geocode", self.query_key(query), {"lat": lat, "lon": lon, "display_name": display_name},
+                  lat, lon, geohash(lat, lon, self.precision))
+
+    # --- Reverse geocodes -----------------------------------------------------------
+
+    def get_reverse(self, lat, lon):
+        """Address recorded for a point within share_km, or None"""
+        value = self._get_near("reverse", float(lat), float(lon))
+        return value["display_name"] if value else None
+
+    @staticmethod
+    def point_key(lat, lon, facility_type=None):
+        key = f"{float(lat):.5f},{float(lon):.5f}"
+        return f"{key}|{facility_type}" if facility_type else key
+
+    def put_reverse(self, lat, lon, display_name):
+        lat, lon = float(lat), float(lon)
+        key = self.point_key(lat, lon)
+        self._put("reverse", key, {"display_name": display_name}, lat, lon, geohash(lat, lon, self.precision))
+
+    # --- Facility lists -------------------------------------------------------------
+
+    def get_facilities(self, lat, lon, facility_type):
+        """Facility dicts found for a search near the point, nearest first, or None"""
+        lat, lon = float(lat), float(lon)
+        facilities = self._get_near("facilities", lat, lon, suffix=f"|{facility_type}")
+        if facilities is None:
+            return None
+        return rank_by_distance(facilities, lat, lon)
+
+    def put_facilities(self, lat, lon, facility_type, facilities):
+        lat, lon = float(lat), float(lon)
+        key = self.point_key(lat, lon, facility_type)
+        self._put("facilities", key, facilities, lat, lon, f"{geohash(lat, lon, self.precision)}|{facility_type}")
+
+    # --- Maintenance ----------------------------------------------------------------
+
+    def purge(self):
+        """Delete expired entries; returns how many were removed"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            removed = conn.execute("DELETE FROM geo_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            conn.commit()
+            conn.close()
+            return removed
+        except sqlite3.Error as e:
+            print(f"⚠️ Geo cache purge error: {e}")
+            return 0
+
+    def snapshot(self):
+        entries = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            entries = dict(conn.execute("SELECT kind, COUNT(*) FROM geo_cache GROUP BY kind").fetchall())
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Geo cache stats error: {e}")
+        stats = {}
+        for kind, counters in self.counters.items():
+            values = counters.snapshot()
+            lookups = values["hits"] + values["neighbour_hits"] + values["misses"]
+            stats[kind] = {**values, "entries": entries.get(kind, 0),
+                           "hit_rate": round((values["hits"] + values["neighbour_hits"]) / lookups, 3)
+                           if lookups else None}
+        return {"precision": self.precision, "share_km": self.share_km, **stats}
+
+
+def rank_by_distance(facilities, lat, lon):
+    """Facility dicts (with lat/lon) sorted by distance from the point, with distance_km set"""
+    ranked = []
+    for facility in facilities:
+        if facility.get("lat") is None or facility.get("lon") is None:
+            distance = math.inf
+        else:
+            distance = geocoder.haversine_km(lat, lon, float(facility["lat"]), float(facility["lon"]))
+        ranked.append({**facility, "distance_km": round(distance, 3) if distance != math.inf else None})
+    ranked.sort(key=lambda f: math.inf if f["distance_km"] is None else f["distance_km"])
+    return ranked
@@ -0,0 +1,452 @@
+"""
+Offline gazetteer geocoder for Indian place names
+
+Resolves place names from a local gazetteer so "find hospitals in X"
+messages only go to Nominatim when the place is unknown. The gazetteer is
+built once with the import tool from a GeoNames country dump (IN.txt,
+optionally with admin1CodesASCII.txt for state names) or an OSM place
+extract in GeoJSON / GeoJSON-lines form:
+
+    python geocoder.py import --geonames IN.txt --admin1 admin1CodesASCII.txt
+    python geocoder.py import --geojson india-places.geojsonseq
+    python geocoder.py lookup "bangalore"
+
+Every name and alternate name is stored under a normalised key
+(lower-case, accents and punctuation removed, Devanagari transliterated to
+Latin) and a looser phonetic key that folds common romanisation variants
+(aa/a, ee/i, w/v, sh/s, doubled letters ...). At startup the keys are
+loaded into memory for exact, prefix and fuzzy (small edit distance)
+lookup.
+"""
+
+import argparse
+import bisect
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from config import Config
+
+Place = namedtuple("Place", ["id", "name", "display_name", "lat", "lon", "kind", "population"])
+Resolution = namedtuple("Resolution", ["place", "matched", "method", "partial"])
+
+# Preference among places sharing a name (lower is better)
+KIND_RANK = {
+    "PPLC": 0, "PPLA": 1, "ADM1": 1, "city": 1, "PPLA2": 2, "ADM2": 2, "PPLA3": 3, "ADM3": 3,
+    "town": 3, "PPL": 4, "PPLX": 5, "suburb": 5, "neighbourhood": 6, "village": 6
+}
+
+GEONAMES_FEATURE_CLASSES = {"P", "A"}
+
+# Leftover words naming a place within this distance are just context ("Connaught Place Delhi")
+CONTEXT_RADIUS_KM = 50
+
+# Words that carry no place information in "find hospital in X" queries
+GENERIC_WORDS = {
+    "india", "city", "district", "area", "town", "village", "me", "mein", "में", "near", "nearby",
+    "the", "in", "at", "please", "pls", "my", "location", "state"
+}
+
+# Devanagari -> Latin transliteration (inherent 'a' handled in transliterate())
+_DEVANAGARI_CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'n', 'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'jh',
+    'ञ': 'n', 'ट': 't', 'ठ': 'th', 'ड': 'd', 'ढ': 'dh', 'ण': 'n', 'त': 't', 'थ': 'th', 'द': 'd',
+    'ध': 'dh', 'न': 'n', 'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm', 'य': 'y', 'र': 'r',
+    'ल': 'l', 'ळ': 'l', 'व': 'v', 'श': 'sh', 'ष': 'sh', 'स': 's', 'ह': 'h'
+}
+_DEVANAGARI_VOWELS = {
+    'अ': 'a', 'आ': 'aa', 'इ': 'i', 'ई': 'ee', 'उ': 'u', 'ऊ': 'oo', 'ऋ': 'ri', 'ए': 'e', 'ऐ': 'ai',
+    'ओ': 'o', 'औ': 'au'
+}
+_DEVANAGARI_SIGNS = {
+    'ा': 'aa', 'ि': 'i', 'ी': 'ee', 'ु': 'u', 'ू': 'oo', 'ृ': 'ri', 'े': 'e', 'ै': 'ai', 'ो': 'o',
+    'ौ': 'au', 'ं': 'n', 'ँ': 'n', 'ः': 'h', '्': ''
+}
+
+NUKTA = '\u093c'
+
+# Romanisation variants folded by the phonetic key, applied in order
+_PHONETIC_RULES = [
+    (re.compile(r'(.)\1+'), r'\1'),
+    (re.compile(r'ee|ii'), 'i'),
+    (re.compile(r'oo|uu'), 'u'),
+    (re.compile(r'aa'), 'a'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'z'), 'j'),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'([kgcjtdpbs])h'), r'\1'),
+    (re.compile(r'ck|q'), 'k'),
+    (re.compile(r'y$'), 'i'),
+]
+
+
+def transliterate(text):
+    """Rough Devanagari -> Latin transliteration (other characters pass through)"""
+    text = unicodedata.normalize('NFC', text)
+    out = []
+    chars = list(text)
+    for i, ch in enumerate(chars):
+        if ch in _DEVANAGARI_CONSONANTS:
+            out.append(_DEVANAGARI_CONSONANTS[ch])
+            nxt = chars[i + 1] if i + 1 < len(chars) else ''
+            # Inherent vowel unless a sign follows or the word ends (schwa deletion)
+            if nxt and nxt not in _DEVANAGARI_SIGNS and nxt != NUKTA and '\u0900' <= nxt <= '\u097f':
+                out.append('a')
+        elif ch in _DEVANAGARI_SIGNS:
+            out.append(_DEVANAGARI_SIGNS[ch])
+        elif ch in _DEVANAGARI_VOWELS:
+            out.append(_DEVANAGARI_VOWELS[ch])
+        elif ch == NUKTA:
+            continue
+        else:
+            out.append(ch)
+    return ''.join(out)
+
+
+def normalize(name):
+    """Lookup key: transliterated, lower-case, ASCII letters/digits and single spaces"""
+    text = transliterate(name).lower()
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r'[^a-z0-9]+', ' ', text)
+    return text.strip()
+
+
+def phonetic_key(key):
+    """Looser key that folds common Indian romanisation variants"""
+    key = key.replace(' ', '')
+    for pattern, replacement in _PHONETIC_RULES:
+        key = pattern.sub(replacement, key)
+    return key
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 once it is certain to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def _rank(place):
+    return (KIND_RANK.get(place.kind, 7), -(place.population or 0))
+
+
+# --- Import ---------------------------------------------------------------------
+
+def init_gazetteer(conn):
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS places
+                 (id INTEGER PRIMARY KEY, name TEXT, display_name TEXT, lat REAL, lon REAL,
+                  kind TEXT, population INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS place_names
+                 (key TEXT, place_id INTEGER, PRIMARY KEY (key, place_id))''')
+    conn.commit()
+
+
+def iter_geonames(path, admin1_path=None, min_population=0):
+    """Places from a GeoNames dump (tab-separated, 19 columns)"""
+    states = {}
+    if admin1_path:
+        with open(admin1_path, encoding='utf-8') as f:
+            for line in f:
+                code, name = line.rstrip('\n').split('\t')[:2]
+                states[code] = name
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            cols = line.rstrip('\n').split('\t')
+            if len(cols) < 15 or cols[6] not in GEONAMES_FEATURE_CLASSES:
+                continue
+            population = int(cols[14] or 0)
+            kind = cols[7]
+            if cols[6] == "P" and population < min_population and not kind.startswith(("PPLC", "PPLA")):
+                continue
+            state = states.get(f"{cols[8]}.{cols[10]}")
+            display = ", ".join(part for part in (cols[1], state, "India" if cols[8] == "IN" else cols[8]) if part)
+            names = {cols[1], cols[2]} | {n for n in cols[3].split(',') if n}
+            yield (int(cols[0]), cols[1], display, float(cols[4]), float(cols[5]), kind, population), names
+
+
+def iter_geojson(path):
+    """Places from an OSM place extract (GeoJSON FeatureCollection or one feature per line)"""
+    with open(path, encoding='utf-8') as f:
+        head = f.read(1)
+        f.seek(0)
+        if head == '{' and '"FeatureCollection"' in f.read(4096):
+            f.seek(0)
+            features = json.load(f).get("features", [])
+        else:
+            f.seek(0)
+            features = (json.loads(line.lstrip('\x1e')) for line in f if line.strip())
+        for number, feature in enumerate(features, 1):
+            props = feature.get("properties") or {}
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") != "Point" or not props.get("name"):
+                continue
+            lon, lat = geometry["coordinates"][:2]
+            names = {value for key, value in props.items()
+                     if key in ("name", "alt_name", "old_name", "official_name", "short_name")
+                     or key.startswith("name:")}
+            names = {n.strip() for value in names for n in str(value).split(';') if n.strip()}
+            display = ", ".join(part for part in (props.get("name:en") or props["name"],
+                                                  props.get("is_in:state") or props.get("addr:state"),
+                                                  "India") if part)
+            try:
+                population = int(str(props.get("population", 0)).replace(',', '') or 0)
+            except ValueError:
+                population = 0
+            place_id = feature.get("id") or props.get("@id") or number
+            if isinstance(place_id, str):
+                place_id = int(re.sub(r'\D', '', place_id) or number)
+            yield (place_id, props.get("name:en") or props["name"], display, float(lat), float(lon),
+                   props.get("place", "PPL"), population), names
+
+
+def import_places(records, db_path=None):
+    """Write (place_row, names) records into the gazetteer database"""
+    db_path = db_path or Config.GAZETTEER_DB_PATH
+    conn = sqlite3.connect(db_path)
+    init_gazetteer(conn)
+    c = conn.cursor()
+    places = keys = 0
+    for row, names in records:
+        c.execute("INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+        name_keys = {normalize(name) for name in names} - {''}
+        name_keys |= {'~' + phonetic_key(key) for key in name_keys}
+        c.executemany("INSERT OR IGNORE INTO place_names VALUES (?, ?)", [(key, row[0]) for key in name_keys])
+        places += 1
+        keys += len(name_keys)
+        if places % 50000 == 0:
+            conn.commit()
+            print(f"   {places} places...")
+    conn.commit()
+    conn.close()
+    print(f"✅ Imported {places} places ({keys} name keys) into {db_path}")
+    return places
+
+
+# --- Lookup ---------------------------------------------------------------------
+
+class Gazetteer:
+    """In-memory name index over the gazetteer database"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.GAZETTEER_DB_PATH
+        self.places = {}
+        self.exact = {}
+        self.phonetic = {}
+        self.sorted_keys = []
+        self.by_length = {}
+        self.stats = {"lookups": 0, "exact": 0, "phonetic": 0, "fuzzy": 0, "partial": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the index; returns the number of places (0 when no gazetteer was imported)"""
+        if not self.db_path or not os.path.exists(self.db_path):
+            print(f"ℹ️ No gazetteer at {self.db_path} - geocoding with Nominatim only")
+            return 0
+        started = time.perf_counter()
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            places = {row[0]: Place(*row) for row in c.execute("SELECT * FROM places")}
+            names = c.execute("SELECT key, place_id FROM place_names").fetchall()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Gazetteer load error: {e}")
+            return 0
+
+        exact, phonetic = {}, {}
+        for key, place_id in names:
+            place = places.get(place_id)
+            if place is None:
+                continue
+            target = phonetic if key.startswith('~') else exact
+            key = key.lstrip('~')
+            best = target.get(key)
+            if best is None or _rank(place) < _rank(best):
+                target[key] = place
+        by_length = {}
+        for key in exact:
+            by_length.setdefault(len(key), []).append(key)
+        with self._lock:
+            self.places, self.exact, self.phonetic = places, exact, phonetic
+            self.sorted_keys = sorted(exact)
+            self.by_length = by_length
+        print(f"✅ Gazetteer loaded: {len(places)} places, {len(exact)} names "
+              f"({time.perf_counter() - started:.2f}s)")
+        return len(places)
+
+    def __len__(self):
+        return len(self.places)
+
+    def lookup(self, name, fuzzy=True):
+        """(place, method) for one place name, or (None, None)"""
+        key = normalize(name)
+        if not key:
+            return None, None
+        place = self.exact.get(key)
+        if place:
+            return place, "exact"
+        place = self.phonetic.get(phonetic_key(key))
+        if place:
+            return place, "phonetic"
+        if fuzzy and len(key) >= 4:
+            place = self.fuzzy(key)
+            if place:
+                return place, "fuzzy"
+        return None, None
+
+    def fuzzy(self, key, max_distance=None):
+        """Best place within a small edit distance of key"""
+        if max_distance is None:
+            max_distance = 1 if len(key) < 8 else 2
+        best = None
+        for length in range(len(key) - max_distance, len(key) + max_distance + 1):
+            for candidate in self.by_length.get(length, ()):
+                if candidate[0] != key[0]:
+                    continue
+                distance = edit_distance(key, candidate, max_distance)
+                if distance <= max_distance:
+                    place = self.exact[candidate]
+                    score = (distance,) + _rank(place)
+                    if best is None or score < best[0]:
+                        best = (score, place)
+        return best[1] if best else None
+
+    def prefix(self, text, limit=10):
+        """Places whose name starts with text, best ranked first"""
+        key = normalize(text)
+        if not key:
+            return []
+        start = bisect.bisect_left(self.sorted_keys, key)
+        found = {}
+        for candidate in self.sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            place = self.exact[candidate]
+            found[place.id] = place
+            if len(found) >= limit * 5:
+                break
+        return sorted(found.values(), key=_rank)[:limit]
+
+    def resolve(self, query):
+        """
+        Resolution for a free-text location ("Connaught Place, Delhi"), or None.
+        Tries the whole query, then comma-separated parts, then word runs
+        (longest first). A match is flagged partial when the words it leaves
+        out are neither generic nor a place close to the match (or in its
+        state) - i.e. when the user asked for somewhere more specific or
+        elsewhere. Phonetic and fuzzy matches are only a guess at the
+        spelling, so they stay partial unless those words confirm them.
+        """
+        if not self.exact:
+            return None
+        self.stats["lookups"] += 1
+        query = str(query)
+        place, method = self.lookup(query)
+        if place:
+            return self._resolved(place, query, method, [])
+
+        parts = [part.strip() for part in query.split(',') if part.strip()]
+        if len(parts) > 1:
+            for i, part in enumerate(parts):
+                place, method = self.lookup(part)
+                if place:
+                    return self._resolved(place, part, method, parts[:i] + parts[i + 1:])
+
+        words = normalize(query).split()
+        for size in range(len(words) - 1, 0, -1):
+            for start in range(len(words) - size + 1):
+                run = " ".join(words[start:start + size])
+                if run in GENERIC_WORDS:
+                    continue
+                place, method = self.lookup(run, fuzzy=False)
+                if place:
+                    rest = " ".join(words[:start] + words[start + size:])
+                    return self._resolved(place, run, method, [rest])
+        self.stats["misses"] += 1
+        return None
+
+    def _resolved(self, place, matched, method, rest):
+        context = [part for part in rest if not self._is_generic(part)]
+        partial = (not all(self._is_context(part, place) for part in context)
+                   or (method != "exact" and not context))
+        self.stats["partial" if partial else method] += 1
+        return Resolution(place, matched, method, partial)
+
+    @staticmethod
+    def _is_generic(text):
+        return all(word in GENERIC_WORDS for word in normalize(text).split())
+
+    def _is_context(self, text, place):
+        """True when text names the state of `place` or a place near it"""
+        words = [word for word in normalize(text).split() if word not in GENERIC_WORDS]
+        key = " ".join(words)
+        if key in [normalize(part) for part in place.display_name.split(",")[1:]]:
+            return True
+        other, _ = self.lookup(key, fuzzy=False)
+        return other is not None and haversine_km(place.lat, place.lon, other.lat, other.lon) <= CONTEXT_RADIUS_KM
+
+    def snapshot(self):
+        return {"places": len(self.places), "names": len(self.exact), **self.stats}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline gazetteer geocoder")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import a gazetteer dump")
+    imp.add_argument('--geonames', help="GeoNames country dump (e.g. IN.txt)")
+    imp.add_argument('--admin1', help="GeoNames admin1CodesASCII.txt for state names")
+    imp.add_argument('--geojson', help="OSM place extract (GeoJSON or GeoJSON lines)")
+    imp.add_argument('--min-population', type=int, default=0,
+                     help="Skip minor populated places below this population")
+    imp.add_argument('--db', default=Config.GAZETTEER_DB_PATH)
+    look = sub.add_parser("lookup", help="Resolve place names")
+    look.add_argument('queries', nargs='+')
+    look.add_argument('--db', default=Config.GAZETTEER_DB_PATH)
+    look.add_argument('--prefix', action='store_true', help="List prefix completions instead")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        if not (args.geonames or args.geojson):
+            parser.error("import needs --geonames or --geojson")
+        if args.geonames:
+            import_places(iter_geonames(args.geonames, args.admin1, args.min_population), args.db)
+        if args.geojson:
+            import_places(iter_geojson(args.geojson), args.db)
+        return
+
+    gazetteer = Gazetteer(args.db)
+    gazetteer.load()
+    for query in args.queries:
+        started = time.perf_counter()
+        if args.prefix:
+            result = [place.display_name for place in gazetteer.prefix(query)]
+        else:
+            result = gazetteer.resolve(query)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        print(f"{query!r} -> {result} ({elapsed_us:.0f} us)")
+
+
+if __name__ == '__main__':
+    main()
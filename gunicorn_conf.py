@@ -0,0 +1,94 @@
+"""
+Gunicorn configuration for production
+
+    gunicorn -c gunicorn_conf.py wsgi:application
+
+The master imports wsgi.py before forking (preload_app), so the indexes
+and static tables are loaded once and shared copy-on-write by every
+worker instead of each worker holding a private copy. The image models
+load in each worker (at startup when WARMUP lists "models", otherwise on
+first use): TensorFlow is not fork-safe once initialised, so
+PRELOAD_MODELS=True (share them from the master) is only for builds
+that are known to survive the fork.
+
+To keep those pages shared, garbage collection is off in the master while
+it preloads and the heap is frozen (gc.freeze) right before forking: the
+workers' collections then never write to the headers of the objects they
+inherited. Each worker re-enables gc, replaces what must not cross a fork
+(HTTP connection pools, executor threads, the single-flight owner id; see
+app.after_fork) and runs the remaining warmup hooks. SQLite connections
+are opened per call, so none is inherited.
+
+benchmarks/bench_worker_memory.py reports the unique vs shared memory of
+each worker.
+
+Only one worker (elected through a lock file per master, see leader.py)
+runs the cache pre-warm, facility prefetcher and model prober.
+
+Workers write their metrics to METRICS_DIR (a directory per master unless
+set), which /metrics in any worker sums up; see metrics.py.
+"""
+
+import gc
+import os
+import tempfile
+
+# Before config is imported: Config.METRICS_DIR and BACKGROUND_LOCK_FILE are read once
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"healnet-metrics-{os.getpid()}"))
+os.environ.setdefault("BACKGROUND_LOCK_FILE", os.path.join(tempfile.gettempdir(), f"healnet-background-{os.getpid()}.lock"))
+
+import metrics
+from config import Config
+
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = Config.GUNICORN_WORKERS
+worker_class = "gthread"
+threads = Config.GUNICORN_THREADS
+timeout = Config.GUNICORN_TIMEOUT
+preload_app = Config.GUNICORN_PRELOAD
+
+# No collections (and freed holes in pages) while the master builds long-lived state
+gc.disable()
+
+
+def on_starting(server):
+    # Counters start from zero with this master
+    metrics.clear_directory(Config.METRICS_DIR)
+
+
+def when_ready(server):
+    # The app is preloaded and no worker has been forked yet
+    gc.collect()
+    gc.freeze()
+    print(f"🧊 Froze {gc.get_freeze_count()} objects before forking {workers} workers")
+
+
+def pre_fork(server, worker):
+    # Anything the master allocated since (e.g. before replacing a dead worker)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+    if server.cfg.preload_app:
+        import app
+        app.after_fork()
+
+
+def post_worker_init(worker):
+    # The app is loaded in this worker (inherited or imported); finish Config.WARMUP here
+    import app
+    app.warmup()
+
+
+def worker_exit(server, worker):
+    # Keep the exited worker's counts in the totals
+    metrics.METRICS.flush()
+
+
+def on_exit(server):
+    metrics.clear_directory(Config.METRICS_DIR)
+    try:
+        os.remove(Config.BACKGROUND_LOCK_FILE)
+    except OSError:
+        pass
@@ -0,0 +1,143 @@
+"""
+Single-pass multi-pattern keyword matcher
+
+An Aho-Corasick automaton compiled once from named keyword tables
+({category: [keywords]}). One scan of a message reports every matched
+category with its positions, replacing the chains of
+`any(keyword in message_lower for keyword in ...)` checks.
+
+Matching follows the old checks exactly: text and keywords are lower-cased
+and a keyword matches anywhere as a substring. Categories can instead
+require regex-style word boundaries ('word', like r'\bkeyword\b') or spaces
+around the keyword ('space', like ' keyword ' in f' {text} ').
+"""
+
+from collections import deque, namedtuple
+
+Match = namedtuple("Match", ["category", "keyword", "start", "end"])
+
+BOUNDARIES = (None, "word", "space")
+
+
+def _is_word_char(ch):
+    # Same definition as \w in Python's re for str patterns
+    return ch.isalnum() or ch == '_'
+
+
+class MatchResult:
+    """All matches of one scan, grouped by category (positions index the lower-cased text)"""
+
+    __slots__ = ("text", "matches", "by_category")
+
+    def __init__(self, text, matches):
+        self.text = text
+        self.matches = matches
+        self.by_category = {}
+        for match in matches:
+            self.by_category.setdefault(match.category, []).append(match)
+
+    def __contains__(self, category):
+        return category in self.by_category
+
+    def any(self, *categories):
+        return any(category in self.by_category for category in categories)
+
+    def first(self, categories):
+        """First category of `categories` (in the given order) that matched"""
+        for category in categories:
+            if category in self.by_category:
+                return category
+        return None
+
+    def keywords(self, category):
+        return {match.keyword for match in self.by_category.get(category, ())}
+
+    def categories(self, prefix=""):
+        return [category for category in self.by_category if category.startswith(prefix)]
+
+    def to_dict(self):
+        return {category: [(m.keyword, m.start, m.end) for m in matches]
+                for category, matches in self.by_category.items()}
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over several named keyword tables"""
+
+    def __init__(self, tables, boundaries=None):
+        boundaries = boundaries or {}
+        for category, boundary in boundaries.items():
+            if boundary not in BOUNDARIES:
+                raise ValueError(f"Unknown boundary '{boundary}' for {category}")
+        self.tables = {category: tuple(keywords) for category, keywords in tables.items()}
+        self.boundaries = boundaries
+
+        # Trie: goto[state] = {char: next_state}; outputs[state] = [(category, keyword)]
+        goto = [{}]
+        outputs = [[]]
+        for category, keywords in self.tables.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                state = 0
+                for ch in keyword:
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[state][ch] = nxt
+                        goto.append({})
+                        outputs.append([])
+                    state = nxt
+                outputs[state].append((category, keyword))
+
+        # Failure links (BFS), folded into a complete transition table so the
+        # scan never follows failure chains
+        fail = [0] * len(goto)
+        delta = [dict(edges) for edges in goto]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[nxt] = goto[fallback].get(ch, 0)
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+            for ch, target in delta[fail[state]].items():
+                delta[state].setdefault(ch, target)
+
+        self.delta = delta
+        self.outputs = [tuple(out) for out in outputs]
+        self.states = len(goto)
+
+    def scan(self, text):
+        """Every keyword occurrence in text as Match tuples, in end-position order"""
+        text = text.lower()
+        delta = self.delta
+        outputs = self.outputs
+        state = 0
+        found = []
+        for i, ch in enumerate(text):
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                end = i + 1
+                for category, keyword in outputs[state]:
+                    start = end - len(keyword)
+                    if self._accept(category, text, start, end):
+                        found.append(Match(category, keyword, start, end))
+        return found
+
+    def match(self, text):
+        return MatchResult(text, self.scan(text))
+
+    def _accept(self, category, text, start, end):
+        boundary = self.boundaries.get(category)
+        if boundary is None:
+            return True
+        if boundary == "space":
+            return (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' ')
+        # Regex \b on both sides of the keyword
+        before = start > 0 and _is_word_char(text[start - 1])
+        after = end < len(text) and _is_word_char(text[end])
+        return (before != _is_word_char(text[start])) and (after != _is_word_char(text[end - 1]))
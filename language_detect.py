@@ -0,0 +1,160 @@
+"""
+Language detection for short chat messages
+
+Classifies the script of a message in one pass with a precomputed
+codepoint -> script translation table, then separates languages that share
+a script (Hindi vs Marathi in Devanagari; English, Hinglish, Spanish and
+French in Latin) with a small word-frequency model. Returns a language
+code plus a confidence in [0, 1].
+
+Codes are ISO 639-1, with romanised Hindi reported as 'hi-Latn' and a few
+Indic languages outside Config.SUPPORTED_LANGUAGES (pa, or, ml);
+utils.detect_language maps the result onto the supported codes.
+"""
+
+from collections import Counter, namedtuple
+
+Detection = namedtuple("Detection", ["language", "confidence", "script"])
+
+# (first codepoint, last codepoint, script)
+SCRIPT_RANGES = [
+    (0x0041, 0x005A, "latin"), (0x0061, 0x007A, "latin"), (0x00C0, 0x024F, "latin"),
+    (0x0900, 0x097F, "devanagari"),
+    (0x0980, 0x09FF, "bengali"),
+    (0x0A00, 0x0A7F, "gurmukhi"),
+    (0x0A80, 0x0AFF, "gujarati"),
+    (0x0B00, 0x0B7F, "oriya"),
+    (0x0B80, 0x0BFF, "tamil"),
+    (0x0C00, 0x0C7F, "telugu"),
+    (0x0C80, 0x0CFF, "kannada"),
+    (0x0D00, 0x0D7F, "malayalam"),
+]
+
+# Scripts used by exactly one supported language
+SCRIPT_LANGUAGES = {
+    "bengali": "bn", "gurmukhi": "pa", "gujarati": "gu", "oriya": "or",
+    "tamil": "ta", "telugu": "te", "kannada": "kn", "malayalam": "ml"
+}
+
+INDIC_SCRIPTS = {"devanagari"} | set(SCRIPT_LANGUAGES)
+
+# An Indic script wins over Latin once it makes up this share of the letters
+# (messages like "Delhi में hospital" are written by Hindi speakers)
+INDIC_SHARE = 0.3
+
+# Frequent words per language for scripts shared by several languages
+WORD_MODEL = {
+    "devanagari": {
+        "hi": ["है", "हैं", "में", "को", "का", "की", "के", "से", "मैं", "मुझे", "मेरे", "मेरा", "नहीं",
+               "क्या", "और", "यह", "था", "थी", "हो", "रहा", "रही", "कैसे", "कहाँ", "बहुत", "करें", "चाहिए"],
+        "mr": ["आहे", "आहेत", "मला", "माझ्या", "माझा", "माझी", "नाही", "काय", "आणि", "हे", "होते", "आहोत",
+               "मध्ये", "कसे", "कुठे", "तुम्ही", "करू", "करा", "खूप", "झाला", "झाली", "दुखत", "पाहिजे", "साठी", "कसा", "कशी", "कधी", "आला", "आली"]
+    },
+    "latin": {
+        "en": ["the", "is", "a", "an", "i", "have", "has", "my", "and", "of", "to", "what", "how", "for",
+               "with", "it", "you", "me", "can", "do", "should", "since", "after", "pain", "fever", "please",
+               "near", "find", "am", "are", "there", "this", "from", "feel", "take"],
+        "hi-Latn": ["hai", "hain", "mujhe", "mera", "meri", "mere", "kya", "nahi", "nhi", "kaise", "aur",
+                    "raha", "rahi", "rahe", "ka", "ki", "ke", "mein", "bahut", "dard", "bukhar", "karu",
+                    "karen", "kar", "ko", "tha", "thi", "ji", "haan", "hota", "hoti", "kab", "kahan",
+                    "lakshan", "ilaj", "dawai", "pet", "sir", "se", "ho", "chahiye", "sakta", "sakti"],
+        "es": ["el", "la", "los", "las", "que", "y", "en", "tengo", "dolor", "fiebre", "mi", "por", "con",
+               "una", "un", "necesito", "estómago", "cabeza", "médico", "duele", "desde", "días", "qué",
+               "cómo", "para", "muy", "tos", "está"],
+        "fr": ["le", "la", "les", "de", "je", "j", "est", "et", "un", "une", "des", "mal", "fièvre",
+               "depuis", "pour", "avec", "ai", "médecin", "tête", "jours", "ventre", "du", "au", "ce",
+               "quoi", "comment", "où", "toux", "suis"]
+    }
+}
+
+# Letters that only occur in one of the Latin-script languages we support
+LATIN_LETTER_HINTS = {"es": "ñ¿¡", "fr": "çèêàâôûœë"}
+
+DEFAULT_LANGUAGE = {"devanagari": "hi", "latin": "en"}
+
+_PUNCTUATION = '.,!?¿¡;:()"\u0964'
+
+
+def _build_script_table():
+    """
+    str.translate table: codepoint -> one-character script id (private use
+    area), None (deleted) for other characters below the last script block
+    """
+    scripts = sorted({script for _, _, script in SCRIPT_RANGES})
+    ids = {script: chr(0xE000 + i) for i, script in enumerate(scripts)}
+    table = [None] * (max(end for _, end, _ in SCRIPT_RANGES) + 1)
+    for start, end, script in SCRIPT_RANGES:
+        for codepoint in range(start, end + 1):
+            if chr(codepoint).isalpha() or 0x0900 <= codepoint <= 0x0D7F:
+                table[codepoint] = ids[script]
+    return table, {i: script for script, i in ids.items()}
+
+
+_SCRIPT_TABLE, _SCRIPT_IDS = _build_script_table()
+_WORD_INDEX = {
+    script: {word: language for language, words in model.items() for word in words}
+    for script, model in WORD_MODEL.items()
+}
+# Words shared by several languages of a script count for none of them
+for _script, _model in WORD_MODEL.items():
+    _counts = Counter(word for words in _model.values() for word in set(words))
+    for _word, _n in _counts.items():
+        if _n > 1:
+            _WORD_INDEX[_script].pop(_word, None)
+
+
+def script_histogram(text):
+    """Letter counts per script, from a single translate pass"""
+    # Characters past the end of the table (emoji, CJK, ...) pass through
+    # unchanged and are dropped here
+    ids = text.translate(_SCRIPT_TABLE)
+    return {_SCRIPT_IDS[i]: ids.count(i) for i in set(ids) if i in _SCRIPT_IDS}
+
+
+def _dominant_script(histogram):
+    total = sum(histogram.values())
+    indic = {s: n for s, n in histogram.items() if s in INDIC_SCRIPTS}
+    if indic:
+        script = max(indic, key=indic.get)
+        if indic[script] >= INDIC_SHARE * total:
+            return script, indic[script] / total
+    script = max(histogram, key=histogram.get)
+    return script, histogram[script] / total
+
+
+def _word_vote(text, script):
+    """(language, share of votes) from the word-frequency model for a shared script"""
+    index = _WORD_INDEX[script]
+    votes = Counter()
+    for word in text.lower().replace("'", " ").split():
+        language = index.get(word.strip(_PUNCTUATION))
+        if language:
+            votes[language] += 1
+    if script == "latin" and not text.isascii():
+        for language, letters in LATIN_LETTER_HINTS.items():
+            hits = sum(text.count(letter) for letter in letters)
+            if hits:
+                votes[language] += hits
+    if not votes:
+        return DEFAULT_LANGUAGE[script], 0.5
+    ranked = votes.most_common()
+    best, best_votes = ranked[0]
+    if len(ranked) > 1 and ranked[1][1] == best_votes:
+        # Tie: keep the script's default language if it is among the leaders
+        leaders = {language for language, n in ranked if n == best_votes}
+        if DEFAULT_LANGUAGE[script] in leaders:
+            best = DEFAULT_LANGUAGE[script]
+    # Laplace-smoothed share so one matching word is not full certainty
+    return best, (best_votes + 1) / (sum(votes.values()) + 2)
+
+
+def detect(text):
+    """Detection(language, confidence, script) for a message"""
+    histogram = script_histogram(text or "")
+    if not histogram:
+        return Detection("en", 0.0, None)
+    script, script_share = _dominant_script(histogram)
+    if script in SCRIPT_LANGUAGES:
+        return Detection(SCRIPT_LANGUAGES[script], round(script_share, 3), script)
+    language, word_share = _word_vote(text, script)
+    return Detection(language, round(script_share * word_share, 3), script)
@@ -0,0 +1,82 @@
+"""
+One elected process for background jobs
+
+Every gunicorn worker runs the "background" warmup hook, but the cache
+pre-warm, the facility prefetcher and the model prober only need to run
+once per deployment - in every worker they multiply upstream calls (LLM,
+Nominatim, Overpass) by the worker count. The worker holding an exclusive
+lock on BACKGROUND_LOCK_FILE (gunicorn_conf.py sets one per master) runs
+them; the others retry every BACKGROUND_ELECTION_INTERVAL seconds and take
+over when the leader exits, since the lock dies with its process.
+
+Without fcntl (Windows) every process counts as elected.
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+from config import Config
+
+
+class LeaderElection:
+    """Exclusive lock file held by the elected process for as long as it lives"""
+
+    def __init__(self, path=None, retry_interval=None):
+        self.path = path or Config.BACKGROUND_LOCK_FILE
+        self.retry_interval = retry_interval or Config.BACKGROUND_ELECTION_INTERVAL
+        self.elected = False
+        self._file = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def try_acquire(self):
+        """True if this process holds (or just took) the lock"""
+        if self.elected:
+            return True
+        if fcntl is None:
+            self.elected = True
+            return True
+        try:
+            f = open(self.path, "a+")
+        except OSError as e:
+            print(f"Leader lock error ({self.path}): {e}")
+            return False
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        # Kept open: closing the file would release the lock
+        self._file = f
+        self.elected = True
+        return True
+
+    def run_when_elected(self, start_jobs):
+        """Call start_jobs() once, as soon as this process is elected (now or after a retry)"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        def loop():
+            while True:
+                if self.try_acquire():
+                    print(f"👑 Process {os.getpid()} elected to run background jobs")
+                    start_jobs()
+                    return
+                if self._stop.wait(self.retry_interval):
+                    return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def snapshot(self):
+        return {"elected": self.elected, "pid": os.getpid(), "lock_file": self.path}
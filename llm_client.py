@@ -0,0 +1,299 @@
+"""
+Pooled LLM client with per-call deadlines, hedged requests and retries
+
+Wraps one long-lived Groq SDK client on a connection-pooled httpx client.
+Each call gets an overall deadline. If the first request has not answered
+after the hedge delay (the observed p95 latency unless configured), a second
+identical request is raised and the first answer wins. 429 and 5xx errors
+(and connection failures) are retried with exponential backoff. When the
+deadline or the retries run out, LLMUnavailable is raised so the caller can
+serve its offline fallback.
+
+AsyncLLMClient applies the same policy on an event loop with the AsyncGroq
+SDK (for the ASGI webhook): the hedge is a second task and the loser is
+cancelled.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import Config
+from telemetry import Counters, LatencyHistogram
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+try:
+    from groq import AsyncGroq, Groq
+except Exception:
+    AsyncGroq = Groq = None
+
+LLM_OUTCOMES = ("ok", "ok_hedged", "ok_retried", "fallback_deadline", "fallback_error")
+
+# Hedge delay used until enough latency samples exist for a p95 estimate
+DEFAULT_HEDGE_DELAY = 2.5
+MIN_HEDGE_SAMPLES = 20
+
+
+class LLMUnavailable(Exception):
+    """Raised when the LLM could not answer within the deadline/retry budget"""
+
+    def __init__(self, reason, last_error=None):
+        super().__init__(f"{reason}: {last_error}" if last_error else reason)
+        self.reason = reason
+        self.last_error = last_error
+
+
+def is_retryable(error):
+    """429, 5xx, timeouts and connection errors are worth another attempt"""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+    if status is None:
+        return True
+    return status == 429 or status >= 500
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMPolicy:
+    """Deadline/hedge/retry settings and outcome metrics shared by the sync and async clients"""
+
+    def __init__(self, deadline=None, hedge_delay=None, max_retries=None, backoff_base=None):
+        self.deadline = deadline if deadline is not None else Config.LLM_DEADLINE
+        self.hedge_delay = hedge_delay if hedge_delay is not None else Config.LLM_HEDGE_DELAY
+        self.max_retries = max_retries if max_retries is not None else Config.LLM_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else Config.LLM_BACKOFF_BASE
+        self.histograms = {outcome: LatencyHistogram() for outcome in LLM_OUTCOMES}
+        self.request_latency = LatencyHistogram()
+        self.counters = Counters("calls", "hedges", "retries", "errors")
+        self._lock = threading.Lock()
+
+    def current_hedge_delay(self):
+        """Configured hedge delay, or the observed p95 of single requests"""
+        if self.hedge_delay:
+            return self.hedge_delay
+        if self.request_latency.count < MIN_HEDGE_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return self.request_latency.quantile(0.95) or DEFAULT_HEDGE_DELAY
+
+    def _backoff(self, attempt, error):
+        """Seconds to wait before retry `attempt` (Retry-After when the server sent one)"""
+        backoff = _retry_after(error) or self.backoff_base * (2 ** (attempt - 1))
+        return backoff * random.uniform(0.8, 1.2)
+
+    def _give_up(self, outcome, started, error):
+        self.histograms[outcome].observe(time.monotonic() - started)
+        raise LLMUnavailable(outcome, error)
+
+    def stats(self):
+        return {
+            **self.counters.snapshot(),
+            "hedge_delay": round(self.current_hedge_delay(), 3),
+            "request_latency": self.request_latency.snapshot(),
+            "outcomes": {outcome: hist.snapshot() for outcome, hist in self.histograms.items()}
+        }
+
+
+class LLMClient(LLMPolicy):
+    """Long-lived Groq client with deadline, hedging and retry policy"""
+
+    def __init__(self, api_key=None, base_url=None, client=None, deadline=None,
+                 hedge_delay=None, max_retries=None, backoff_base=None, pool_size=None):
+        super().__init__(deadline, hedge_delay, max_retries, backoff_base)
+        pool_size = pool_size or Config.LLM_POOL_SIZE
+
+        self.http_client = None
+        if client is not None:
+            self.client = client
+        else:
+            if Groq is None or httpx is None:
+                raise RuntimeError("groq SDK and httpx are required for LLMClient")
+            self.http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(self.deadline, connect=5.0)
+            )
+            # Retries are handled here, not by the SDK
+            self.client = Groq(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+
+        # Two slots per concurrent call: the primary and its hedge
+        self.executor = ThreadPoolExecutor(max_workers=pool_size * 2, thread_name_prefix="llm")
+
+    def _request(self, kwargs, timeout):
+        started = time.perf_counter()
+        response = self.client.chat.completions.create(timeout=timeout, **kwargs)
+        self.request_latency.observe(time.perf_counter() - started)
+        return response
+
+    def create(self, deadline=None, hedge=True, **kwargs):
+        """
+        chat.completions.create with the deadline/hedge/retry policy.
+        Returns the SDK response or raises LLMUnavailable.
+        """
+        self.counters.incr("calls")
+        started = time.monotonic()
+        call_deadline = started + (deadline or self.deadline)
+        attempt = 0
+        hedged = False
+        last_error = None
+
+        while True:
+            remaining = call_deadline - time.monotonic()
+            if remaining <= 0:
+                return self._give_up("fallback_deadline", started, last_error)
+
+            pending = {self.executor.submit(self._request, kwargs, remaining)}
+            hedge_at = time.monotonic() + self.current_hedge_delay() if hedge else None
+            round_hedged = False
+            round_error = None
+
+            while pending:
+                now = time.monotonic()
+                wake_at = call_deadline if hedge_at is None or round_hedged else min(call_deadline, hedge_at)
+                done, pending = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    error = future.exception()
+                    if error is None:
+                        for other in pending:
+                            other.cancel()
+                        outcome = "ok_hedged" if hedged else ("ok_retried" if attempt else "ok")
+                        self.histograms[outcome].observe(time.monotonic() - started)
+                        return future.result()
+                    self.counters.incr("errors")
+                    round_error = error
+
+                now = time.monotonic()
+                if now >= call_deadline:
+                    for other in pending:
+                        other.cancel()
+                    return self._give_up("fallback_deadline", started, round_error or last_error)
+                if pending and hedge_at is not None and not round_hedged and now >= hedge_at:
+                    # Primary is slower than usual - race a second request
+                    round_hedged = hedged = True
+                    self.counters.incr("hedges")
+                    pending.add(self.executor.submit(self._request, kwargs, call_deadline - now))
+
+            last_error = round_error
+            if not is_retryable(last_error):
+                return self._give_up("fallback_error", started, last_error)
+            attempt += 1
+            if attempt > self.max_retries:
+                return self._give_up("fallback_error", started, last_error)
+
+            self.counters.incr("retries")
+            backoff = self._backoff(attempt, last_error)
+            if time.monotonic() + backoff >= call_deadline:
+                return self._give_up("fallback_deadline", started, last_error)
+            print(f"⏳ LLM retry {attempt}/{self.max_retries} in {backoff:.2f}s after {type(last_error).__name__}")
+            time.sleep(backoff)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.http_client is not None:
+            self.http_client.close()
+
+
+class AsyncLLMClient(LLMPolicy):
+    """LLMClient for the event loop, on AsyncGroq and a pooled httpx.AsyncClient"""
+
+    def __init__(self, api_key=None, base_url=None, client=None, deadline=None,
+                 hedge_delay=None, max_retries=None, backoff_base=None, pool_size=None):
+        super().__init__(deadline, hedge_delay, max_retries, backoff_base)
+        pool_size = pool_size or Config.LLM_POOL_SIZE
+
+        self.http_client = None
+        if client is not None:
+            self.client = client
+        else:
+            if AsyncGroq is None or httpx is None:
+                raise RuntimeError("groq SDK and httpx are required for AsyncLLMClient")
+            # Requests on one loop are cheap; the pool bounds concurrent upstream calls
+            self.http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=pool_size * 2, max_keepalive_connections=pool_size * 2),
+                timeout=httpx.Timeout(self.deadline, connect=5.0)
+            )
+            self.client = AsyncGroq(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+
+    async def _request(self, kwargs, timeout):
+        started = time.perf_counter()
+        response = await self.client.chat.completions.create(timeout=timeout, **kwargs)
+        self.request_latency.observe(time.perf_counter() - started)
+        return response
+
+    async def create(self, deadline=None, hedge=True, **kwargs):
+        """Same contract as LLMClient.create"""
+        self.counters.incr("calls")
+        started = time.monotonic()
+        call_deadline = started + (deadline or self.deadline)
+        attempt = 0
+        hedged = False
+        last_error = None
+
+        while True:
+            remaining = call_deadline - time.monotonic()
+            if remaining <= 0:
+                return self._give_up("fallback_deadline", started, last_error)
+
+            pending = {asyncio.ensure_future(self._request(kwargs, remaining))}
+            hedge_at = time.monotonic() + self.current_hedge_delay() if hedge else None
+            round_hedged = False
+            round_error = None
+
+            try:
+                while pending:
+                    now = time.monotonic()
+                    wake_at = call_deadline if hedge_at is None or round_hedged else min(call_deadline, hedge_at)
+                    done, pending = await asyncio.wait(pending, timeout=max(0.0, wake_at - now),
+                                                       return_when=asyncio.FIRST_COMPLETED)
+
+                    for task in done:
+                        error = task.exception()
+                        if error is None:
+                            outcome = "ok_hedged" if hedged else ("ok_retried" if attempt else "ok")
+                            self.histograms[outcome].observe(time.monotonic() - started)
+                            return task.result()
+                        self.counters.incr("errors")
+                        round_error = error
+
+                    now = time.monotonic()
+                    if now >= call_deadline:
+                        return self._give_up("fallback_deadline", started, round_error or last_error)
+                    if pending and hedge_at is not None and not round_hedged and now >= hedge_at:
+                        round_hedged = hedged = True
+                        self.counters.incr("hedges")
+                        pending.add(asyncio.ensure_future(self._request(kwargs, call_deadline - now)))
+            finally:
+                for task in pending:
+                    task.cancel()
+
+            last_error = round_error
+            if not is_retryable(last_error):
+                return self._give_up("fallback_error", started, last_error)
+            attempt += 1
+            if attempt > self.max_retries:
+                return self._give_up("fallback_error", started, last_error)
+
+            self.counters.incr("retries")
+            backoff = self._backoff(attempt, last_error)
+            if time.monotonic() + backoff >= call_deadline:
+                return self._give_up("fallback_deadline", started, last_error)
+            print(f"⏳ LLM retry {attempt}/{self.max_retries} in {backoff:.2f}s after {type(last_error).__name__}")
+            await asyncio.sleep(backoff)
+
+    async def aclose(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
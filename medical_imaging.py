@@ -0,0 +1,124 @@
+"""
+Lazily loaded medical image models
+
+TensorFlow and the four Keras classifiers (modality, brain MRI, skin
+lesion, chest X-ray) are imported and loaded on the first image, or
+ahead of time by the "models" warmup hook. Processes that only serve
+text, location and stats requests never import TensorFlow.
+
+Under gunicorn_conf.py each worker loads its own models (at startup when
+WARMUP lists "models", otherwise on first use), since an initialised
+TensorFlow runtime does not survive fork. With PRELOAD_MODELS=True the
+master loads them before forking instead, so the workers share the
+weights copy-on-write, and only in that mode GPUs are hidden from
+TensorFlow: a CUDA context cannot be used across fork, while the CPU
+kernels work in the forked workers. Everywhere else the models may use a GPU.
+"""
+
+import io
+import os
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from config import Config
+
+MODEL_FILES = {
+    "modality": "modality_classifier.h5",
+    "brain": "brain_tumor_classifier.h5",
+    "skin": "Skin_Cancer.h5",
+    "lung": "lung_model.keras",
+}
+
+CLASSES_MAPPING = {
+    "brain": ['glioma', 'meningioma', 'notumor', 'pituitary'],
+    "skin": ['benign', 'malignant'],
+    "lung": [
+        'Atelectasis', 'Cardiomegaly', 'Consolidation', 'Edema', 'Effusion',
+        'Emphysema', 'Fibrosis', 'Infiltration', 'Mass', 'Nodule', 'Pleural_Thickening',
+        'Pneumonia', 'Pneumothorax', 'No_Finding'
+    ]
+}
+
+
+def try_load_model(load_model, path):
+    try:
+        model = load_model(path)
+        print(f"✅ Loaded model: {path}")
+        return model
+    except Exception as e:
+        print(f"❌ Failed to load model {path}: {e}")
+        return None
+
+
+@metrics.METRICS.timed("preprocess")
+def preprocess_image(image_bytes, target_size=(256, 256), scaling='none'):
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    img = img.resize(target_size)
+    img_array = np.array(img, dtype=np.float32)
+
+    if scaling == '1/255':
+        img_array = img_array / 255.0
+    elif scaling == 'xception':
+        img_array = (img_array / 127.5) - 1.0
+
+    img_array = np.expand_dims(img_array, axis=0)
+    return img_array
+
+
+def predict(name, model, img_array):
+    """Predictions of one model for a single-image batch, timed per model"""
+    with metrics.METRICS.stage("inference", model=name):
+        return model.predict(img_array)[0]
+
+
+class ImageModels:
+    """The classifiers, loaded once per process on first use"""
+
+    def __init__(self, models_path=None):
+        self.models_path = models_path or Config.MODELS_PATH
+        self.models = None
+        self.load_seconds = None
+        self.loaded_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.models is not None
+
+    def load(self):
+        """{name: model or None}; imports TensorFlow and loads the models on the first call"""
+        if self.models is not None:
+            return self.models
+        with self._lock:
+            if self.models is None:
+                started = time.perf_counter()
+                models = dict.fromkeys(MODEL_FILES)
+                try:
+                    import tensorflow as tf
+                    from tensorflow.keras.models import load_model  # type: ignore
+
+                    if Config.PRELOAD_MODELS:
+                        # Loaded in the master before fork (see app.preload_hooks)
+                        tf.config.set_visible_devices([], 'GPU')
+                    for name, filename in MODEL_FILES.items():
+                        models[name] = try_load_model(load_model, f"{self.models_path}/{filename}")
+                except Exception as e:
+                    print(f"❌ Global model loading error: {e}")
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self.loaded_pid = os.getpid()
+                self.models = models
+        return self.models
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            # Loaded by the preloading master and inherited through fork
+            "inherited": self.loaded and self.loaded_pid != os.getpid(),
+            "available": sorted(name for name, model in (self.models or {}).items() if model is not None)
+        }
@@ -0,0 +1,240 @@
+"""
+Prometheus metrics for the webhook stages
+
+Each stage of a webhook reply - language lookup, intent handling, cache
+lookup, LLM call, geocode, Overpass, media fetch, preprocessing, each
+model's inference and the TwiML build - is timed into a histogram, and
+stage errors, cache results and interactions are counted. GET /metrics
+renders them in the Prometheus text format.
+
+Every process keeps its own values in memory. With METRICS_DIR set
+(gunicorn_conf.py sets it), each worker also writes them to
+METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL seconds and when it
+exits, and /metrics adds the files of the other workers to its own live
+values. Files of exited workers are kept so counters never go backwards;
+other workers' numbers lag by at most one flush interval.
+"""
+
+import functools
+import glob
+import json
+import os
+import threading
+import time
+
+import profiling
+from config import Config
+from telemetry import DEFAULT_LATENCY_BUCKETS, Counters, LatencyHistogram
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Language lookup and TwiML build finish well under the 5 ms default first bucket
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025) + DEFAULT_LATENCY_BUCKETS
+
+COUNTER_HELP = {
+    "stage_errors": "Stage calls that raised an exception",
+    "cache_lookups": "Answer lookups before the LLM call, by result",
+    "interactions": "Logged interactions by intent and outcome",
+}
+
+
+def _labels(**labels):
+    """Hashable, order-independent label set"""
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+@functools.lru_cache(maxsize=None)
+def _stage_labels(stage, model=None):
+    return _labels(stage=stage, model=model)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def clear_directory(directory):
+    """Remove the per-process files of an earlier run"""
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _Stage:
+    __slots__ = ("metrics", "labels", "started", "span")
+
+    def __init__(self, metrics, labels):
+        self.metrics = metrics
+        self.labels = labels
+
+    def __enter__(self):
+        # A span too when the request is being profiled
+        self.span = profiling.open_span(self.labels)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._observe(self.labels, time.perf_counter() - self.started)
+        if exc_type is not None:
+            self.metrics.counters.incr(("stage_errors", self.labels))
+        if self.span is not None:
+            profiling.close_span(self.span, exc_type.__name__ if exc_type else None)
+        return False
+
+
+class Metrics:
+    """Stage latency histograms and labelled counters of one process"""
+
+    def __init__(self, directory=None, flush_interval=None, buckets=STAGE_BUCKETS):
+        self.directory = Config.METRICS_DIR if directory is None else directory
+        self.flush_interval = flush_interval or Config.METRICS_FLUSH_INTERVAL
+        self.buckets = tuple(buckets)
+        self.histograms = {}
+        self.counters = Counters()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def stage(self, stage, model=None):
+        """Context manager timing one stage; leaving it with an exception also counts a stage error"""
+        return _Stage(self, _stage_labels(stage, model))
+
+    def timed(self, stage):
+        """Decorator timing every call of a function as one stage"""
+        labels = _stage_labels(stage)
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Stage(self, labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, stage, seconds, model=None):
+        self._observe(_stage_labels(stage, model), seconds)
+
+    def _observe(self, labels, seconds):
+        histogram = self.histograms.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(labels, LatencyHistogram(self.buckets))
+        histogram.observe(seconds)
+
+    def incr(self, name, amount=1, **labels):
+        self.counters.incr((name, _labels(**labels)), amount)
+
+    def snapshot(self):
+        """This process's values as JSON-serialisable data"""
+        with self._lock:
+            histograms = list(self.histograms.items())
+        rows = []
+        for labels, histogram in histograms:
+            counts, count, total = histogram.totals()
+            rows.append({"labels": dict(labels), "counts": counts, "count": count, "sum": total})
+        return {
+            "pid": os.getpid(),
+            "buckets": list(self.buckets),
+            "histograms": rows,
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in self.counters.snapshot().items()]
+        }
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR/<pid>.json (atomically); no-op without METRICS_DIR"""
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.json")
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(f"{path}.tmp", path)
+        except Exception as e:
+            print(f"Metrics flush error: {e}")
+
+    def start(self):
+        """Flush every flush_interval seconds in a daemon thread (no-op without METRICS_DIR)"""
+        if not self.directory or (self._thread and self._thread.is_alive()):
+            return
+
+        def loop():
+            while not self._stop.wait(self.flush_interval):
+                self.flush()
+
+        self._thread = threading.Thread(target=loop, name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def after_fork(self):
+        """In a forked worker: start from zero instead of the master's values"""
+        self.histograms = {}
+        self.counters = Counters()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def collect(self):
+        """(histograms, counters, processes) summed over this process and the other processes' files"""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = f"{os.getpid()}.json"
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                if os.path.basename(path) == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError) as e:
+                    print(f"Metrics read error ({path}): {e}")
+
+        histograms, counters = {}, {}
+        for snapshot in snapshots:
+            if snapshot.get("buckets") != list(self.buckets):
+                continue  # written with different buckets (an older release)
+            for row in snapshot["histograms"]:
+                labels = _labels(**row["labels"])
+                counts, count, total = histograms.get(labels, ([0] * (len(self.buckets) + 1), 0, 0.0))
+                histograms[labels] = ([a + b for a, b in zip(counts, row["counts"])],
+                                      count + row["count"], total + row["sum"])
+            for row in snapshot["counters"]:
+                key = (row["name"], _labels(**row["labels"]))
+                counters[key] = counters.get(key, 0) + row["value"]
+        return histograms, counters, len(snapshots)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        histograms, counters, processes = self.collect()
+
+        name = "healnet_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent in each stage of a webhook reply", f"# TYPE {name} histogram"]
+        for labels in sorted(histograms):
+            counts, count, total = histograms[labels]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {round(total, 6)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        families = {}
+        for (counter, labels), value in sorted(counters.items()):
+            families.setdefault(counter, []).append((labels, value))
+        for counter, rows in families.items():
+            name = f"healnet_{counter}_total"
+            lines += [f"# HELP {name} {COUNTER_HELP.get(counter, counter)}", f"# TYPE {name} counter"]
+            lines += [f"{name}{_format_labels(labels)} {value}" for labels, value in rows]
+
+        name = "healnet_metrics_processes"
+        lines += [f"# HELP {name} Processes (running or exited) whose metrics are included",
+                  f"# TYPE {name} gauge", f"{name} {processes}"]
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
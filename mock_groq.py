@@ -0,0 +1,247 @@
+"""
+Local Groq-compatible mock server for offline load testing
+
+Implements the OpenAI-style chat-completions endpoint the groq SDK calls
+(POST /openai/v1/chat/completions), including SSE streaming, with
+configurable latency distributions, token throughput, 5xx/429 injection and
+canned or echo answers. Point HealNet at it with:
+
+    python mock_groq.py --port 8765 --latency lognormal:-0.7,0.4 --tps 250 --rate-limit-rate 0.05
+    GROQ_API_KEY=mock GROQ_BASE_URL=http://127.0.0.1:8765 python app.py
+
+Settings can be changed at runtime with POST /mock/config (JSON body) and
+request counts read from GET /mock/stats. model_overrides gives individual
+models their own latency and error rates, e.g. to exercise model_router.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+DEFAULT_SETTINGS = {
+    "latency": "constant:0.2",   # time to first token: constant:S | uniform:A,B | normal:MU,SIGMA | lognormal:MU,SIGMA
+    "tokens_per_second": 200.0,  # generation throughput (0 = instant)
+    "error_rate": 0.0,           # fraction of requests answered with HTTP 500
+    "rate_limit_rate": 0.0,      # fraction of requests answered with HTTP 429
+    "retry_after": 1,            # Retry-After seconds sent with 429s
+    "mode": "canned",            # canned | echo
+    "seed": None,
+    "model_overrides": {}        # per-model latency/error_rate/rate_limit_rate, e.g. {"llama-3.3-70b-versatile": {"latency": "constant:2"}}
+}
+
+CANNED_ANSWERS = {
+    "dengue": "Dengue is a viral infection spread by Aedes mosquitoes.\n\nCommon symptoms are high fever, severe headache, pain behind the eyes, joint and muscle pain and rash. Drink plenty of fluids, rest, and avoid aspirin or ibuprofen.\n\nSee a doctor if fever lasts more than two days or you notice bleeding.",
+    "fever": "Fever is usually a sign that your body is fighting an infection.\n\nRest, drink plenty of fluids and monitor your temperature. Paracetamol can help with discomfort.\n\nSeek medical help if the fever is above 103°F or lasts more than 3 days.",
+    "headache": "Most headaches come from stress, dehydration, lack of sleep or tension.\n\nRest in a quiet room, drink water and avoid screens for a while.\n\nSee a doctor for a sudden severe headache or one with fever and a stiff neck.",
+    "default": "Thank you for your question.\n\nBased on what you describe, this is usually not serious, but keep track of your symptoms, rest and stay hydrated.\n\nPlease consult a doctor if symptoms persist or get worse."
+}
+
+_TOKEN = re.compile(r'\S+\s*|\s+')
+
+
+def sample_latency(spec, rng):
+    """Draw a latency in seconds from a 'kind:params' spec"""
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v.strip()] if params else []
+    if kind == 'constant':
+        return values[0] if values else 0.0
+    if kind == 'uniform':
+        return rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text)
+
+
+class MockGroq:
+    """Mock server state: settings, RNG and counters"""
+
+    def __init__(self, **settings):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.stats = {"requests": 0, "streamed": 0, "errors_injected": 0, "rate_limited": 0, "completed": 0}
+        self._lock = threading.Lock()
+        self.configure(**settings)
+
+    def configure(self, **settings):
+        unknown = set(settings) - set(DEFAULT_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        with self._lock:
+            self.settings.update(settings)
+            sample_latency(self.settings["latency"], random.Random(0))
+            for overrides in self.settings["model_overrides"].values():
+                sample_latency(overrides.get("latency", self.settings["latency"]), random.Random(0))
+            self.rng = random.Random(self.settings["seed"])
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def draw(self, model=None):
+        """Decide the fate of one request: (status, latency)"""
+        with self._lock:
+            settings = {**self.settings, **self.settings["model_overrides"].get(model, {})}
+            roll = self.rng.random()
+            latency = sample_latency(settings["latency"], self.rng)
+            error_rate = settings["error_rate"]
+            rate_limit_rate = settings["rate_limit_rate"]
+        if roll < rate_limit_rate:
+            return 429, latency
+        if roll < rate_limit_rate + error_rate:
+            return 500, latency
+        return 200, latency
+
+    def answer(self, messages):
+        user_text = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        if self.settings["mode"] == "echo":
+            return f"You asked: {user_text}"
+        lowered = user_text.lower()
+        for keyword, text in CANNED_ANSWERS.items():
+            if keyword != "default" and keyword in lowered:
+                return text
+        return CANNED_ANSWERS["default"]
+
+
+def create_mock_app(mock=None):
+    """Flask app serving the mock endpoints"""
+    mock = mock or MockGroq()
+    app = Flask(__name__)
+
+    def error(status, message, headers=None):
+        body = {"error": {"message": message, "type": "rate_limit_exceeded" if status == 429 else "internal_server_error"}}
+        return jsonify(body), status, headers or {}
+
+    @app.route('/openai/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        mock._count("requests")
+        payload = request.get_json(force=True, silent=True) or {}
+        model = payload.get("model", "llama-3.1-8b-instant")
+        messages = payload.get("messages", [])
+        max_tokens = int(payload.get("max_tokens") or 1024)
+
+        status, latency = mock.draw(model)
+        time.sleep(latency)
+        if status == 429:
+            mock._count("rate_limited")
+            return error(429, "Rate limit reached (mock)", {"retry-after": str(mock.settings["retry_after"])})
+        if status == 500:
+            mock._count("errors_injected")
+            return error(500, "Internal server error (mock)")
+
+        tokens = tokenize(mock.answer(messages))
+        finish_reason = "length" if len(tokens) > max_tokens else "stop"
+        tokens = tokens[:max_tokens]
+        tps = float(mock.settings["tokens_per_second"] or 0)
+        prompt_tokens = sum(len(tokenize(m.get("content", ""))) for m in messages)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if payload.get("stream"):
+            mock._count("streamed")
+
+            def events():
+                for i, token in enumerate(tokens):
+                    if tps:
+                        time.sleep(1.0 / tps)
+                    delta = {"content": token}
+                    if i == 0:
+                        delta["role"] = "assistant"
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                             "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                final = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                         "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+                         "x_groq": {"id": completion_id, "usage": usage}}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+                mock._count("completed")
+
+            return Response(events(), mimetype='text/event-stream')
+
+        if tps:
+            time.sleep(len(tokens) / tps)
+        mock._count("completed")
+        return jsonify({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": finish_reason,
+                "logprobs": None
+            }],
+            "usage": usage
+        })
+
+    @app.route('/openai/v1/models', methods=['GET'])
+    def models():
+        ids = ["llama-3.1-8b-instant", "llama-3.3-70b-versatile", "gemma2-9b-it"]
+        return jsonify({"object": "list", "data": [{"id": i, "object": "model", "owned_by": "mock"} for i in ids]})
+
+    @app.route('/mock/config', methods=['GET', 'POST'])
+    def mock_config():
+        if request.method == 'POST':
+            try:
+                mock.configure(**(request.get_json(force=True, silent=True) or {}))
+            except (ValueError, IndexError, AttributeError) as e:
+                return jsonify({"error": str(e)}), 400
+        return jsonify(mock.settings)
+
+    @app.route('/mock/stats', methods=['GET'])
+    def mock_stats():
+        return jsonify(mock.stats)
+
+    return app
+
+
+def run_in_thread(host='127.0.0.1', port=0, **settings):
+    """
+    Start a mock server in a background thread (for benchmarks and tests).
+    Returns (server, base_url, mock); call server.shutdown() when done.
+    """
+    from werkzeug.serving import make_server
+
+    mock = MockGroq(**settings)
+    server = make_server(host, port, create_mock_app(mock), threaded=True)
+    threading.Thread(target=server.serve_forever, name="mock-groq", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}", mock
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Groq-compatible mock server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default=DEFAULT_SETTINGS["latency"],
+                        help="constant:S | uniform:A,B | normal:MU,SIGMA | lognormal:MU,SIGMA")
+    parser.add_argument('--tps', type=float, default=DEFAULT_SETTINGS["tokens_per_second"], help="Tokens per second")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of HTTP 500 responses")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fraction of HTTP 429 responses")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--mode', choices=['canned', 'echo'], default='canned')
+    parser.add_argument('--seed', type=int, help="Seed for deterministic latency/error draws")
+    args = parser.parse_args(argv)
+
+    mock = MockGroq(latency=args.latency, tokens_per_second=args.tps, error_rate=args.error_rate,
+                    rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+                    mode=args.mode, seed=args.seed)
+    print(f"🧪 Mock Groq on http://{args.host}:{args.port} ({mock.settings})")
+    create_mock_app(mock).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+Adaptive model routing by measured upstream latency
+
+Keeps rolling latency and error statistics per configured model and sends
+each request to the fastest healthy model allowed for its budget class
+(brief / standard / detailed, see generation_budget). "Fastest" compares
+latency EWMAs kept per (model, budget class): a detailed answer takes
+several times longer than a brief one, so one EWMA per model would rank
+models by the mix of classes they happened to serve. A model that returns
+a 429 or fails repeatedly is marked degraded for a cooldown period and
+probed in the background until it answers again. A small share of traffic
+explores other allowed models so their statistics stay fresh.
+
+Allowed models are configured with LLM_MODEL_ROUTES, a JSON object mapping
+model name -> list of budget classes it may serve.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from config import Config
+
+DEFAULT_MODEL_ROUTES = {
+    "llama-3.1-8b-instant": ["brief", "standard", "detailed"],
+    "llama-3.3-70b-versatile": ["standard", "detailed"]
+}
+
+EWMA_ALPHA = 0.2
+FAILURES_BEFORE_DEGRADED = 3
+
+
+def load_routes():
+    raw = os.getenv("LLM_MODEL_ROUTES")
+    if not raw:
+        return dict(DEFAULT_MODEL_ROUTES)
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        print(f"⚠️ Ignoring invalid LLM_MODEL_ROUTES: {e}")
+        return dict(DEFAULT_MODEL_ROUTES)
+
+
+def _ewma(current, latency):
+    return latency if current is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * current
+
+
+def _status_code(error):
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status
+
+
+class ModelStats:
+    """Rolling window of one model's outcomes"""
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.ewma = None
+        self.class_ewma = {}
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.consecutive_failures = 0
+        self.degraded_until = 0.0
+        self.last_error = None
+
+    def error_rate(self):
+        return 1 - (sum(self.outcomes) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def p50(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+
+class ModelRouter:
+    """Chooses a model per request from live latency/error statistics"""
+
+    def __init__(self, routes=None, window=None, cooldown=None, explore_rate=None):
+        self.routes = routes or load_routes()
+        self.window = window or Config.MODEL_STATS_WINDOW
+        self.cooldown = cooldown if cooldown is not None else Config.MODEL_DEGRADED_COOLDOWN
+        self.explore_rate = explore_rate if explore_rate is not None else Config.MODEL_EXPLORE_RATE
+        self.stats = {model: ModelStats(self.window) for model in self.routes}
+        self._lock = threading.Lock()
+        self._probe_thread = None
+        self._stop = threading.Event()
+
+    def allowed(self, budget_class):
+        return [model for model, classes in self.routes.items() if budget_class in classes]
+
+    def is_healthy(self, model, now=None):
+        return (now or time.monotonic()) >= self.stats[model].degraded_until
+
+    def choose(self, budget_class, preferred=None):
+        """Fastest healthy model for the budget class"""
+        candidates = self.allowed(budget_class)
+        if not candidates:
+            return preferred or next(iter(self.routes))
+        now = time.monotonic()
+        with self._lock:
+            healthy = [m for m in candidates if self.is_healthy(m, now)]
+            if not healthy:
+                # Everything is degraded - the preferred model is as good a bet as any
+                return preferred if preferred in candidates else candidates[0]
+            if len(healthy) > 1 and random.random() < self.explore_rate:
+                return random.choice(healthy)
+            ewma = {m: self.stats[m].class_ewma.get(budget_class) for m in healthy}
+            measured = [m for m in healthy if ewma[m] is not None]
+            if measured:
+                fastest = min(measured, key=ewma.get)
+                if preferred in healthy and ewma[preferred] is None:
+                    return preferred
+                return fastest
+            return preferred if preferred in healthy else healthy[0]
+
+    def record(self, model, latency, error=None, budget_class=None):
+        """Record one request outcome (error is the exception, if any) for the budget class it served"""
+        if model not in self.stats:
+            return
+        with self._lock:
+            stats = self.stats[model]
+            stats.requests += 1
+            if error is None:
+                stats.outcomes.append(True)
+                stats.latencies.append(latency)
+                stats.ewma = _ewma(stats.ewma, latency)
+                if budget_class is not None:
+                    stats.class_ewma[budget_class] = _ewma(stats.class_ewma.get(budget_class), latency)
+                stats.consecutive_failures = 0
+                stats.degraded_until = 0.0
+                return
+            stats.outcomes.append(False)
+            stats.errors += 1
+            stats.consecutive_failures += 1
+            stats.last_error = f"{type(error).__name__}: {error}"[:200]
+            status = _status_code(error)
+            if status == 429:
+                stats.rate_limited += 1
+            if (status == 429 or stats.consecutive_failures >= FAILURES_BEFORE_DEGRADED
+                    or (len(stats.outcomes) >= 5 and stats.error_rate() > 0.5)):
+                if stats.degraded_until <= time.monotonic():
+                    print(f"⚠️ Model {model} degraded for {self.cooldown:.0f}s ({stats.last_error})")
+                stats.degraded_until = time.monotonic() + self.cooldown
+
+    def degraded_models(self):
+        now = time.monotonic()
+        return [m for m in self.routes if not self.is_healthy(m, now)]
+
+    def probe_once(self, probe_fn):
+        """Send a tiny request to each degraded model; recovery clears its state"""
+        for model in self.degraded_models():
+            started = time.perf_counter()
+            try:
+                probe_fn(model)
+            except Exception as e:
+                with self._lock:
+                    stats = self.stats[model]
+                    stats.last_error = f"probe: {type(e).__name__}: {e}"[:200]
+                    stats.degraded_until = time.monotonic() + self.cooldown
+                continue
+            with self._lock:
+                stats = self.stats[model]
+                stats.consecutive_failures = 0
+                stats.degraded_until = 0.0
+            print(f"✅ Model {model} recovered (probe {time.perf_counter() - started:.2f}s)")
+
+    def start_probing(self, probe_fn, interval=None):
+        """Probe degraded models every `interval` seconds in a daemon thread"""
+        interval = interval or Config.MODEL_PROBE_INTERVAL
+        if self._probe_thread and self._probe_thread.is_alive():
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.probe_once(probe_fn)
+                except Exception as e:
+                    print(f"Model probe error: {e}")
+
+        self._stop.clear()
+        self._probe_thread = threading.Thread(target=loop, name="model-prober", daemon=True)
+        self._probe_thread.start()
+
+    def stop_probing(self):
+        self._stop.set()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model: {
+                    "budget_classes": self.routes[model],
+                    "healthy": self.is_healthy(model, now),
+                    "degraded_for_s": round(max(0.0, stats.degraded_until - now), 1),
+                    "requests": stats.requests,
+                    "errors": stats.errors,
+                    "rate_limited": stats.rate_limited,
+                    "error_rate": round(stats.error_rate(), 3),
+                    "ewma_latency_s": round(stats.ewma, 3) if stats.ewma is not None else None,
+                    "ewma_latency_by_class_s": {budget_class: round(value, 3)
+                                                for budget_class, value in stats.class_ewma.items()},
+                    "p50_latency_s": round(stats.p50(), 3) if stats.latencies else None,
+                    "last_error": stats.last_error
+                }
+                for model, stats in self.stats.items()
+            }
+
+
+def main(argv=None):
+    """Route traffic against a local mock_groq server where one model slows down"""
+    import argparse
+
+    from groq import Groq
+
+    import mock_groq
+
+    parser = argparse.ArgumentParser(description="Model routing demo against mock_groq")
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--budget', default='standard')
+    args = parser.parse_args(argv)
+
+    server, base_url, mock = mock_groq.run_in_thread(latency="constant:0.05", tokens_per_second=0, seed=1)
+    client = Groq(api_key="mock", base_url=base_url, max_retries=0)
+    router = ModelRouter(routes=dict(DEFAULT_MODEL_ROUTES), cooldown=1.0, explore_rate=0.1)
+
+    def call(model, max_tokens=50):
+        return client.chat.completions.create(model=model, max_tokens=max_tokens,
+                                              messages=[{"role": "user", "content": "fever"}])
+
+    router.start_probing(lambda model: call(model, max_tokens=1), interval=0.5)
+    phases = [
+        ("baseline", {}),
+        ("8b slow", {"llama-3.1-8b-instant": {"latency": "constant:0.4"}}),
+        ("8b rate limited", {"llama-3.1-8b-instant": {"rate_limit_rate": 1.0}}),
+        ("recovered", {})
+    ]
+    try:
+        for name, overrides in phases:
+            mock.configure(model_overrides=overrides)
+            chosen = {}
+            for _ in range(args.requests // len(phases)):
+                model = router.choose(args.budget, preferred="llama-3.1-8b-instant")
+                started = time.perf_counter()
+                try:
+                    call(model)
+                    router.record(model, time.perf_counter() - started, budget_class=args.budget)
+                except Exception as e:
+                    router.record(model, time.perf_counter() - started, error=e, budget_class=args.budget)
+                chosen[model] = chosen.get(model, 0) + 1
+            if name == "8b rate limited":
+                time.sleep(1.5)  # let the prober see the recovery in the next phase
+            print(f"{name:>16}: {chosen}")
+        print(json.dumps(router.snapshot(), indent=2))
+    finally:
+        router.stop_probing()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+"""
+Hedged Overpass client for facility searches
+
+Sends one Overpass query per search (the widest radius, 15 km) and lets
+the caller filter and rank the elements by distance, instead of one query
+per radius. The query goes to the healthiest mirror first; if it has not
+answered after the hedge delay (or fails) the next mirror is raced
+against it, and so on. The first valid response wins and the other
+requests are abandoned: queued ones are cancelled and running ones stop
+reading their body and close the connection. The whole search shares
+one deadline that fits inside Twilio's webhook timeout.
+
+AsyncOverpassClient runs the same race as asyncio tasks on one event loop
+(for the ASGI webhook); losing requests are cancelled.
+
+Per-mirror latency (EWMA) and failures are tracked to order later
+searches: mirrors that failed recently sit out a cooldown, and the rest
+are tried fastest first.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import Config
+from telemetry import Counters, LatencyHistogram
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+# OSM tag (key, value) for each facility tag name used by find_nearby_facilities
+FACILITY_TAGS = {
+    "hospital": ("amenity", "hospital"),
+    "clinic": ("amenity", "clinic"),
+    "doctors": ("amenity", "doctors"),
+    "pharmacy": ("amenity", "pharmacy"),
+    "chemist": ("shop", "chemist"),
+}
+
+USER_AGENT = "HealNet/1.0 (contact: support@healnet.local)"
+
+# Weight of the newest sample in a mirror's latency EWMA
+EWMA_ALPHA = 0.3
+
+READ_CHUNK_SIZE = 16 * 1024
+
+
+class OverpassUnavailable(Exception):
+    """Raised when no mirror returned a valid response within the deadline"""
+
+    def __init__(self, reason, last_error=None):
+        super().__init__(f"{reason}: {last_error}" if last_error else reason)
+        self.reason = reason
+        self.last_error = last_error
+
+
+class _Abandoned(Exception):
+    """A request lost the race and stopped reading its response"""
+
+
+def build_query(tags, lat, lon, radius_m, timeout):
+    """Overpass QL for facilities with any of the tags within radius_m of the point"""
+    by_key = {}
+    for tag in tags:
+        key, value = FACILITY_TAGS.get(tag, ("amenity", tag))
+        by_key.setdefault(key, []).append(value)
+    statements = "".join(f'nwr["{key}"~"^({"|".join(values)})$"](around:{int(radius_m)},{lat},{lon});'
+                         for key, values in by_key.items())
+    return f"[out:json][timeout:{max(1, int(timeout))}];({statements});out tags center;"
+
+
+class MirrorHealth:
+    """Latency EWMA and recent failures of one mirror"""
+
+    def __init__(self, url, position):
+        self.url = url
+        self.position = position
+        self.ewma = None
+        self.requests = 0
+        self.wins = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.degraded_until = 0.0
+        self.last_error = None
+
+    def record_success(self, latency):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.degraded_until = 0.0
+        self.record_latency(latency)
+
+    def record_latency(self, latency):
+        self.ewma = latency if self.ewma is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma
+
+    def record_failure(self, error, cooldown):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"[:200]
+        # Back off longer while a mirror keeps failing
+        self.degraded_until = time.monotonic() + cooldown * min(self.consecutive_failures, 4)
+
+    def degraded(self, now=None):
+        return (now or time.monotonic()) < self.degraded_until
+
+    def snapshot(self):
+        return {
+            "ewma_latency": round(self.ewma, 3) if self.ewma is not None else None,
+            "requests": self.requests,
+            "wins": self.wins,
+            "failures": self.failures,
+            "degraded": self.degraded(),
+            "last_error": self.last_error
+        }
+
+
+class MirrorPool:
+    """Mirror health, ordering and counters shared by the sync and async clients"""
+
+    def __init__(self, mirrors=None, deadline=None, hedge_delay=None, cooldown=None):
+        self.deadline = deadline if deadline is not None else Config.OVERPASS_DEADLINE
+        self.hedge_delay = hedge_delay if hedge_delay is not None else Config.OVERPASS_HEDGE_DELAY
+        self.cooldown = cooldown if cooldown is not None else Config.OVERPASS_MIRROR_COOLDOWN
+        mirrors = mirrors or Config.OVERPASS_MIRRORS
+        self.mirrors = [MirrorHealth(url, i) for i, url in enumerate(mirrors)]
+        self.latency = LatencyHistogram()
+        self.counters = Counters("searches", "hedges", "abandoned", "errors", "deadline_exceeded")
+        self._lock = threading.Lock()
+
+    def ordered_mirrors(self):
+        """Healthy mirrors fastest first (unmeasured ones in configured order), then degraded ones"""
+        now = time.monotonic()
+        with self._lock:
+            return sorted(self.mirrors, key=lambda m: (m.degraded(now), m.ewma is not None,
+                                                       m.ewma or 0.0, m.position))
+
+    def _record_win(self, mirror, latency, losers):
+        """losers: (mirror, launched_at) of the requests still running"""
+        now = time.monotonic()
+        with self._lock:
+            mirror.record_success(latency)
+            mirror.wins += 1
+            # Losers were at least this slow; without a sample they would keep leading
+            for loser, launched_at in losers:
+                loser.requests += 1
+                loser.record_latency(now - launched_at)
+
+    def _record_error(self, mirror, error):
+        self.counters.incr("errors")
+        with self._lock:
+            mirror.record_failure(error, self.cooldown)
+        print(f"⚠️ Overpass error at {mirror.url}: {type(error).__name__}: {error}")
+
+    def stats(self):
+        with self._lock:
+            mirrors = {m.url: m.snapshot() for m in self.mirrors}
+        return {**self.counters.snapshot(), "latency": self.latency.snapshot(), "mirrors": mirrors}
+
+
+def _parse_response(body):
+    data = json.loads(body)
+    remark = data.get("remark") or ""
+    if "elements" not in data or "runtime error" in remark:
+        raise RuntimeError(remark or "response without elements")
+    return data
+
+
+class OverpassClient(MirrorPool):
+    """Pooled Overpass client racing mirrors under one deadline"""
+
+    def __init__(self, mirrors=None, deadline=None, hedge_delay=None, cooldown=None, client=None):
+        super().__init__(mirrors, deadline, hedge_delay, cooldown)
+        if client is not None:
+            self.client = client
+        else:
+            if httpx is None:
+                raise RuntimeError("httpx is required for OverpassClient")
+            pool_size = len(self.mirrors) * 4
+            self.client = httpx.Client(
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(self.deadline, connect=3.0)
+            )
+        self.executor = ThreadPoolExecutor(max_workers=len(self.mirrors) * 4, thread_name_prefix="overpass")
+
+    def _request(self, mirror, query, timeout, abandon):
+        """POST the query to one mirror; returns the parsed JSON body"""
+        started = time.perf_counter()
+        with self.client.stream("POST", mirror.url, data={"data": query}, timeout=timeout) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            body = bytearray()
+            for chunk in response.iter_bytes(READ_CHUNK_SIZE):
+                if abandon.is_set():
+                    raise _Abandoned()
+                body.extend(chunk)
+        return _parse_response(body), time.perf_counter() - started
+
+    def query(self, query, deadline=None):
+        """
+        Run an Overpass QL query on the mirrors; returns (data, mirror_url) for
+        the first valid response or raises OverpassUnavailable.
+        """
+        self.counters.incr("searches")
+        started = time.monotonic()
+        call_deadline = started + (deadline or self.deadline)
+        abandon = threading.Event()
+        queue = self.ordered_mirrors()
+        running = {}
+        last_error = None
+
+        def launch():
+            mirror = queue.pop(0)
+            future = self.executor.submit(self._request, mirror, query, call_deadline - time.monotonic(), abandon)
+            running[future] = (mirror, time.monotonic())
+
+        launch()
+        next_hedge = time.monotonic() + self.hedge_delay
+        try:
+            while running:
+                now = time.monotonic()
+                wake_at = min(call_deadline, next_hedge) if queue else call_deadline
+                done, _ = wait(list(running), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    mirror, _ = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        data, latency = future.result()
+                        self._record_win(mirror, latency, running.values())
+                        self.latency.observe(time.monotonic() - started)
+                        return data, mirror.url
+                    if isinstance(error, _Abandoned):
+                        continue
+                    last_error = error
+                    self._record_error(mirror, error)
+
+                now = time.monotonic()
+                if now >= call_deadline:
+                    self.counters.incr("deadline_exceeded")
+                    raise OverpassUnavailable("deadline", last_error)
+                # Race the next mirror when one failed (nothing left running) or the leader is slow
+                if queue and (not running or now >= next_hedge):
+                    if running:
+                        self.counters.incr("hedges")
+                    launch()
+                    next_hedge = now + self.hedge_delay
+            raise OverpassUnavailable("all mirrors failed", last_error)
+        finally:
+            abandon.set()
+            for future in running:
+                if not future.cancel():
+                    self.counters.incr("abandoned")
+
+    def facilities(self, lat, lon, tags, radius_m=15000, deadline=None):
+        """Facility elements (nodes, way/relation centres) within radius_m of the point"""
+        remaining = deadline or self.deadline
+        data, mirror_url = self.query(build_query(tags, lat, lon, radius_m, remaining), remaining)
+        print(f"✅ [Overpass] {len(data['elements'])} elements from {mirror_url}")
+        return data["elements"]
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
+
+
+class AsyncOverpassClient(MirrorPool):
+    """OverpassClient for the event loop: mirrors race as tasks, losers are cancelled"""
+
+    def __init__(self, mirrors=None, deadline=None, hedge_delay=None, cooldown=None, client=None):
+        super().__init__(mirrors, deadline, hedge_delay, cooldown)
+        if client is not None:
+            self.client = client
+        else:
+            if httpx is None:
+                raise RuntimeError("httpx is required for AsyncOverpassClient")
+            pool_size = len(self.mirrors) * 16
+            self.client = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(self.deadline, connect=3.0)
+            )
+
+    async def _request(self, mirror, query, timeout):
+        started = time.perf_counter()
+        response = await self.client.post(mirror.url, data={"data": query}, timeout=timeout)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return _parse_response(response.content), time.perf_counter() - started
+
+    async def query(self, query, deadline=None):
+        """Same contract as OverpassClient.query"""
+        self.counters.incr("searches")
+        started = time.monotonic()
+        call_deadline = started + (deadline or self.deadline)
+        queue = self.ordered_mirrors()
+        running = {}
+        last_error = None
+
+        def launch():
+            mirror = queue.pop(0)
+            task = asyncio.ensure_future(self._request(mirror, query, call_deadline - time.monotonic()))
+            running[task] = (mirror, time.monotonic())
+
+        launch()
+        next_hedge = time.monotonic() + self.hedge_delay
+        try:
+            while running:
+                now = time.monotonic()
+                wake_at = min(call_deadline, next_hedge) if queue else call_deadline
+                done, _ = await asyncio.wait(list(running), timeout=max(0.0, wake_at - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    mirror, _ = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        data, latency = task.result()
+                        self._record_win(mirror, latency, running.values())
+                        self.latency.observe(time.monotonic() - started)
+                        return data, mirror.url
+                    last_error = error
+                    self._record_error(mirror, error)
+
+                now = time.monotonic()
+                if now >= call_deadline:
+                    self.counters.incr("deadline_exceeded")
+                    raise OverpassUnavailable("deadline", last_error)
+                if queue and (not running or now >= next_hedge):
+                    if running:
+                        self.counters.incr("hedges")
+                    launch()
+                    next_hedge = now + self.hedge_delay
+            raise OverpassUnavailable("all mirrors failed", last_error)
+        finally:
+            for task in running:
+                task.cancel()
+                self.counters.incr("abandoned")
+
+    async def facilities(self, lat, lon, tags, radius_m=15000, deadline=None):
+        remaining = deadline or self.deadline
+        data, mirror_url = await self.query(build_query(tags, lat, lon, radius_m, remaining), remaining)
+        print(f"✅ [Overpass] {len(data['elements'])} elements from {mirror_url}")
+        return data["elements"]
+
+    async def aclose(self):
+        await self.client.aclose()
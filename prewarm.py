@@ -0,0 +1,176 @@
+"""
+Response cache pre-warming from the built-in knowledge tables
+
+Builds canonical English and Hindi answers for the topics HealNet already
+ships content for (utils.HEALTH_FAQ, DISEASE_AWARENESS and the fallback
+keyword answers) and stores them in response_cache with a long TTL, so the
+first wave of common questions after a deploy are cache hits. Answers are
+generated by the LLM grounded on the built-in text (rate-limited, through
+the app's normal model routing and generation budget), or taken from the
+built-in text directly in offline mode. Entries that are still fresh are
+skipped, so an interrupted run can simply be restarted.
+
+Each answer is stored under the phrasings people actually send ("fever",
+"i have fever", "fever symptoms", "मुझे बुखार है" ...), not just the bare
+topic name: the cache is looked up by message, and paraphrases of those
+keys reach them through the near-duplicate index.
+
+Usage:
+    python prewarm.py            # generate with Groq where configured
+    python prewarm.py --offline  # built-in text only, no upstream calls
+"""
+
+import argparse
+import sqlite3
+
+from config import Config
+from rate_limit import RateLimiter
+
+# topic -> canonical query per language
+PREWARM_TOPICS = {
+    "fever": {"english": "fever", "hindi": "बुखार"},
+    "headache": {"english": "headache", "hindi": "सिरदर्द"},
+    "cough": {"english": "cough", "hindi": "खांसी"},
+    "cold": {"english": "cold", "hindi": "सर्दी"},
+    "stomach_pain": {"english": "stomach pain", "hindi": "पेट दर्द"},
+    "diarrhea": {"english": "diarrhea", "hindi": "दस्त"},
+    "pain": {"english": "pain", "hindi": "दर्द"},
+    "diabetes": {"english": "diabetes", "hindi": "मधुमेह"},
+    "hypertension": {"english": "hypertension", "hindi": "उच्च रक्तचाप"},
+    "dengue": {"english": "dengue", "hindi": "डेंगू"},
+    "malaria": {"english": "malaria", "hindi": "मलेरिया"},
+    "tuberculosis": {"english": "tuberculosis", "hindi": "टीबी"},
+    "covid19": {"english": "covid", "hindi": "कोविड"}
+}
+
+# Keys into the fallback keyword answers for each topic
+FALLBACK_KEYWORDS = {
+    "fever": {"english": "fever", "hindi": "बुखार"},
+    "headache": {"english": "headache", "hindi": "सिरदर्द"},
+    "cough": {"english": "cough", "hindi": "खांसी"},
+    "cold": {"english": "cold"},
+    "stomach_pain": {"english": "stomach", "hindi": "पेट"},
+    "pain": {"english": "pain"}
+}
+
+LANGUAGE_CODES = {"english": "en", "hindi": "hi"}
+
+# Cache keys each answer is stored under, from the canonical query
+QUERY_VARIANTS = {
+    "english": ["{query}", "{query} symptoms", "{query} treatment"],
+    "hindi": ["{query}", "{query} के लक्षण", "{query} का इलाज"]
+}
+# Topics people report having rather than ask about
+SYMPTOM_VARIANTS = {"english": ["i have {query}"], "hindi": ["मुझे {query} है"]}
+SYMPTOM_TOPICS = {"fever", "headache", "cough", "cold", "stomach_pain", "diarrhea", "pain"}
+
+
+def query_keys(topic, language, query):
+    """Cache keys for one (topic, language) answer, canonical query first"""
+    variants = QUERY_VARIANTS[language] + (SYMPTOM_VARIANTS[language] if topic in SYMPTOM_TOPICS else [])
+    return [variant.format(query=query) for variant in variants]
+
+
+def build_jobs(health_faq, disease_awareness, fallback_responses, awareness_fn):
+    """
+    One job per (topic, language): the canonical query, the cache keys to
+    store its answer under and the built-in reference text for it.
+    """
+    jobs = []
+    for topic, queries in PREWARM_TOPICS.items():
+        for language, query in queries.items():
+            parts = []
+            faq = health_faq.get(topic, {}).get(LANGUAGE_CODES[language])
+            if faq:
+                parts.append(faq)
+            if topic in disease_awareness:
+                parts.append(awareness_fn(topic, language))
+            keyword = FALLBACK_KEYWORDS.get(topic, {}).get(language)
+            if keyword and keyword in fallback_responses.get(language, {}):
+                parts.append(fallback_responses[language][keyword])
+            if parts:
+                jobs.append({"topic": topic, "language": language, "query": query,
+                             "keys": query_keys(topic, language, query),
+                             "reference": "\n\n".join(p.strip() for p in parts)})
+    return jobs
+
+
+def is_fresh(query, language, min_remaining_seconds, db_path=None):
+    """True if a pre-warmed entry exists that will not expire soon"""
+    try:
+        conn = sqlite3.connect(db_path or Config.DATABASE_PATH)
+        row = conn.execute(
+            "SELECT 1 FROM response_cache WHERE query = ? AND language = ? "
+            "AND expires_at > datetime('now', ?) LIMIT 1",
+            (query.lower(), language, f"+{int(min_remaining_seconds)} seconds")
+        ).fetchone()
+        conn.close()
+        return row is not None
+    except Exception as e:
+        print(f"Pre-warm freshness check error: {e}")
+        return False
+
+
+def grounded_request(request_kwargs, reference):
+    """Completion kwargs with the reference text added to the user message, at a low temperature"""
+    messages = [dict(message) for message in request_kwargs["messages"]]
+    messages[-1]["content"] += f"\n\nVetted reference information:\n{reference}"
+    return {**request_kwargs, "messages": messages, "temperature": 0.3}
+
+
+def run_prewarm(jobs, store, generate=None, suffix="", ttl_seconds=None,
+                rate_per_minute=None, force=False, limit=None, db_path=None):
+    """
+    Store an answer for each job unless a fresh one exists.
+    generate(query, reference, language) is rate-limited; when it is None
+    or fails, the reference text itself becomes the answer.
+    """
+    ttl_seconds = ttl_seconds or Config.PREWARM_TTL_HOURS * 3600
+    limiter = RateLimiter(rate_per_minute if rate_per_minute is not None else Config.PREWARM_RATE_PER_MINUTE)
+    summary = {"warmed": 0, "skipped_fresh": 0, "generated": 0, "from_reference": 0, "errors": 0}
+
+    for job in jobs:
+        if limit is not None and summary["warmed"] >= limit:
+            break
+        # Refresh once less than a tenth of the TTL is left
+        if not force and is_fresh(job["query"], job["language"], ttl_seconds / 10, db_path):
+            summary["skipped_fresh"] += 1
+            continue
+
+        answer = None
+        if generate is not None:
+            limiter.wait()
+            try:
+                answer = generate(job["query"], job["reference"], job["language"])
+            except Exception as e:
+                summary["errors"] += 1
+                print(f"⚠️ Pre-warm generation failed for '{job['query']}': {type(e).__name__}: {e}")
+        if answer:
+            summary["generated"] += 1
+        else:
+            answer = job["reference"]
+            summary["from_reference"] += 1
+
+        for key in job.get("keys") or [job["query"]]:
+            store(key, answer + suffix, job["language"], ttl_seconds)
+        summary["warmed"] += 1
+        print(f"🔥 Pre-warmed [{job['language']}] {job['query']}")
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-warm the HealNet response cache")
+    parser.add_argument('--offline', action='store_true', help="Use built-in text only, no LLM calls")
+    parser.add_argument('--force', action='store_true', help="Rebuild entries that are still fresh")
+    parser.add_argument('--limit', type=int, help="Warm at most this many entries")
+    args = parser.parse_args(argv)
+
+    import app
+    app.warmup(["database", "clients"])
+    summary = app.prewarm_cache(offline=args.offline, force=args.force, limit=args.limit)
+    print(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Sampled request profiling
+
+A webhook request is profiled when it carries the X-HealNet-Profile header
+equal to PROFILE_TOKEN (the header is ignored while no token is set) or is
+picked at random with probability PROFILE_SAMPLE_RATE. A profiled request records:
+
+- a span tree of its stages: every metrics stage (language lookup, intent,
+  cache lookup, LLM call, geocode, Overpass, media fetch, inference, TwiML
+  build) opened while it runs becomes a span under the request
+- stack samples of the thread serving it, taken every
+  PROFILE_SAMPLE_INTERVAL seconds by a sampler thread (Flask path only;
+  on the ASGI event loop the stacks would mix in every other request)
+
+Profiles asked for by header, and sampled ones that took at least
+PROFILE_SLOW_SECONDS, are written to PROFILE_DIR:
+
+- <id>.folded: collapsed stacks, one "frame;frame;frame count" line per
+  distinct stack (input for flamegraph.pl or speedscope)
+- <id>.json: the span tree with timings
+
+Only the newest PROFILE_KEEP profiles are kept. A request that is not
+profiled costs one random() call, and each stage one ContextVar lookup.
+"""
+
+import collections
+import contextvars
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from config import Config
+from telemetry import Counters
+
+HEADER = "X-HealNet-Profile"
+
+# Innermost open span of the profiled request running in this context
+CURRENT_SPAN = contextvars.ContextVar("healnet_profile_span", default=None)
+
+COUNTERS = Counters("profiled", "written", "write_errors")
+
+_sequence = 0
+_sequence_lock = threading.Lock()
+
+
+def sampling_reason(header_value=None):
+    """'header', 'sampled' or None (not profiled) for a request with this X-HealNet-Profile value"""
+    if header_value and Config.PROFILE_TOKEN and hmac.compare_digest(header_value.encode(), Config.PROFILE_TOKEN.encode()):
+        return "header"
+    if Config.PROFILE_SAMPLE_RATE and random.random() < Config.PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def span_name(labels):
+    """'inference[brain]' for metric labels (('model', 'brain'), ('stage', 'inference'))"""
+    values = dict(labels)
+    return values["stage"] + (f"[{values['model']}]" if "model" in values else "")
+
+
+def open_span(labels):
+    """Child span of the current one, or None (quickly) outside a profiled request"""
+    parent = CURRENT_SPAN.get()
+    if parent is None:
+        return None
+    span = Span(span_name(labels))
+    parent.children.append(span)
+    span.token = CURRENT_SPAN.set(span)
+    return span
+
+
+def close_span(span, error=None):
+    span.end = time.perf_counter()
+    span.error = error
+    try:
+        CURRENT_SPAN.reset(span.token)
+    except ValueError:
+        pass  # closed from another context; the parent stays current there
+
+
+def collapse(frame):
+    """'outer (file.py:12);...;inner (file.py:80)' for a frame and its callers"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "error", "children", "token")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+        self.children = []
+        self.token = None
+
+    def to_dict(self, origin):
+        span = {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 2),
+            "ms": round(((self.end or time.perf_counter()) - self.start) * 1000, 2),
+        }
+        if self.error:
+            span["error"] = self.error
+        if self.children:
+            span["children"] = [child.to_dict(origin) for child in self.children]
+        return span
+
+
+class RequestProfile:
+    """Context manager profiling one request; writes it out on exit when forced or slow"""
+
+    def __init__(self, name, reason, sample_stacks=True, interval=None):
+        self.name = name
+        self.reason = reason
+        self.sample_stacks = sample_stacks
+        self.interval = interval or Config.PROFILE_SAMPLE_INTERVAL
+        self.root = Span(name)
+        self.samples = collections.Counter()
+        self.thread_id = threading.get_ident()
+        self._done = threading.Event()
+        self._sampler = None
+        self._token = None
+
+    def __enter__(self):
+        COUNTERS.incr("profiled")
+        self.started_at = time.time()
+        self.root.start = time.perf_counter()
+        self._token = CURRENT_SPAN.set(self.root)
+        if self.sample_stacks:
+            self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.root.end = time.perf_counter()
+        if exc_type is not None:
+            self.root.error = exc_type.__name__
+        CURRENT_SPAN.reset(self._token)
+        self._done.set()
+        if self._sampler:
+            self._sampler.join()
+        if self.reason == "header" or self.seconds >= Config.PROFILE_SLOW_SECONDS:
+            self.write()
+        return False
+
+    @property
+    def seconds(self):
+        return (self.root.end or time.perf_counter()) - self.root.start
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[collapse(frame)] += 1
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "reason": self.reason,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "seconds": round(self.seconds, 4),
+            "pid": os.getpid(),
+            "stack_samples": sum(self.samples.values()),
+            "sample_interval": self.interval if self.sample_stacks else None,
+            "spans": self.root.to_dict(self.root.start)
+        }
+
+    def write(self, directory=None):
+        """Write <id>.json and <id>.folded to PROFILE_DIR and drop the oldest profiles; returns the id"""
+        global _sequence
+        directory = directory or Config.PROFILE_DIR
+        with _sequence_lock:
+            _sequence += 1
+            sequence = _sequence
+        profile_id = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))}"
+                      f"-{os.getpid()}-{sequence:06d}-{int(self.seconds * 1000)}ms")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=2)
+            with open(os.path.join(directory, f"{profile_id}.folded"), "w", encoding="utf-8") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            rotate(directory, Config.PROFILE_KEEP)
+        except Exception as e:
+            COUNTERS.incr("write_errors")
+            print(f"Profile write error: {e}")
+            return None
+        COUNTERS.incr("written")
+        print(f"🔬 Profile {profile_id} written ({self.reason}, {self.seconds:.3f}s)")
+        return profile_id
+
+
+def rotate(directory, keep):
+    """Remove all but the newest `keep` profiles (ids start with their timestamp)"""
+    ids = sorted({name.rsplit(".", 1)[0] for name in os.listdir(directory)
+                  if name.endswith((".json", ".folded"))})
+    for profile_id in ids[:max(0, len(ids) - keep)]:
+        for suffix in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except OSError:
+                pass
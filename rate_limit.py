@@ -0,0 +1,87 @@
+"""
+Request spacing for upstream APIs with a usage policy
+
+RateLimiter spaces calls out to at most `per_minute`, either per process or
+shared by every process using the same slot file (all gunicorn workers).
+Background jobs (pre-warm, facility prefetch) simply wait for their turn.
+Request paths pass max_delay: when the next free slot is further away than
+that, no slot is taken and they fall back (gazetteer match, timeout
+message) instead of sleeping past Twilio's webhook deadline.
+"""
+
+import threading
+import time
+
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+
+class RateLimited(Exception):
+    """Raised when the next free slot is further away than the caller can wait"""
+
+    def __init__(self, delay):
+        super().__init__(f"next free slot in {delay:.1f}s")
+        self.delay = delay
+
+
+class RateLimiter:
+    """
+    Spaces out upstream calls to at most `per_minute`. With a path, the next
+    free slot is kept in that file under an exclusive lock, so every process
+    using the same path (all gunicorn workers) shares the one rate; without
+    fcntl (Windows) the limit is per process.
+    """
+
+    def __init__(self, per_minute, path=None):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.path = path if fcntl else None
+        self.next_at = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, max_delay=None):
+        """
+        Take the next free slot and return the seconds to wait for it (0 when
+        unlimited). Raises RateLimited, without taking the slot, when that is
+        more than max_delay.
+        """
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            delay = self._reserve_shared(max_delay) if self.path else self._reserve(max_delay)
+        if max_delay is not None and delay > max_delay:
+            raise RateLimited(delay)
+        return max(delay, 0.0)
+
+    def wait(self, max_delay=None):
+        """Sleep until the next free slot (see reserve)"""
+        delay = self.reserve(max_delay)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _reserve(self, max_delay):
+        now = time.monotonic()
+        delay = self.next_at - now
+        if max_delay is None or delay <= max_delay:
+            self.next_at = max(now, self.next_at) + self.interval
+        return delay
+
+    def _reserve_shared(self, max_delay):
+        try:
+            with open(self.path, 'a+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    next_at = float(f.read() or 0)
+                except ValueError:
+                    next_at = 0.0
+                now = time.time()
+                if max_delay is None or next_at - now <= max_delay:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(repr(max(now, next_at) + self.interval))
+                return next_at - now
+        except OSError as e:
+            print(f"Rate limiter file error ({self.path}): {e}")
+            return self._reserve(max_delay)
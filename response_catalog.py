@@ -0,0 +1,111 @@
+"""
+Pre-rendered catalog of static replies
+
+Renders every static reply (emergency numbers, insurance, government
+schemes, disease awareness, greeting) once per language and keeps the
+text, its WhatsApp-sized chunks and the serialized TwiML body, so the
+webhook can return them without building strings or a MessagingResponse
+per request. The catalog is rebuilt when the data tables it was rendered
+from change (see refresh()).
+"""
+
+import hashlib
+import json
+import threading
+from collections import namedtuple
+
+from twilio.twiml.messaging_response import MessagingResponse
+
+from streaming import WHATSAPP_CHUNK_SIZE
+from telemetry import Counters
+
+CatalogEntry = namedtuple("CatalogEntry", ["key", "language", "text", "chunks", "twiml"])
+
+
+def split_message(text, chunk_size=WHATSAPP_CHUNK_SIZE):
+    """Split a reply into WhatsApp-sized messages at line boundaries"""
+    if len(text) <= chunk_size:
+        return [text]
+    chunks = []
+    current_chunk = ""
+    for line in text.split('\n'):
+        if len(current_chunk) + len(line) + 1 <= chunk_size:
+            current_chunk += line + '\n'
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = line + '\n'
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def render_twiml(chunks):
+    resp = MessagingResponse()
+    for chunk in chunks:
+        resp.message(chunk)
+    return str(resp)
+
+
+def fingerprint(tables):
+    """Stable hash of the data tables the catalog is rendered from"""
+    payload = json.dumps(tables, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCatalog:
+    """
+    renderers: {key: fn(language) -> text}; sources: fn() -> data tables used
+    by the renderers (their fingerprint decides when to re-render).
+    """
+
+    def __init__(self, renderers, languages=('english', 'hindi'), sources=None, default_language='english'):
+        self.renderers = renderers
+        self.languages = tuple(languages)
+        self.sources = sources
+        self.default_language = default_language
+        self.entries = {}
+        self.by_text = {}
+        self.version = None
+        self.counters = Counters("hits", "misses", "rebuilds")
+        self._lock = threading.Lock()
+
+    def build(self):
+        entries = {}
+        for key, render in self.renderers.items():
+            for language in self.languages:
+                text = render(language)
+                if not text:
+                    continue
+                chunks = split_message(text)
+                entries[(key, language)] = CatalogEntry(key, language, text, chunks, render_twiml(chunks))
+        by_text = {entry.text: entry for entry in entries.values()}
+        version = fingerprint(self.sources()) if self.sources else None
+        with self._lock:
+            self.entries, self.by_text, self.version = entries, by_text, version
+        self.counters.incr("rebuilds")
+        print(f"📇 Response catalog rendered: {len(entries)} entries")
+        return len(entries)
+
+    def refresh(self):
+        """Re-render if the source tables changed since the last build; True if rebuilt"""
+        if self.sources and fingerprint(self.sources()) == self.version and self.entries:
+            return False
+        self.build()
+        return True
+
+    def get(self, key, language='english'):
+        entry = self.entries.get((key, language)) or self.entries.get((key, self.default_language))
+        self.counters.incr("hits" if entry else "misses")
+        return entry
+
+    def text(self, key, language='english'):
+        entry = self.get(key, language)
+        return entry.text if entry else None
+
+    def for_text(self, text):
+        """Catalog entry whose text is exactly `text` (pre-chunked TwiML for the webhook)"""
+        return self.by_text.get(text)
+
+    def stats(self):
+        return {**self.counters.snapshot(), "entries": len(self.entries), "version": self.version}
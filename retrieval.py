@@ -0,0 +1,248 @@
+"""
+Local BM25 retrieval answer engine in front of the LLM
+
+Indexes the vetted text HealNet already ships (utils.HEALTH_FAQ in English
+and Hindi, DISEASE_AWARENESS, the fallback keyword answers) plus an optional
+folder of curated articles into an inverted index stored as compact NumPy
+arrays (CSR postings), built once at startup. Queries whose terms are
+covered well enough by the best document are answered directly in the
+user's language, skipping the LLM.
+
+Coverage only counts query terms found in a document's title or topic, so
+a word that merely appears in some answer's body ("chest pain" in the cough
+FAQ) never makes that answer look confident. Queries with red-flag terms
+(chest pain, blood, breathlessness, ...) are never answered locally.
+
+Curated articles are plain text or Markdown files named <topic>.<lang>.md
+(lang: en or hi, default en); the first line is the title.
+"""
+
+import math
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from config import Config
+from semantic_cache import FILLER_WORDS
+from telemetry import Counters, LatencyHistogram
+
+_TOKEN = re.compile(r'[\w\u0900-\u0DFF]+')
+
+# Extra words common in symptom descriptions that carry no topic
+RETRIEVAL_STOPWORDS = FILLER_WORDS | {
+    "in", "and", "do", "have", "has", "had", "am", "be", "been", "with", "for", "from", "it", "this", "that",
+    "or", "at", "by", "as", "should", "what", "which", "when", "why", "there", "get",
+    "hu", "hoon", "raha", "rahi", "se", "aur", "ya", "और", "या", "से", "हूं", "रहा", "रही"
+}
+
+# What the user wants to know about a topic; covered by any document body on that topic
+ASPECT_TERMS = {
+    "symptom", "sign", "treatment", "treat", "remedy", "remedie", "cure", "cause", "prevention", "prevent",
+    "diet", "food", "medicine", "care", "home", "ilaj", "lakshan", "upay", "इलाज", "लक्षण", "उपाय"
+}
+
+# Symptoms that need a doctor's (or the LLM's) judgement, never a canned answer
+RED_FLAGS = re.compile(
+    r"chest (pain|tightness|pressure)|\bblood\b(?! (pressure|sugar|test|group|report))|bleed|"
+    r"breathless|short(ness)? of breath|(difficulty|trouble|problem) (in )?breathing|can'?t breathe|cannot breathe|"
+    r"unconscious|faint|seizure|\bfits?\b|stroke|paraly|numb|suicid|poison|overdose|severe|"
+    r"pregnan|\bkhoon\b|\bsaans\b|behosh|खून|सीने|सांस|बेहोश|दौरा|गर्भ"
+)
+
+ARTICLE_LANGUAGES = {"en": "english", "hi": "hindi"}
+
+
+def has_red_flag(text):
+    return RED_FLAGS.search(text.lower()) is not None
+
+
+def tokenize(text):
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in RETRIEVAL_STOPWORDS:
+            continue
+        # Light plural stemming for Latin-script words (headaches -> headache)
+        if len(token) > 4 and token.endswith('s') and token.isascii() and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def load_articles(folder):
+    """Read curated articles from <topic>.<lang>.md / .txt files"""
+    documents = []
+    if not folder or not os.path.isdir(folder):
+        return documents
+    for filename in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(filename)
+        if ext not in ('.md', '.txt'):
+            continue
+        topic, _, lang = stem.rpartition('.')
+        if lang not in ARTICLE_LANGUAGES:
+            topic, lang = stem, "en"
+        with open(os.path.join(folder, filename), encoding='utf-8') as f:
+            content = f.read().strip()
+        if not content:
+            continue
+        title = content.splitlines()[0].lstrip('# ').strip()
+        documents.append({"topic": topic, "source": "article", "language": ARTICLE_LANGUAGES[lang],
+                          "title": title, "text": content})
+    return documents
+
+
+def build_documents(health_faq, disease_awareness, fallback_responses, awareness_fn, articles_dir=None):
+    """Collect the built-in corpora as retrieval documents"""
+    documents = []
+    for topic, texts in health_faq.items():
+        for code, language in ARTICLE_LANGUAGES.items():
+            if code in texts:
+                documents.append({"topic": topic, "source": "faq", "language": language,
+                                  "title": topic.replace('_', ' '), "text": texts[code]})
+    for disease in disease_awareness:
+        for language in ("english", "hindi"):
+            documents.append({"topic": disease, "source": "awareness", "language": language,
+                              "title": disease, "text": awareness_fn(disease, language)})
+    for language, answers in fallback_responses.items():
+        for keyword, text in answers.items():
+            if keyword != "default":
+                documents.append({"topic": keyword, "source": "fallback", "language": language,
+                                  "title": keyword, "text": text})
+    return documents + load_articles(articles_dir)
+
+
+class RetrievalEngine:
+    """BM25 over an inverted index held in flat NumPy arrays"""
+
+    def __init__(self, documents, k1=1.2, b=0.75, title_weight=3):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        postings = []
+        doc_lengths = []
+
+        for doc_idx, doc in enumerate(documents):
+            terms = tokenize(doc["title"]) * title_weight + tokenize(doc["text"])
+            doc_lengths.append(len(terms))
+            frequencies = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            for term, tf in frequencies.items():
+                term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                postings.append((term_id, doc_idx, tf))
+
+        postings.sort()
+        n_terms = len(self.vocabulary)
+        self.post_docs = np.array([p[1] for p in postings], dtype=np.int32)
+        self.post_tf = np.array([p[2] for p in postings], dtype=np.float32)
+        counts = np.bincount(np.array([p[0] for p in postings], dtype=np.int64), minlength=n_terms)
+        self.offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.doc_len = np.array(doc_lengths, dtype=np.float32)
+        self.avg_doc_len = float(self.doc_len.mean()) if len(doc_lengths) else 1.0
+        n_docs = len(documents)
+        self.idf = np.log(1.0 + (n_docs - counts + 0.5) / (counts + 0.5)).astype(np.float32)
+        self.max_idf = float(self.idf.max()) if n_terms else math.log(2.0)
+        # Length normalisation is fixed per document, so precompute it
+        self.norm = (self.k1 * (1 - self.b + self.b * self.doc_len / self.avg_doc_len)).astype(np.float32)
+
+        self.by_topic = {}
+        self.title_terms = []
+        for doc_idx, doc in enumerate(documents):
+            self.by_topic.setdefault((doc["topic"], doc["language"]), []).append(doc_idx)
+            self.title_terms.append(set(tokenize(doc["title"]) + tokenize(doc["topic"].replace('_', ' '))))
+
+    def search(self, query, candidates=5):
+        """
+        Return (doc_idx, score, coverage) for the best document, or None.
+        coverage is the share of the IDF mass of the query's topic terms (all
+        but ASPECT_TERMS) found in the document's title or topic; of the
+        `candidates` best-scoring documents the best covered one wins.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.documents:
+            return None
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        term_idf = {}
+        for term in terms:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                term_idf[term] = self.max_idf
+                continue
+            idf = self.idf[term_id]
+            term_idf[term] = float(idf)
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.post_docs[start:end]
+            tf = self.post_tf[start:end]
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self.norm[docs])
+        if scores.max() <= 0:
+            return None
+
+        topic_idf = {term: idf for term, idf in term_idf.items() if term not in ASPECT_TERMS}
+        query_idf = sum(topic_idf.values())
+        ranked = [int(i) for i in np.argsort(-scores)[:candidates] if scores[i] > 0]
+        results = []
+        for doc_idx in ranked:
+            matched = sum(idf for term, idf in topic_idf.items() if term in self.title_terms[doc_idx])
+            results.append((doc_idx, float(scores[doc_idx]), matched / query_idf if query_idf else 0.0))
+        return max(results, key=lambda result: (result[2], result[1]))
+
+    def document_for(self, doc_idx, language):
+        """The best document's text in the requested language, if we have it"""
+        doc = self.documents[doc_idx]
+        if doc["language"] == language:
+            return doc
+        candidates = self.by_topic.get((doc["topic"], language), [])
+        same_source = [i for i in candidates if self.documents[i]["source"] == doc["source"]]
+        chosen = (same_source or candidates or [None])[0]
+        return self.documents[chosen] if chosen is not None else None
+
+
+class RetrievalAnswerer:
+    """Answers confidently matched queries locally and counts avoided LLM calls"""
+
+    def __init__(self, engine=None, threshold=None):
+        self.engine = engine
+        self.threshold = threshold if threshold is not None else Config.RETRIEVAL_THRESHOLD
+        self.latency = LatencyHistogram(buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05))
+        self.counters = Counters("queries", "llm_calls_avoided", "red_flag_skips")
+        self._lock = threading.Lock()
+
+    def rebuild(self, documents):
+        engine = RetrievalEngine(documents)
+        with self._lock:
+            self.engine = engine
+        return engine
+
+    def answer(self, query, language='english'):
+        """Return (doc, score, coverage) when confident enough, else None"""
+        engine = self.engine
+        if engine is None:
+            return None
+        started = time.perf_counter()
+        self.counters.incr("queries")
+        if has_red_flag(query):
+            self.counters.incr("red_flag_skips")
+            return None
+        result = engine.search(query)
+        doc = None
+        if result and result[2] >= self.threshold:
+            doc = engine.document_for(result[0], language)
+        self.latency.observe(time.perf_counter() - started)
+        if doc is None:
+            return None
+        self.counters.incr("llm_calls_avoided")
+        return doc, result[1], result[2]
+
+    def stats(self):
+        engine = self.engine
+        return {
+            **self.counters.snapshot(),
+            "documents": len(engine.documents) if engine else 0,
+            "terms": len(engine.vocabulary) if engine else 0,
+            "threshold": self.threshold,
+            "latency": self.latency.snapshot()
+        }
@@ -0,0 +1,270 @@
+"""
+Near-duplicate lookup over cached answers for paraphrased health questions
+
+Queries are normalized (lowercased, punctuation and filler words such as
+"what is", "tell me about", "kya hai" removed, plurals folded) into a set of
+word tokens and indexed with MinHash + LSH banding, per language. LSH
+candidates are verified with the exact token Jaccard similarity, and a
+cached answer is reused only above a configurable threshold.
+
+Whole tokens, not character trigrams: "hypertension" and "hypotension" or
+"dose" and "overdose" share most of their trigrams but are different
+questions. On top of that a match is refused whenever the two queries
+differ in a negation ("not contagious"), a number ("type 1" / "type 2") or
+a qualifier ("high" / "low", "in pregnancy", "child"), however similar the
+rest is, and when each query has a word the other lacks ("ibuprofen with
+milk" / "with alcohol", "rice in diabetes" / "mango in diabetes"): one
+query's words must contain the other's. Everything is local - no external
+embedding service.
+
+Replay a labelled query log to measure hit rate vs false-match rate:
+    python semantic_cache.py --replay benchmarks/data/paraphrase_replay.tsv --sweep
+"""
+
+import argparse
+import re
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+from config import Config
+from telemetry import Counters
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+_MERSENNE_PRIME = (1 << 31) - 1
+
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, _MERSENNE_PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _rng.randint(0, _MERSENNE_PRIME, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+# Question scaffolding that carries no topic information (English, Hinglish, Hindi)
+FILLER_WORDS = {
+    "what", "is", "are", "was", "the", "a", "an", "of", "about", "tell", "me", "please", "pls",
+    "can", "you", "explain", "info", "information", "on", "i", "want", "to", "know", "give",
+    "does", "how", "my", "some", "details", "detail",
+    "kya", "hai", "hain", "ke", "ki", "ka", "ko", "bare", "baare", "mein", "mai", "batao",
+    "bataiye", "bataye", "mujhe", "hota", "hoti", "jankari", "jaankari",
+    "क्या", "है", "हैं", "के", "की", "का", "को", "बारे", "में", "बताओ", "बताइए", "बताएं",
+    "मुझे", "होता", "होती", "जानकारी"
+}
+
+# Words that change the question, not just its phrasing: a cached answer is
+# only reused when both queries carry the same ones (mapped to one spelling)
+NEGATIONS = {
+    "not", "no", "never", "without", "cannot", "cant", "isn", "aren", "don", "doesn", "won",
+    "nahi", "nahin", "nhi", "mat", "bina", "नहीं", "मत", "बिना"
+}
+QUALIFIERS = {
+    "high": "high", "low": "low", "over": "over", "under": "under", "overdose": "overdose",
+    "pregnancy": "pregnancy", "pregnant": "pregnancy", "garbhavastha": "pregnancy", "गर्भावस्था": "pregnancy",
+    "child": "child", "children": "child", "baby": "child", "babies": "child", "infant": "child",
+    "kid": "child", "kids": "child", "bachcha": "child", "bachche": "child", "bacche": "child",
+    "बच्चा": "child", "बच्चे": "child", "बच्चों": "child",
+    "adult": "adult", "elderly": "elderly", "old": "elderly", "woman": "woman", "women": "woman",
+    "man": "man", "men": "man", "before": "before", "after": "after",
+    "mild": "mild", "severe": "severe", "acute": "acute", "chronic": "chronic",
+    "first": "first", "second": "second", "third": "third"
+}
+
+# \w alone splits Indic words at vowel signs and viramas, so include those blocks
+_TOKEN = re.compile(r'[\w\u0900-\u0DFF]+')
+
+
+def _fold(token):
+    """Fold English plurals and -ion nouns ("symptoms", "prevention") onto their stem"""
+    if not token.isascii() or len(token) <= 4:
+        return token
+    if token.endswith("ion") and len(token) > 6:
+        return token[:-3]
+    if token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def normalize(text):
+    """Lowercase, tokenize and drop filler words; falls back to all tokens"""
+    tokens = _TOKEN.findall(text.lower())
+    content = [t for t in tokens if t not in FILLER_WORDS]
+    return sorted({_fold(t) for t in content or tokens})
+
+
+def guard_terms(text):
+    """Negations, numbers and qualifiers of a query; matches must agree on these"""
+    terms = set()
+    for token in _TOKEN.findall(text.lower()):
+        if token in NEGATIONS:
+            terms.add("not")
+        elif token.isdigit():
+            terms.add(str(int(token)))
+        elif token in QUALIFIERS:
+            terms.add(QUALIFIERS[token])
+    return frozenset(terms)
+
+
+def minhash(terms):
+    """MinHash signature of a token set"""
+    if not terms:
+        return np.full(NUM_PERMUTATIONS, _MERSENNE_PRIME, dtype=np.uint64)
+    hashes = np.fromiter((zlib.crc32(t.encode('utf-8')) for t in terms), dtype=np.uint64, count=len(terms))
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+def nested(a, b):
+    """True if one token set contains the other - otherwise each side has a word the other lacks"""
+    return a <= b or b <= a
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of cached queries, keyed by response_cache id"""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold if threshold is not None else Config.NEAR_DUPLICATE_THRESHOLD
+        self.entries = {}
+        self.buckets = {}
+        self.counters = Counters("lookups", "hits", "misses")
+        self._lock = threading.Lock()
+
+    def _band_keys(self, language, signature):
+        for band in range(LSH_BANDS):
+            yield (language, band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes())
+
+    def add(self, entry_id, query, language):
+        terms = set(normalize(query))
+        if not terms:
+            return
+        signature = minhash(terms)
+        with self._lock:
+            self.entries[entry_id] = (language, terms, signature, guard_terms(query))
+            for key in self._band_keys(language, signature):
+                self.buckets.setdefault(key, set()).add(entry_id)
+
+    def remove(self, entry_id):
+        with self._lock:
+            entry = self.entries.pop(entry_id, None)
+            if not entry:
+                return
+            language, _, signature, _ = entry
+            for key in self._band_keys(language, signature):
+                bucket = self.buckets.get(key)
+                if bucket:
+                    bucket.discard(entry_id)
+                    if not bucket:
+                        del self.buckets[key]
+
+    def lookup(self, query, language):
+        """Return (entry_id, similarity) of the best match above threshold, or None"""
+        self.counters.incr("lookups")
+        terms = set(normalize(query))
+        if not terms:
+            self.counters.incr("misses")
+            return None
+        signature = minhash(terms)
+        guard = guard_terms(query)
+        best = None
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(language, signature):
+                candidates |= self.buckets.get(key, set())
+            for entry_id in candidates:
+                _, entry_terms, _, entry_guard = self.entries[entry_id]
+                if entry_guard != guard or not nested(terms, entry_terms):
+                    continue
+                similarity = jaccard(terms, entry_terms)
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (entry_id, similarity)
+        self.counters.incr("hits" if best else "misses")
+        return best
+
+    def load(self, db_path=None):
+        """(Re)build the index from the response_cache table"""
+        try:
+            conn = sqlite3.connect(db_path or Config.DATABASE_PATH)
+            rows = conn.execute("SELECT id, query, language FROM response_cache").fetchall()
+            conn.close()
+        except Exception as e:
+            print(f"Near-duplicate index load error: {e}")
+            return 0
+        with self._lock:
+            self.entries.clear()
+            self.buckets.clear()
+        for entry_id, query, language in rows:
+            if query:
+                self.add(entry_id, query, language)
+        return len(rows)
+
+    def stats(self):
+        counters = self.counters.snapshot()
+        lookups = counters["lookups"]
+        return {
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self.entries),
+            "threshold": self.threshold
+        }
+
+
+def replay(path, threshold):
+    """
+    Replay a labelled query log (group<TAB>language<TAB>query per line).
+    Each miss is inserted as if it had been answered and cached; a hit is a
+    false match when the matched query belongs to a different group.
+    """
+    index = NearDuplicateIndex(threshold)
+    groups = {}
+    seen_groups = set()
+    queries = hits = false_matches = possible_hits = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            group, language, query = line.split('\t', 2)
+            queries += 1
+            if (group, language) in seen_groups:
+                possible_hits += 1
+            match = index.lookup(query, language)
+            if match:
+                hits += 1
+                if groups[match[0]] != group:
+                    false_matches += 1
+            else:
+                groups[queries] = group
+                index.add(queries, query, language)
+                seen_groups.add((group, language))
+    true_hits = hits - false_matches
+    return {
+        "threshold": threshold,
+        "queries": queries,
+        "hit_rate": round(hits / queries, 4) if queries else 0.0,
+        "recall_of_possible_hits": round(true_hits / possible_hits, 4) if possible_hits else 0.0,
+        "false_match_rate": round(false_matches / hits, 4) if hits else 0.0
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure near-duplicate cache hit rate on a query-log replay")
+    parser.add_argument('--replay', required=True, help="TSV file: group, language, query")
+    parser.add_argument('--threshold', type=float, default=Config.NEAR_DUPLICATE_THRESHOLD)
+    parser.add_argument('--sweep', action='store_true', help="Try thresholds from 0.3 to 0.9")
+    args = parser.parse_args(argv)
+
+    thresholds = [round(0.3 + 0.1 * i, 1) for i in range(7)] if args.sweep else [args.threshold]
+    print(f"{'threshold':>9}  {'hit_rate':>8}  {'recall':>6}  {'false_match':>11}")
+    for threshold in thresholds:
+        result = replay(args.replay, threshold)
+        print(f"{threshold:>9.2f}  {result['hit_rate']:>8.3f}  {result['recall_of_possible_hits']:>6.3f}  "
+              f"{result['false_match_rate']:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Single-flight coalescing of identical in-flight LLM queries
+
+The first caller for a key makes the upstream call; concurrent callers with
+the same key wait for its result instead of firing their own request.
+Within a worker this uses threading events. With cross_process=True the
+leader also claims the key in the local SQLite database, and callers in
+other worker processes poll the response cache until the leader's answer
+lands there.
+
+AsyncSingleFlight does the same for coroutines on one event loop.
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from config import Config
+from telemetry import Counters
+
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def query_key(message, language):
+    """Normalize a message so trivially different copies share a key"""
+    text = _PUNCTUATION.sub(' ', message.lower())
+    return f"{language}:{_WHITESPACE.sub(' ', text).strip()}"
+
+
+def _new_owner():
+    return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key"""
+
+    def __init__(self, timeout=None, cross_process=None, db_path=None, poll_interval=0.1):
+        self.timeout = timeout if timeout is not None else Config.SINGLEFLIGHT_TIMEOUT
+        self.cross_process = Config.SINGLEFLIGHT_CROSS_PROCESS if cross_process is None else cross_process
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.poll_interval = poll_interval
+        self.owner = _new_owner()
+        self.counters = Counters("leader_calls", "coalesced", "coalesced_cross_process", "timeouts")
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def after_fork(self):
+        """In a forked child: claim keys under a new owner id, with no calls in flight"""
+        self.owner = _new_owner()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, lookup=None):
+        """
+        Run fn() once per key at a time and share its result.
+        lookup() is used in cross-process mode to read the answer another
+        process produced (normally a response cache read).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            if call.event.wait(self.timeout):
+                self.counters.incr("coalesced")
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # Leader is taking too long - make our own call
+            self.counters.incr("timeouts")
+            return fn()
+
+        self.counters.incr("leader_calls")
+        try:
+            if self.cross_process and lookup is not None:
+                call.result = self._do_cross_process(key, fn, lookup)
+            else:
+                call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            call.event.set()
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _do_cross_process(self, key, fn, lookup):
+        if self._acquire(key):
+            try:
+                return fn()
+            finally:
+                self._release(key)
+
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            result = lookup()
+            if result:
+                self.counters.incr("coalesced_cross_process")
+                return result
+            if not self._in_flight(key):
+                break
+        else:
+            self.counters.incr("timeouts")
+        # The other process finished without a usable answer, or timed out
+        return fn()
+
+    def _acquire(self, key):
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            c = conn.cursor()
+            c.execute("DELETE FROM inflight_queries WHERE query_key = ? AND started < ?",
+                      (key, time.time() - self.timeout))
+            c.execute("INSERT OR IGNORE INTO inflight_queries (query_key, owner, started) VALUES (?, ?, ?)",
+                      (key, self.owner, time.time()))
+            acquired = c.rowcount == 1
+            conn.commit()
+            conn.close()
+            return acquired
+        except Exception as e:
+            print(f"Single-flight claim error: {e}")
+            return True
+
+    def _release(self, key):
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("DELETE FROM inflight_queries WHERE query_key = ? AND owner = ?", (key, self.owner))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Single-flight release error: {e}")
+
+    def _in_flight(self, key):
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            row = conn.execute("SELECT 1 FROM inflight_queries WHERE query_key = ?", (key,)).fetchone()
+            conn.close()
+            return row is not None
+        except Exception:
+            return False
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {**self.counters.snapshot(), "in_flight": in_flight, "cross_process": self.cross_process}
+
+
+class AsyncSingleFlight(SingleFlight):
+    """
+    SingleFlight for coroutines on one event loop: fn() returns an awaitable;
+    lookup() is a blocking call and runs in a worker thread.
+    """
+
+    async def do(self, key, fn, lookup=None):
+        call = self._calls.get(key)
+        if call is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(call), self.timeout)
+            except asyncio.TimeoutError:
+                # Leader is taking too long - make our own call
+                self.counters.incr("timeouts")
+                return await fn()
+            except asyncio.CancelledError:
+                if not call.cancelled():
+                    raise
+                # The leader's request was cancelled, not ours
+                return await fn()
+            self.counters.incr("coalesced")
+            return result
+
+        call = asyncio.get_running_loop().create_future()
+        self._calls[key] = call
+        self.counters.incr("leader_calls")
+        try:
+            if self.cross_process and lookup is not None:
+                result = await self._do_cross_process_async(key, fn, lookup)
+            else:
+                result = await fn()
+            call.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except Exception as e:
+            call.set_exception(e)
+            call.exception()  # Retrieved here so lone leaders don't log "never retrieved"
+            raise
+        finally:
+            self._calls.pop(key, None)
+
+    async def _do_cross_process_async(self, key, fn, lookup):
+        if await asyncio.to_thread(self._acquire, key):
+            try:
+                return await fn()
+            finally:
+                await asyncio.to_thread(self._release, key)
+
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            result = await asyncio.to_thread(lookup)
+            if result:
+                self.counters.incr("coalesced_cross_process")
+                return result
+            if not await asyncio.to_thread(self._in_flight, key):
+                break
+        else:
+            self.counters.incr("timeouts")
+        return await fn()
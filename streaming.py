@@ -0,0 +1,216 @@
+"""
+Streaming Groq completions with progressive WhatsApp delivery
+
+The completion is consumed as a token stream. The first complete paragraph
+is sent through the Twilio REST API as soon as it crosses a size threshold,
+the rest follows at WhatsApp-sized boundaries, and the caller caches the
+full text at the end.
+
+A stream gets the same overall deadline as a regular call (LLM_DEADLINE).
+Hedging and retries do not apply - a second stream would send everything
+twice - so a stream that fails is reported to the caller, which answers
+through the regular (hedged, retried) completion path instead: silently if
+nothing was sent yet, after an "answer interrupted" notice otherwise. A
+truncated answer is never finished off with the disclaimer as if complete.
+"""
+
+import time
+
+from config import Config
+from telemetry import Counters, LatencyHistogram
+
+WHATSAPP_CHUNK_SIZE = 1500
+
+STREAM_TIMINGS = {
+    "time_to_first_message": LatencyHistogram(),
+    "total": LatencyHistogram()
+}
+STREAM_COUNTERS = Counters("streams", "messages_sent", "stream_errors", "interrupted")
+
+
+def _split_point(text, limit):
+    """Best place to cut text at or before limit: paragraph, line, sentence, then word"""
+    for sep in ('\n\n', '\n', '. ', ' '):
+        idx = text.rfind(sep, 0, limit)
+        if idx > 0:
+            return idx + len(sep)
+    return limit
+
+
+class ProgressiveSender:
+    """
+    Buffers streamed text and hands WhatsApp-sized messages to `send` as soon
+    as they are complete.
+    """
+
+    def __init__(self, send, first_message_chars=None, chunk_size=WHATSAPP_CHUNK_SIZE):
+        self.send = send
+        self.first_message_chars = first_message_chars or Config.STREAM_FIRST_MESSAGE_CHARS
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.messages_sent = 0
+        self.first_sent_at = None
+
+    def _emit(self, text):
+        text = text.strip()
+        if not text:
+            return
+        self.send(text)
+        self.messages_sent += 1
+        STREAM_COUNTERS.incr("messages_sent")
+        if self.first_sent_at is None:
+            self.first_sent_at = time.perf_counter()
+
+    def feed(self, text):
+        self.buffer += text
+        if not self.messages_sent:
+            # First message: the first complete paragraph past the threshold
+            idx = self.buffer.find('\n\n', self.first_message_chars)
+            if 0 < idx <= self.chunk_size:
+                self._emit(self.buffer[:idx])
+                self.buffer = self.buffer[idx + 2:]
+            elif len(self.buffer) < self.chunk_size:
+                return
+        while len(self.buffer) >= self.chunk_size:
+            cut = _split_point(self.buffer, self.chunk_size)
+            self._emit(self.buffer[:cut])
+            self.buffer = self.buffer[cut:]
+
+    def finish(self, suffix=""):
+        """Flush whatever is left, with an optional suffix (e.g. the disclaimer)"""
+        self.buffer += suffix
+        while self.buffer.strip():
+            cut = len(self.buffer) if len(self.buffer) <= self.chunk_size else _split_point(self.buffer, self.chunk_size)
+            self._emit(self.buffer[:cut])
+            self.buffer = self.buffer[cut:]
+        self.buffer = ""
+
+
+def stream_completion(client, send, messages, model, max_tokens=800, temperature=0.7,
+                      suffix="", first_message_chars=None, deadline=None):
+    """
+    Stream a chat completion from `client` (the Groq SDK client, or anything
+    with the same chat.completions.create(stream=True) interface) and deliver
+    it through `send(body)`, giving up after `deadline` seconds
+    (default LLM_DEADLINE).
+
+    Returns (full_text, timings). full_text is None if the stream failed:
+    timings is None when nothing reached the user, or has "interrupted" set
+    when some messages were already sent. Either way the caller answers
+    through the regular path; the unsent rest and the suffix are dropped.
+    """
+    deadline = deadline or Config.LLM_DEADLINE
+    started = time.perf_counter()
+    sender = ProgressiveSender(send, first_message_chars)
+    parts = []
+    STREAM_COUNTERS.incr("streams")
+
+    try:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            timeout=deadline
+        )
+        for chunk in stream:
+            if time.perf_counter() - started > deadline:
+                raise TimeoutError(f"stream deadline of {deadline:g}s exceeded")
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                sender.feed(delta)
+        if not parts and not sender.messages_sent:
+            return None, None
+        # The last flush sends too, so a Twilio failure here is an interruption as well
+        sender.finish(suffix)
+    except Exception as e:
+        STREAM_COUNTERS.incr("stream_errors")
+        print(f"⚠️ Stream error: {type(e).__name__}: {str(e)}")
+        if not sender.messages_sent:
+            return None, None
+        STREAM_COUNTERS.incr("interrupted")
+        return None, {**_record_timings(started, sender), "interrupted": True}
+
+    return "".join(parts) + suffix, _record_timings(started, sender)
+
+
+def _record_timings(started, sender):
+    finished = time.perf_counter()
+    timings = {
+        "time_to_first_message": (sender.first_sent_at or finished) - started,
+        "total": finished - started,
+        "messages": sender.messages_sent
+    }
+    STREAM_TIMINGS["time_to_first_message"].observe(timings["time_to_first_message"])
+    STREAM_TIMINGS["total"].observe(timings["total"])
+    print(f"📨 Streamed {sender.messages_sent} messages: first after "
+          f"{timings['time_to_first_message']:.2f}s, total {timings['total']:.2f}s")
+    return timings
+
+
+def twilio_sender(twilio_client, from_number, to_number):
+    """Build a send(body) callable that delivers through the Twilio REST API"""
+    def send(body):
+        twilio_client.messages.create(from_=from_number, to=to_number, body=body)
+    return send
+
+
+def stream_stats():
+    """Snapshot of streaming counters and timings"""
+    return {
+        **STREAM_COUNTERS.snapshot(),
+        **{name: hist.snapshot() for name, hist in STREAM_TIMINGS.items()}
+    }
+
+
+class FakeStreamingClient:
+    """
+    Stand-in for the Groq client that streams a fixed text in small deltas,
+    for exercising the streaming path without network access.
+    """
+
+    class _Namespace:
+        pass
+
+    def __init__(self, text, delta_chars=12, delay=0.0, fail_after=None):
+        self.text = text
+        self.delta_chars = delta_chars
+        self.delay = delay
+        self.fail_after = fail_after
+        self.chat = self._Namespace()
+        self.chat.completions = self._Namespace()
+        self.chat.completions.create = self._create
+
+    def _create(self, stream=False, **kwargs):
+        def chunks():
+            for i in range(0, len(self.text), self.delta_chars):
+                if self.fail_after is not None and i >= self.fail_after:
+                    raise ConnectionError("fake stream interrupted")
+                if self.delay:
+                    time.sleep(self.delay)
+                delta = self._Namespace()
+                delta.content = self.text[i:i + self.delta_chars]
+                choice = self._Namespace()
+                choice.delta = delta
+                chunk = self._Namespace()
+                chunk.choices = [choice]
+                yield chunk
+        return chunks()
+
+
+if __name__ == '__main__':
+    sample = ("Dengue is a viral infection spread by Aedes mosquitoes. " * 5 + "\n\n"
+              + "Common symptoms include high fever, severe headache and joint pain. " * 30 + "\n\n"
+              + "See a doctor if fever lasts more than two days. " * 10)
+    fake = FakeStreamingClient(sample, delay=0.001)
+    text, timings = stream_completion(
+        fake,
+        lambda body: print(f"--- message ({len(body)} chars) ---\n{body[:80]}..."),
+        [{"role": "user", "content": "dengue"}],
+        model="fake"
+    )
+    print(timings)
@@ -0,0 +1,86 @@
+"""
+Lightweight in-process latency histograms and counters for HealNet
+"""
+
+import bisect
+import threading
+
+# Seconds. Covers cache hits through slow upstream LLM / map calls.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (thread-safe, O(log buckets) per observation)"""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        idx = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.total += seconds
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for idx, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[idx - 1] if idx > 0 else 0.0
+                upper = self.buckets[idx] if idx < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * ((rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def totals(self):
+        """(per-bucket counts, count, sum) - for merging histograms across processes"""
+        with self._lock:
+            return list(self.counts), self.count, self.total
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.total
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": count,
+            "sum": round(total, 4),
+            "avg": round(total / count, 4) if count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": buckets
+        }
+
+
+class Counters:
+    """Named thread-safe counters"""
+
+    def __init__(self, *names):
+        self._values = {name: 0 for name in names}
+        self._lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def get(self, name):
+        return self._values.get(name, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
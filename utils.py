@@ -2,6 +2,10 @@
 Utility functions and health data for HealNet
 """
 
+import language_detect
+from config import Config
+from keyword_matcher import KeywordMatcher
+
 HEALTH_FAQ = {
     "fever": {
         "en": "Fever is usually a sign your body is fighting an infection. Rest, drink plenty of fluids, and monitor your temperature. Seek medical help if fever exceeds 103°F (39.4°C) or lasts more than 3 days.",
@@ -37,33 +41,25 @@ HEALTH_FAQ = {
     }
 }
 
-LANGUAGE_PATTERNS = {
-    "hi": ["है", "में", "को", "का", "की", "से", "मैं", "दर्द", "बुखार"],
-    "es": ["el", "la", "de", "en", "es", "dolor", "fiebre", "médico"],
-    "fr": ["le", "la", "de", "je", "est", "douleur", "fièvre", "médecin"],
-    "bn": ["আমি", "এটা", "হয়", "আছে", "ব্যথা", "জ্বর"],
-    "te": ["నాకు", "ఉంది", "నొప్పి", "జ్వరం"],
-    "ta": ["எனக்கு", "உள்ளது", "வலி", "காய்ச்சல்"],
-}
+# Detector codes that are not in Config.SUPPORTED_LANGUAGES themselves
+LANGUAGE_CODE_ALIASES = {"hi-Latn": "hi"}
 
 def detect_language(text):
     """
-    Simple language detection based on common words
-    Returns ISO 639-1 language code
+    Detect the language of a message (see language_detect)
+    Returns a code from Config.SUPPORTED_LANGUAGES: romanised Hindi counts
+    as 'hi', other unsupported languages (pa, or, ml) as 'en'
     """
-    text_lower = text.lower()
-    
-    for lang_code, patterns in LANGUAGE_PATTERNS.items():
-        if any(pattern in text_lower for pattern in patterns):
-            return lang_code
-    
-    return "en"  
+    code = language_detect.detect(text).language
+    code = LANGUAGE_CODE_ALIASES.get(code, code)
+    return code if code in Config.SUPPORTED_LANGUAGES else 'en'
 
 def get_language_name(code):
     """Get full language name from code"""
     languages = {
         "en": "English",
         "hi": "Hindi",
+        "hi-Latn": "Hinglish",
         "es": "Spanish",
         "fr": "French",
         "bn": "Bengali",
@@ -71,55 +67,57 @@ def get_language_name(code):
         "ta": "Tamil",
         "mr": "Marathi",
         "gu": "Gujarati",
-        "kn": "Kannada"
+        "kn": "Kannada",
+        "pa": "Punjabi",
+        "or": "Odia",
+        "ml": "Malayalam"
     }
     return languages.get(code, "English")
 
-def extract_symptoms(message):
+SYMPTOM_KEYWORDS = {
+    "fever": ["fever", "temperature", "hot", "बुखार", "fiebre"],
+    "headache": ["headache", "head pain", "सिरदर्द", "dolor de cabeza"],
+    "cough": ["cough", "coughing", "खांसी", "tos"],
+    "cold": ["cold", "runny nose", "congestion", "सर्दी", "resfriado"],
+    "pain": ["pain", "ache", "दर्द", "dolor"],
+    "nausea": ["nausea", "vomit", "throw up", "मतली", "náusea"],
+    "fatigue": ["tired", "fatigue", "weakness", "थकान", "fatiga"],
+    "dizziness": ["dizzy", "vertigo", "चक्कर", "mareo"]
+}
+
+def extract_symptoms(message, matches=None):
     """
     Extract potential symptoms from user message
     """
-    symptom_keywords = {
-        "fever": ["fever", "temperature", "hot", "बुखार", "fiebre"],
-        "headache": ["headache", "head pain", "सिरदर्द", "dolor de cabeza"],
-        "cough": ["cough", "coughing", "खांसी", "tos"],
-        "cold": ["cold", "runny nose", "congestion", "सर्दी", "resfriado"],
-        "pain": ["pain", "ache", "दर्द", "dolor"],
-        "nausea": ["nausea", "vomit", "throw up", "मतली", "náusea"],
-        "fatigue": ["tired", "fatigue", "weakness", "थकान", "fatiga"],
-        "dizziness": ["dizzy", "vertigo", "चक्कर", "mareo"]
-    }
-    
-    detected_symptoms = []
-    message_lower = message.lower()
-    
-    for symptom, keywords in symptom_keywords.items():
-        if any(keyword in message_lower for keyword in keywords):
-            detected_symptoms.append(symptom)
-    
-    return detected_symptoms
+    matches = matches or KEYWORD_MATCHER.match(message)
+    return [symptom for symptom in SYMPTOM_KEYWORDS if f"symptom:{symptom}" in matches]
+
+INTENT_KEYWORDS = {
+    "emergency": ["emergency", "urgent", "help", "ambulance", "critical", "आपातकाल", "मदद"],
+    "find_facility": ["hospital", "clinic", "doctor", "pharmacy", "near", "अस्पताल", "डॉक्टर"],
+    "disease_info": ["diabetes", "hypertension", "asthma", "cancer", "disease", "condition", "मधुमेह", "बीमारी"],
+    "medication_info": ["medicine", "medication", "drug", "tablet", "pill", "दवा", "दवाई"]
+}
 
-def get_intent(message):
+def get_intent(message, matches=None):
     """
     Classify user intent from message
     """
-    message_lower = message.lower()
+    matches = matches or KEYWORD_MATCHER.match(message)
     
-    if any(word in message_lower for word in ["emergency", "urgent", "help", "ambulance", "critical", "आपातकाल", "मदद"]):
+    if "intent:emergency" in matches:
         return "emergency"
     
-    if any(word in message_lower for word in ["hospital", "clinic", "doctor", "pharmacy", "near", "अस्पताल", "डॉक्टर"]):
+    if "intent:find_facility" in matches:
         return "find_facility"
     
-    symptoms = extract_symptoms(message)
-    if symptoms:
+    if extract_symptoms(message, matches):
         return "symptom_check"
     
-    disease_keywords = ["diabetes", "hypertension", "asthma", "cancer", "disease", "condition", "मधुमेह", "बीमारी"]
-    if any(keyword in message_lower for keyword in disease_keywords):
+    if "intent:disease_info" in matches:
         return "disease_info"
     
-    if any(word in message_lower for word in ["medicine", "medication", "drug", "tablet", "pill", "दवा", "दवाई"]):
+    if "intent:medication_info" in matches:
         return "medication_info"
     
     return "general_health"
@@ -167,14 +165,23 @@ MEDICAL_SPECIALTIES = {
     "gastroenterology": ["stomach", "digestive", "intestine", "पेट"]
 }
 
-def suggest_specialty(message):
+def suggest_specialty(message, matches=None):
     """
     Suggest medical specialty based on symptoms
     """
-    message_lower = message.lower()
+    matches = matches or KEYWORD_MATCHER.match(message)
     
-    for specialty, keywords in MEDICAL_SPECIALTIES.items():
-        if any(keyword in message_lower for keyword in keywords):
+    for specialty in MEDICAL_SPECIALTIES:
+        if f"specialty:{specialty}" in matches:
             return specialty.title()
     
-    return "General Medicine"
\ No newline at end of file
+    return "General Medicine"
+
+# Every keyword table above, for the single-pass matcher (app.py adds its own)
+KEYWORD_TABLES = {
+    **{f"symptom:{name}": keywords for name, keywords in SYMPTOM_KEYWORDS.items()},
+    **{f"intent:{name}": keywords for name, keywords in INTENT_KEYWORDS.items()},
+    **{f"specialty:{name}": keywords for name, keywords in MEDICAL_SPECIALTIES.items()}
+}
+
+KEYWORD_MATCHER = KeywordMatcher(KEYWORD_TABLES)
@@ -0,0 +1,15 @@
+"""
+WSGI entry point for production
+
+    gunicorn -c gunicorn_conf.py wsgi:application
+
+Builds the application with the fork-safe warmup hooks only (database,
+indexes; the image models too with PRELOAD_MODELS=True). With preload_app
+the master runs them once and the workers share the result;
+gunicorn_conf.py runs the rest of Config.WARMUP (clients, background
+workers and, if listed, models) in each worker after fork.
+"""
+
+import app
+
+application = app.create_app(app.preload_hooks())